@@ -0,0 +1,3 @@
+from base.cli.command import cli
+
+cli()
@@ -1,2 +1,406 @@
+import asyncio
+import importlib.util
+import os
+import random
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
 
+import click
+import uvicorn
 
+from base.common.database import SKIP_MIGRATIONS_ENV
+from base.common.log import log
+from base.common.ratelimit import SHM_PATH_ENV, reset_shm, shm_path
+from base.common.setting import settings
+
+APP = "base.start:init_app"
+# worker 启动失败时的退出码 (与 uvicorn 命令行一致)
+STARTUP_FAILURE = 3
+# 有安装时显式使用 uvloop 与 httptools, 否则退回纯 Python 实现
+LOOP = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+HTTP = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def _run_migrations() -> None:
+    """在独立进程中执行一次迁移, 主进程不导入模型 (滚动重启时新代码的模型也能生效)"""
+    if settings.DB_MIGRATE_MODE == "off":
+        return
+    result = subprocess.run([sys.executable, "-m", "base.cli", "migrate"])
+    if result.returncode != 0:
+        raise click.ClickException(f"数据库迁移失败 (退出码 {result.returncode})")
+
+
+class _WorkerServer(uvicorn.Server):
+    """worker 进程内的 uvicorn 服务: lifespan 启动完成后通知主进程, 主进程退出后自行退出"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int | None) -> None:
+        super().__init__(config)
+        self.ready_fd = ready_fd
+        self.parent = os.getppid()
+
+    async def startup(self, sockets: list[socket.socket] | None = None) -> None:
+        await super().startup(sockets)
+        if self.started and self.ready_fd is not None:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+            self.ready_fd = None
+
+    async def on_tick(self, counter: int) -> bool:
+        if counter % 10 == 0 and os.getppid() != self.parent:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class _Worker:
+    __slots__ = ("slot", "process", "ready_fd", "ready", "started")
+
+    def __init__(self, slot: int, process: subprocess.Popen, ready_fd: int) -> None:
+        self.slot = slot
+        self.process = process
+        self.ready_fd = ready_fd
+        self.ready = False
+        self.started = time.monotonic()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+
+class WorkerManager:
+    """
+    预先派生的多 worker 主进程
+
+    每个 worker 槽位对应一个由主进程创建并一直持有的 SO_REUSEPORT 监听套接字, 内核在这些
+    套接字之间分配新连接; worker 是执行 `python -m base.cli worker` 的独立进程, 继承所在
+    槽位的套接字。worker 退出或重启时套接字仍由主进程持有, 期间到达的连接留在队列中
+    等待新 worker 接受, 不会被重置。
+
+    - SIGHUP: 先执行迁移, 再逐个槽位启动新 worker, 新 worker 就绪后才停止旧 worker
+    - SIGTERM / SIGINT: 通知所有 worker 平滑退出, 超过 graceful_timeout 后强制结束
+    - worker 处理请求数达到上限或异常退出时自动补充, 启动即失败的槽位按指数退避重试
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        backlog: int,
+        max_requests: int,
+        max_requests_jitter: int,
+        graceful_timeout: int,
+        startup_timeout: int,
+        keep_alive: int,
+    ) -> None:
+        self.sockets = [_bind(host, port, backlog) for _ in range(workers)]
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.startup_timeout = startup_timeout
+        self.keep_alive = keep_alive
+        self.workers: dict[int, _Worker] = {}
+        # 滚动重启中尚未就绪的新 worker, 以及正在平滑退出的旧 worker
+        self.replacements: dict[int, _Worker] = {}
+        self.retiring: list[_Worker] = []
+        self.pending_restart: list[int] = []
+        self.respawn_at: dict[int, float] = {}
+        self.failures: dict[int, int] = {}
+        self.signals: list[int] = []
+        self.stop_deadline: float | None = None
+        self._restarting = False
+
+    def spawn(self, slot: int) -> _Worker:
+        sock = self.sockets[slot]
+        read_fd, write_fd = os.pipe()
+        max_requests = self.max_requests
+        # requirements 固定的 uvicorn 0.34 没有 limit_max_requests_jitter 选项, 由主进程为每个 worker 抽取一次
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        args = [
+            sys.executable, "-m", "base.cli", "worker",
+            "--fd", str(sock.fileno()),
+            "--ready-fd", str(write_fd),
+            "--max-requests", str(max_requests),
+            "--graceful-timeout", str(self.graceful_timeout),
+            "--keep-alive", str(self.keep_alive),
+        ]
+        try:
+            process = subprocess.Popen(
+                args, pass_fds=(sock.fileno(), write_fd), env={**os.environ, SKIP_MIGRATIONS_ENV: "1"}
+            )
+        finally:
+            os.close(write_fd)
+        return _Worker(slot, process, read_fd)
+
+    def run(self) -> None:
+        wakeup_read, wakeup_write = os.pipe()
+        os.set_blocking(wakeup_read, False)
+        os.set_blocking(wakeup_write, False)
+        signal.set_wakeup_fd(wakeup_write)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, lambda sig, frame: self.signals.append(sig))
+
+        for slot in range(len(self.sockets)):
+            self.workers[slot] = self.spawn(slot)
+        log.info(f"主进程 {os.getpid()} 已启动 {len(self.workers)} 个 worker (loop={LOOP}, http={HTTP})")
+
+        while True:
+            starting = {w.ready_fd: w for w in self._processes() if w.ready_fd is not None}
+            readable, _, _ = select.select([wakeup_read, *starting], [], [], self._select_timeout())
+            if wakeup_read in readable:
+                try:
+                    while os.read(wakeup_read, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+            while self.signals:
+                self._handle_signal(self.signals.pop(0))
+            for fd in readable:
+                if fd in starting:
+                    self._on_ready_message(starting[fd])
+            self._reap()
+            if self.stop_deadline is not None:
+                if not any(True for _ in self._processes()):
+                    break
+                if time.monotonic() >= self.stop_deadline:
+                    for worker in self._processes():
+                        worker.process.kill()
+                continue
+            self._check_startup_timeouts()
+            self._respawn_due()
+            self._advance_restart()
+
+        for sock in self.sockets:
+            sock.close()
+        log.info(f"主进程 {os.getpid()} 已退出")
+
+    def _processes(self):
+        yield from self.workers.values()
+        yield from self.replacements.values()
+        yield from self.retiring
+
+    def _select_timeout(self) -> float:
+        timeout = 1.0
+        if self.respawn_at:
+            timeout = min(timeout, max(0.0, min(self.respawn_at.values()) - time.monotonic()))
+        return timeout
+
+    def _handle_signal(self, sig: int) -> None:
+        if sig in (signal.SIGTERM, signal.SIGINT):
+            if self.stop_deadline is None:
+                log.info(f"收到 {signal.Signals(sig).name}, 等待 worker 处理完进行中的请求")
+                self.stop_deadline = time.monotonic() + self.graceful_timeout + 5
+                for worker in self._processes():
+                    self._terminate(worker)
+        elif sig == signal.SIGHUP and self.stop_deadline is None:
+            if self._restarting:
+                log.warning("滚动重启进行中, 忽略 SIGHUP")
+                return
+            log.info("收到 SIGHUP, 开始滚动重启")
+            try:
+                _run_migrations()
+            except click.ClickException as e:
+                log.error(f"{e.message}, 取消滚动重启")
+                return
+            self.pending_restart = sorted(self.workers)
+            self._restarting = True
+
+    @staticmethod
+    def _terminate(worker: _Worker) -> None:
+        if worker.process.poll() is None:
+            worker.process.send_signal(signal.SIGTERM)
+
+    def _on_ready_message(self, worker: _Worker) -> None:
+        data = os.read(worker.ready_fd, 1)
+        os.close(worker.ready_fd)
+        worker.ready_fd = None
+        if not data:
+            # 未就绪即退出, 由 _reap 处理
+            return
+        worker.ready = True
+        self.failures.pop(worker.slot, None)
+        if self.replacements.get(worker.slot) is worker:
+            old = self.workers[worker.slot]
+            self.workers[worker.slot] = self.replacements.pop(worker.slot)
+            self.retiring.append(old)
+            self._terminate(old)
+            log.info(f"worker {worker.pid} 已就绪, 替换 worker {old.pid}")
+        else:
+            log.info(f"worker {worker.pid} 已就绪")
+
+    def _reap(self) -> None:
+        for worker in list(self._processes()):
+            code = worker.process.poll()
+            if code is None:
+                continue
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+                worker.ready_fd = None
+            if worker in self.retiring:
+                self.retiring.remove(worker)
+                continue
+            if self.stop_deadline is not None:
+                self.workers.pop(worker.slot, None)
+                self.replacements.pop(worker.slot, None)
+                continue
+            if self.replacements.get(worker.slot) is worker:
+                del self.replacements[worker.slot]
+                self.pending_restart.clear()
+                self._restarting = False
+                log.error(f"新 worker {worker.pid} 启动失败 (退出码 {code}), 取消滚动重启, 保留原 worker")
+                continue
+            if self.workers.get(worker.slot) is not worker:
+                continue
+            del self.workers[worker.slot]
+            if worker.ready:
+                if code == 0:
+                    log.info(f"worker {worker.pid} 已退出 (处理请求数达到上限), 重新启动")
+                else:
+                    log.warning(f"worker {worker.pid} 异常退出 (退出码 {code}), 重新启动")
+                self.respawn_at[worker.slot] = time.monotonic()
+            else:
+                failures = self.failures[worker.slot] = self.failures.get(worker.slot, 0) + 1
+                delay = min(2 ** (failures - 1), 30)
+                log.error(f"worker {worker.pid} 启动失败 (退出码 {code}), {delay} 秒后重试")
+                self.respawn_at[worker.slot] = time.monotonic() + delay
+
+    def _check_startup_timeouts(self) -> None:
+        now = time.monotonic()
+        for worker in list(self._processes()):
+            if worker.ready_fd is not None and now - worker.started > self.startup_timeout:
+                log.error(f"worker {worker.pid} 超过 {self.startup_timeout} 秒未就绪, 强制结束")
+                worker.process.kill()
+
+    def _respawn_due(self) -> None:
+        now = time.monotonic()
+        for slot, at in list(self.respawn_at.items()):
+            if at <= now:
+                del self.respawn_at[slot]
+                self.workers[slot] = self.spawn(slot)
+
+    def _advance_restart(self) -> None:
+        """一次只替换一个槽位, 上一个新 worker 就绪后再替换下一个"""
+        while self.pending_restart and not self.replacements:
+            slot = self.pending_restart.pop(0)
+            # 该槽位的 worker 正在等待重新启动时跳过, 新进程本身就会加载新代码
+            if slot in self.workers:
+                self.replacements[slot] = self.spawn(slot)
+        if not self.pending_restart and not self.replacements and self._restarting:
+            self._restarting = False
+            log.info("滚动重启完成")
+
+
+@click.group()
+def cli():
+    """AIPanelAdmin 命令行"""
+
+
+@cli.command()
+def migrate():
+    """按 DB_MIGRATE_MODE 执行数据库迁移"""
+    from tortoise import Tortoise
+
+    from base.common.database import init_db
+
+    async def run():
+        try:
+            await init_db()
+        finally:
+            await Tortoise.close_connections()
+
+    asyncio.run(run())
+
+
+@cli.command()
+@click.option("--host", default=settings.SERVER_HOST, show_default=True)
+@click.option("--port", default=settings.SERVER_PORT, show_default=True, type=int)
+@click.option("--workers", default=settings.SERVER_WORKERS, show_default=True, type=int, help="0 表示按可用 CPU 数")
+@click.option("--max-requests", default=settings.SERVER_MAX_REQUESTS, show_default=True, type=int)
+@click.option("--max-requests-jitter", default=settings.SERVER_MAX_REQUESTS_JITTER, show_default=True, type=int)
+@click.option("--graceful-timeout", default=settings.SERVER_GRACEFUL_TIMEOUT, show_default=True, type=int)
+def serve(host, port, workers, max_requests, max_requests_jitter, graceful_timeout):
+    """
+    生产环境多进程启动
+
+    主进程执行一次迁移后启动 worker, worker 跳过迁移; 向主进程发送 SIGHUP 滚动重启。
+    """
+    workers = workers or _available_cpus()
+    _run_migrations()
+    if not hasattr(socket, "SO_REUSEPORT"):
+        # Windows 等平台: 交给 uvicorn 自带的多进程模式
+        os.environ[SKIP_MIGRATIONS_ENV] = "1"
+        uvicorn.run(
+            APP, factory=True, host=host, port=port, workers=workers, loop=LOOP, http=HTTP,
+            log_config=None, timeout_graceful_shutdown=graceful_timeout,
+            timeout_keep_alive=settings.SERVER_KEEP_ALIVE, backlog=settings.SERVER_BACKLOG,
+        )
+        return
+    shm = None
+    if settings.RATE_LIMIT_ENABLE and settings.RATE_LIMIT_BACKEND == "shm":
+        # 共享内存限流文件按端口区分, 主进程启动时清空, worker 通过环境变量使用同一文件
+        shm = shm_path(port)
+        reset_shm(shm)
+        os.environ[SHM_PATH_ENV] = shm
+    manager = WorkerManager(
+        host=host,
+        port=port,
+        workers=workers,
+        backlog=settings.SERVER_BACKLOG,
+        max_requests=max_requests,
+        max_requests_jitter=max_requests_jitter,
+        graceful_timeout=graceful_timeout,
+        startup_timeout=settings.SERVER_STARTUP_TIMEOUT,
+        keep_alive=settings.SERVER_KEEP_ALIVE,
+    )
+    try:
+        manager.run()
+    finally:
+        if shm is not None:
+            reset_shm(shm)
+
+
+@cli.command(hidden=True)
+@click.option("--fd", required=True, type=int)
+@click.option("--ready-fd", type=int)
+@click.option("--max-requests", default=0, type=int)
+@click.option("--graceful-timeout", default=settings.SERVER_GRACEFUL_TIMEOUT, type=int)
+@click.option("--keep-alive", default=settings.SERVER_KEEP_ALIVE, type=int)
+def worker(fd, ready_fd, max_requests, graceful_timeout, keep_alive):
+    """由 serve 启动的 worker 进程"""
+    config = uvicorn.Config(
+        APP,
+        factory=True,
+        loop=LOOP,
+        http=HTTP,
+        lifespan="on",
+        # 日志由 init_app 中的 setup_logging 接管
+        log_config=None,
+        limit_max_requests=max_requests or None,
+        timeout_graceful_shutdown=graceful_timeout,
+        timeout_keep_alive=keep_alive,
+    )
+    server = _WorkerServer(config, ready_fd)
+    server.run(sockets=[socket.socket(fileno=fd)])
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
@@ -0,0 +1,316 @@
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterable, Callable, Iterable
+
+from tortoise import fields, timezone as tortoise_timezone
+from tortoise.exceptions import ValidationError
+
+from base.common.log import log
+
+# 单条记录: {字段名: 值}
+RowData = dict[str, Any]
+
+
+class BatchReport:
+    """单个批次的执行结果"""
+
+    __slots__ = ("index", "rows", "affected", "rejected", "elapsed_ms", "method", "error")
+
+    def __init__(self, index: int, rows: int, method: str) -> None:
+        self.index = index
+        self.rows = rows
+        # 实际插入/更新的行数, 回退路径无法取得时为 None
+        self.affected: int | None = 0
+        self.rejected = 0
+        self.elapsed_ms = 0.0
+        self.method = method
+        self.error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "index": self.index,
+            "rows": self.rows,
+            "affected": self.affected,
+            "rejected": self.rejected,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "method": self.method,
+            "error": self.error,
+        }
+
+
+class BulkUpsertReport:
+    """批量写入汇总结果"""
+
+    __slots__ = ("batches", "rejected", "total_rows", "affected", "elapsed_ms")
+
+    def __init__(self) -> None:
+        self.batches: list[BatchReport] = []
+        # 被拒绝的记录: (记录, 原因)
+        self.rejected: list[tuple[RowData, str]] = []
+        self.total_rows = 0
+        # 任一批次影响行数未知时为 None
+        self.affected: int | None = 0
+        self.elapsed_ms = 0.0
+
+    def to_dict(self, with_rejected_rows: bool = False) -> dict[str, Any]:
+        data = {
+            "total_rows": self.total_rows,
+            "affected": self.affected,
+            "rejected": len(self.rejected),
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "batches": [batch.to_dict() for batch in self.batches],
+        }
+        if with_rejected_rows:
+            data["rejected_rows"] = [{"row": row, "reason": reason} for row, reason in self.rejected]
+        return data
+
+
+class _ColumnPlan:
+    """按字段预先计算的列信息与转换函数"""
+
+    def __init__(self, model: Any, columns: list[str]) -> None:
+        meta = model._meta
+        self.model = model
+        self.fields_map = meta.fields_map
+        self.columns = columns
+        self.db_columns = [meta.fields_db_projection[name] for name in columns]
+        self.converters = [(name, meta.fields_map[name]) for name in columns]
+        self.auto_now = [
+            name for name in columns
+            if isinstance(meta.fields_map[name], fields.DatetimeField) and meta.fields_map[name].auto_now
+        ]
+        self.auto_now_add = [
+            name for name in columns
+            if isinstance(meta.fields_map[name], fields.DatetimeField) and meta.fields_map[name].auto_now_add
+        ]
+        self.required = [
+            name for name in columns
+            if not self.fields_map[name].null
+            and self.fields_map[name].default is None
+            and not self.fields_map[name].generated
+            and name not in self.auto_now
+            and name not in self.auto_now_add
+        ]
+
+    def convert(self, row: RowData, now: datetime) -> tuple:
+        """校验并转换为数据库值元组, 校验失败抛出 ValueError"""
+        values = []
+        for name, field in self.converters:
+            if name in row:
+                value = row[name]
+            elif name in self.auto_now or name in self.auto_now_add:
+                value = now
+            elif name in self.required:
+                raise ValueError(f"缺少必填字段: {name}")
+            else:
+                value = field.default() if callable(field.default) else field.default
+            if name in self.auto_now:
+                value = now
+            if value is not None:
+                try:
+                    field.validate(value)
+                except ValidationError as e:
+                    raise ValueError(str(e))
+            values.append(field.to_db_value(value, self.model))
+        return tuple(values)
+
+
+def _auto_columns(model: Any, first_row: RowData) -> list[str]:
+    """以首行字段为基础, 追加 auto_now/auto_now_add 时间字段"""
+    meta = model._meta
+    columns = [name for name in first_row if name in meta.fields_db_projection]
+    for name, field in meta.fields_map.items():
+        if isinstance(field, fields.DatetimeField) and (field.auto_now or field.auto_now_add):
+            if name not in columns:
+                columns.append(name)
+    return columns
+
+
+async def _iter_batches(rows: Iterable[RowData] | AsyncIterable[RowData], batch_size: int):
+    """将同步/异步可迭代对象切分为批次, 不一次性加载全部数据"""
+    batch: list[RowData] = []
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    else:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _is_asyncpg(client: Any) -> bool:
+    return type(client).__module__.startswith("tortoise.backends.asyncpg")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+async def _copy_upsert(
+    client: Any,
+    table: str,
+    plan: _ColumnPlan,
+    records: list[tuple],
+    conflict_columns: list[str],
+    update_columns: list[str]
+) -> int:
+    """COPY 到临时表后执行 INSERT ... SELECT ... ON CONFLICT"""
+    temp_table = f"_bulk_{table}_{uuid.uuid4().hex[:8]}"
+    columns_sql = ", ".join(_quote(column) for column in plan.db_columns)
+    conflict_sql = ", ".join(_quote(column) for column in conflict_columns)
+    if update_columns:
+        action = "DO UPDATE SET " + ", ".join(
+            f"{_quote(column)} = EXCLUDED.{_quote(column)}" for column in update_columns
+        )
+    else:
+        action = "DO NOTHING"
+    async with client.acquire_connection() as connection:
+        async with connection.transaction():
+            await connection.execute(
+                f"CREATE TEMP TABLE {_quote(temp_table)} (LIKE {_quote(table)} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            await connection.copy_records_to_table(temp_table, records=records, columns=plan.db_columns)
+            status = await connection.execute(
+                f"INSERT INTO {_quote(table)} ({columns_sql}) "
+                f"SELECT {columns_sql} FROM {_quote(temp_table)} "
+                f"ON CONFLICT ({conflict_sql}) {action}"
+            )
+    # 状态格式: INSERT 0 <rows>
+    return int(status.rsplit(" ", 1)[-1])
+
+
+async def bulk_upsert(
+    model: Any,
+    rows: Iterable[RowData] | AsyncIterable[RowData],
+    conflict_on: Iterable[str],
+    update_fields: Iterable[str] | None = None,
+    batch_size: int = 5000,
+    using_db: Any = None,
+    on_batch: Callable[[BatchReport], Any] | None = None
+) -> BulkUpsertReport:
+    """
+    高吞吐批量写入 (存在则更新)
+
+    asyncpg 后端: 每批 COPY 进临时表, 再 INSERT ... ON CONFLICT 合并到目标表;
+    其他后端: 回退为按批的多行 INSERT (Model.bulk_create + on_conflict), 影响行数记为 None。
+    同一批次内冲突键重复的记录只保留最后一条。写入的列由第一条有效记录的字段决定,
+    字段集合与之不同的记录被拒绝 (否则多出的字段会被丢弃, 缺少的字段会以默认值覆盖已有数据)。
+
+    Args:
+        model: 目标模型
+        rows: 记录 (字段名 -> 值) 的同步或异步可迭代对象, 按批流式读取
+        conflict_on: 冲突判定字段 (需有唯一约束)
+        update_fields: 冲突时更新的字段, 默认除冲突字段/主键/auto_now_add 外的全部字段
+        batch_size: 每批记录数
+        using_db: 指定连接或事务
+        on_batch: 每批完成后的回调, 接收 BatchReport
+
+    Returns:
+        BulkUpsertReport, 包含各批次耗时与被拒绝的记录
+    """
+    meta = model._meta
+    client = using_db or meta.db
+    conflict_on = list(conflict_on)
+    use_copy = _is_asyncpg(client)
+    report = BulkUpsertReport()
+    started = time.perf_counter()
+    plan: _ColumnPlan | None = None
+    # 每条记录必须恰好包含这些字段
+    plan_keys: frozenset[str] = frozenset()
+    update_columns: list[str] = []
+    index = 0
+
+    async for batch in _iter_batches(rows, batch_size):
+        batch_started = time.perf_counter()
+        report.total_rows += len(batch)
+        if plan is None:
+            first = next((row for row in batch if all(name in meta.fields_db_projection for name in row)), None)
+            if first is None:
+                # 整批都含未知字段, 下方逐条拒绝
+                first = batch[0]
+            plan_keys = frozenset(first)
+            columns = _auto_columns(model, first)
+            missing = [name for name in conflict_on if name not in columns]
+            if missing:
+                raise ValueError(f"冲突字段不在写入字段中: {missing}")
+            plan = _ColumnPlan(model, columns)
+            if update_fields is None:
+                update_fields = [
+                    name for name in columns
+                    if name not in conflict_on and name != meta.pk_attr and name not in plan.auto_now_add
+                ]
+            update_columns = [meta.fields_db_projection[name] for name in update_fields]
+
+        batch_report = BatchReport(index, len(batch), "copy" if use_copy else "insert")
+        now = tortoise_timezone.now()
+        # 校验转换, 同时按冲突键去重 (保留最后一条)
+        accepted: dict[tuple, tuple[RowData, tuple]] = {}
+        for row in batch:
+            unknown = [name for name in row if name not in meta.fields_db_projection]
+            if unknown:
+                report.rejected.append((row, f"未知字段: {unknown}"))
+                batch_report.rejected += 1
+                continue
+            if row.keys() != plan_keys:
+                extra = sorted(row.keys() - plan_keys)
+                missing = sorted(plan_keys - row.keys())
+                report.rejected.append((row, f"字段与首条记录不一致: 多出 {extra}, 缺少 {missing}"))
+                batch_report.rejected += 1
+                continue
+            try:
+                values = plan.convert(row, now)
+            except (ValueError, TypeError) as e:
+                report.rejected.append((row, str(e)))
+                batch_report.rejected += 1
+                continue
+            accepted[tuple(row.get(name) for name in conflict_on)] = (row, values)
+
+        if accepted:
+            try:
+                if use_copy:
+                    batch_report.affected = await _copy_upsert(
+                        client,
+                        meta.db_table,
+                        plan,
+                        [values for _, values in accepted.values()],
+                        [meta.fields_db_projection[name] for name in conflict_on],
+                        update_columns,
+                    )
+                else:
+                    objects = [model(**row) for row, _ in accepted.values()]
+                    await model.bulk_create(
+                        objects,
+                        ignore_conflicts=not update_fields,
+                        update_fields=list(update_fields) or None,
+                        on_conflict=conflict_on if update_fields else None,
+                        using_db=using_db,
+                    )
+                    # bulk_create 不返回实际影响行数 (冲突忽略或更新的行无法区分)
+                    batch_report.affected = None
+            except Exception as e:
+                # 批次失败时整批记为拒绝, 不影响后续批次
+                batch_report.error = str(e)
+                batch_report.rejected += len(accepted)
+                report.rejected.extend((row, str(e)) for row, _ in accepted.values())
+                log.warning(f"批量写入 {meta.db_table} 第 {index} 批失败: {e}")
+
+        batch_report.elapsed_ms = (time.perf_counter() - batch_started) * 1000
+        if report.affected is None or batch_report.affected is None:
+            report.affected = None
+        else:
+            report.affected += batch_report.affected
+        report.batches.append(batch_report)
+        if on_batch is not None:
+            on_batch(batch_report)
+        index += 1
+
+    report.elapsed_ms = (time.perf_counter() - started) * 1000
+    return report
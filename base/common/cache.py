@@ -0,0 +1,361 @@
+import asyncio
+import hashlib
+import inspect
+import string
+import sys
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from base.common.response import ORJSONResponse
+from base.common.setting import settings
+
+
+class CacheEntry:
+    """缓存项"""
+
+    __slots__ = ("value", "size", "expires_at", "tags")
+
+    def __init__(self, value: Any, size: int, expires_at: float, tags: tuple[str, ...]) -> None:
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class TTLCache:
+    """
+    进程内 TTL + LRU 缓存
+
+    同时按条目数与占用字节数限制容量, 超出时淘汰最久未使用的条目;
+    支持按标签批量失效, get_or_load 将并发的相同未命中合并为一次加载 (single-flight)。
+    只在事件循环线程内使用, 不加锁。
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int, default_ttl: float) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        # {标签: {缓存键}}
+        self._tags: dict[str, set[Hashable]] = {}
+        # 正在加载的键: {缓存键: Future}
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        # 每次失效递增, 加载期间发生失效时不写入加载结果, 避免写入旧数据
+        self._generation = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(
+            self,
+            key: Hashable,
+            value: Any,
+            ttl: float | None = None,
+            tags: Iterable[str] = (),
+            size: int | None = None
+    ) -> None:
+        if key in self._data:
+            self._remove(key)
+        size = size if size is not None else _sizeof(value)
+        if size > self.max_bytes:
+            return
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = CacheEntry(value, size, time.monotonic() + ttl, tuple(tags))
+        self._data[key] = entry
+        self.bytes += size
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._generation += 1
+        if key in self._data:
+            self._remove(key)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """删除带有任一标签的缓存项, 返回删除数量"""
+        self._generation += 1
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                if key in self._data:
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._data.clear()
+        self._tags.clear()
+        self.bytes = 0
+
+    async def get_or_load(
+            self,
+            key: Hashable,
+            loader: Callable[[], Awaitable[Any]],
+            ttl: float | None = None,
+            tags: Iterable[str] | Callable[[Any], Iterable[str]] = (),
+            should_cache: Callable[[Any], bool] | None = None,
+            sizeof: Callable[[Any], int] | None = None
+    ) -> tuple[Any, bool]:
+        """
+        读取缓存, 未命中时调用 loader 加载并写入
+
+        同一键的并发未命中只执行一次 loader, 其余调用等待同一结果 (包括异常)。
+
+        Args:
+            key: 缓存键
+            loader: 加载函数
+            ttl: 过期时间(秒), 默认使用 default_ttl
+            tags: 失效标签, 或根据加载结果返回标签的函数
+            should_cache: 判断加载结果是否写入缓存, 默认全部写入
+            sizeof: 计算加载结果占用字节数
+
+        Returns:
+            (值, 是否命中缓存)
+        """
+        while True:
+            entry = self._data.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry.value, True
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                value = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # 执行加载的请求被取消 (如客户端断开), 由等待者重新加载
+                continue
+            self.hits += 1
+            return value, True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时标记异常已读取, 避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        if generation == self._generation and (should_cache is None or should_cache(value)):
+            self.set(
+                key,
+                value,
+                ttl=ttl,
+                tags=tags(value) if callable(tags) else tags,
+                size=sizeof(value) if sizeof else None,
+            )
+        return value, False
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self.bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "tags": len(self._tags),
+        }
+
+
+def _sizeof(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class CachedResponse(Response):
+    """从缓存快照还原的响应, 直接复用序列化好的响应体"""
+
+    def __init__(self, snapshot: "ResponseSnapshot", cache_status: str) -> None:
+        self.status_code = snapshot.status_code
+        self.body = snapshot.body
+        self.background = None
+        # 复制一份响应头, 外层中间件追加响应头时不会修改缓存中的快照
+        self.raw_headers = [*snapshot.raw_headers, (b"x-cache", cache_status.encode("latin-1"))]
+
+
+class ResponseSnapshot:
+    """响应快照: 状态码、响应头与响应体字节"""
+
+    __slots__ = ("status_code", "raw_headers", "body", "size")
+
+    def __init__(self, response: Response) -> None:
+        self.status_code = response.status_code
+        self.raw_headers = tuple(response.raw_headers)
+        self.body = response.body
+        self.size = len(self.body) + sum(len(name) + len(value) for name, value in self.raw_headers)
+
+
+response_cache = TTLCache(
+    "response",
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    default_ttl=settings.RESPONSE_CACHE_TTL,
+)
+
+
+def response_cache_key(request: Request, vary_auth: bool = True) -> str:
+    """缓存键: 路径 + 排序后的查询参数 + 认证信息 (Authorization 与 Cookie 请求头) 摘要"""
+    query = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}"
+    if vary_auth:
+        # 允许携带凭证的跨域请求可能只用 Cookie 认证, 两者都参与摘要
+        credentials = f"{request.headers.get('authorization', '')}\n{request.headers.get('cookie', '')}"
+        key += "|" + hashlib.blake2b(credentials.encode("utf-8"), digest_size=16).hexdigest()
+    return key
+
+
+def invalidate_tags(*tags: str) -> int:
+    """按标签失效响应缓存"""
+    return response_cache.invalidate_tags(*tags)
+
+
+def cached_response(
+        ttl: float | None = None,
+        tags: Iterable[str] = (),
+        vary_auth: bool = True,
+        cache: TTLCache | None = None
+) -> Callable:
+    """
+    GET 路由响应缓存装饰器, 放在路由装饰器与处理函数之间
+
+        @router.get("/stats")
+        @cached_response(ttl=10, tags=("dashboard",))
+        async def stats(): ...
+
+    缓存序列化后的响应字节, 键由路径、查询参数与认证头 (Authorization/Cookie) 摘要组成; 只缓存 200 响应,
+    处理函数返回普通数据时按 ORJSONResponse 序列化。相同键的并发未命中只执行一次处理函数。
+    响应头 X-Cache 标明 HIT/MISS。
+
+    Args:
+        ttl: 过期时间(秒), 默认 settings.RESPONSE_CACHE_TTL
+        tags: 失效标签, 可引用处理函数的参数 (如路径参数), 如 "user:{user_id}"
+        vary_auth: 是否按认证头 (Authorization 与 Cookie) 区分缓存 (公开数据可关闭以共享缓存)
+        cache: 使用的缓存实例, 默认全局 response_cache
+
+    Returns:
+        装饰器
+
+    Raises:
+        ValueError: 标签引用了处理函数没有的参数
+    """
+    tags = tuple(tags)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        for tag in tags:
+            for _, field, _, _ in string.Formatter().parse(tag):
+                name = field.split(".", 1)[0].split("[", 1)[0] if field else field
+                if name is not None and name not in signature.parameters:
+                    raise ValueError(f"缓存标签 {tag!r} 引用了 {func.__qualname__} 没有的参数 {name!r}")
+        is_coroutine = inspect.iscoroutinefunction(func)
+        request_param = next(
+            (name for name, param in signature.parameters.items() if param.annotation is Request),
+            None,
+        )
+        inject_request = request_param is None
+        if inject_request:
+            # 处理函数未声明 Request 时追加一个参数, 由 FastAPI 注入
+            request_param = "_cache_request"
+            signature = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(request_param, inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            ])
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            # 与 FastAPI 一致: 普通 def 处理函数在线程池中执行
+            if is_coroutine:
+                return await func(*args, **kwargs)
+            return await run_in_threadpool(func, *args, **kwargs)
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            request: Request = kwargs.pop(request_param) if inject_request else kwargs[request_param]
+            target = response_cache if cache is None else cache
+            if not settings.RESPONSE_CACHE_ENABLE or request.method != "GET":
+                return await call(*args, **kwargs)
+
+            async def load() -> ResponseSnapshot | Response:
+                result = await call(*args, **kwargs)
+                response = result if isinstance(result, Response) else ORJSONResponse(result)
+                # 流式/文件响应没有 body, 带后台任务的响应需要原样返回, 均不缓存
+                if not hasattr(response, "body") or response.background is not None:
+                    return response
+                return ResponseSnapshot(response)
+
+            value, hit = await target.get_or_load(
+                response_cache_key(request, vary_auth),
+                load,
+                ttl=ttl,
+                tags=[tag.format(**kwargs) for tag in tags],
+                should_cache=lambda snapshot: isinstance(snapshot, ResponseSnapshot) and snapshot.status_code == 200,
+                sizeof=lambda snapshot: snapshot.size,
+            )
+            if isinstance(value, ResponseSnapshot):
+                return CachedResponse(value, "HIT" if hit else "MISS")
+            if hit:
+                # 合并到了一个无法共享的流式响应, 单独执行
+                return await call(*args, **kwargs)
+            return value
+
+        wrapper.__signature__ = signature
+        return wrapper
+
+    return decorator
@@ -0,0 +1,203 @@
+import hashlib
+import time
+import zlib
+from typing import Any
+
+from base.common.cache import TTLCache
+from base.common.setting import settings
+
+# gzip 格式的 zlib wbits
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# 按响应大小选择的级别上限: (大小上限(字节), 级别上限)
+SIZE_LEVELS = (
+    (16 * 1024, 9),
+    (256 * 1024, 6),
+    (2 * 1024 * 1024, 4),
+)
+LARGE_LEVEL = 1
+# 流式响应总大小未知, 使用中等级别
+STREAM_LEVEL = 6
+
+
+class CompressionBudget:
+    """
+    压缩 CPU 预算
+
+    以 1 秒为窗口统计事件循环线程花在压缩上的 CPU 时间, 占比超过 settings.GZIP_CPU_BUDGET 时
+    降低压缩级别, 超过一半预算时降 3 级, 超出预算时降到 1 级。
+    """
+
+    WINDOW = 1.0
+
+    def __init__(self, budget: float) -> None:
+        self.budget = budget
+        self._window_start = time.monotonic()
+        self._spent = 0.0
+        self._usage = 0.0
+
+    def record(self, seconds: float) -> None:
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= self.WINDOW:
+            self._usage = self._spent / elapsed
+            self._window_start = now
+            self._spent = 0.0
+        self._spent += seconds
+
+    @property
+    def usage(self) -> float:
+        """上一个窗口与当前窗口中较高的 CPU 占比"""
+        elapsed = time.monotonic() - self._window_start
+        return max(self._usage, self._spent / max(elapsed, self.WINDOW))
+
+    def limit(self, level: int) -> int:
+        usage = self.usage
+        if usage > self.budget:
+            return 1
+        if usage > self.budget / 2:
+            return max(1, level - 3)
+        return level
+
+
+class CompressionStats:
+    __slots__ = ("responses", "streamed", "cached", "skipped", "bytes_in", "bytes_out", "cpu_seconds")
+
+    def __init__(self) -> None:
+        self.responses = 0
+        self.streamed = 0
+        self.cached = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+
+budget = CompressionBudget(settings.GZIP_CPU_BUDGET)
+stats = CompressionStats()
+# 可缓存响应的压缩结果: {(响应体摘要, 级别): 压缩后字节}
+compressed_cache = TTLCache(
+    "gzip",
+    max_entries=10000,
+    max_bytes=settings.GZIP_CACHE_MAX_MB * 1024 * 1024,
+    default_ttl=3600,
+)
+
+
+def choose_level(size: int | None) -> int:
+    """动态响应的压缩级别: 按大小取级别上限, 再受 GZIP_COMPRESS_LEVEL 与 CPU 预算限制, size 为 None 表示流式响应"""
+    if size is None:
+        level = STREAM_LEVEL
+    else:
+        level = next((size_level for limit, size_level in SIZE_LEVELS if size <= limit), LARGE_LEVEL)
+    return budget.limit(min(level, settings.GZIP_COMPRESS_LEVEL))
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Accept-Encoding 是否接受 gzip (q=0 表示拒绝, 显式的 gzip 优先于 *)"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return bool(media_type) and any(media_type.startswith(prefix) for prefix in settings.GZIP_CONTENT_TYPES)
+
+
+def is_cacheable(headers: Any) -> bool:
+    """带 ETag/Last-Modified 或可共享 Cache-Control 的响应 (静态文件、cached_response 等) 视为可缓存"""
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return False
+    return (
+        "etag" in headers
+        or "last-modified" in headers
+        or "x-cache" in headers
+        or "max-age" in cache_control
+        or "public" in cache_control
+    )
+
+
+def compress(body: bytes, level: int) -> bytes:
+    started = time.thread_time()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    data = compressor.compress(body) + compressor.flush()
+    _record(len(body), len(data), time.thread_time() - started)
+    return data
+
+
+def is_static(headers: Any) -> bool:
+    """
+    可缓存响应中的静态内容 (静态文件、带 max-age/public 的响应), 内容长期不变, 值得按最高级别压缩一次
+
+    需要每次重新验证 (no-cache, max-age=0) 的条件 GET 响应与 cached_response 的响应 (X-Cache)
+    内容随数据变化, 按 choose_level 压缩。
+    """
+    cache_control = headers.get("cache-control", "").lower().replace(" ", "")
+    return "no-cache" not in cache_control and "max-age=0" not in cache_control and "x-cache" not in headers
+
+
+def compress_cached(body: bytes, level: int) -> bytes:
+    """按给定级别压缩, 相同响应体与级别直接复用压缩结果"""
+    key = (hashlib.blake2b(body, digest_size=16).digest(), level)
+    data = compressed_cache.get(key)
+    if data is None:
+        data = compress(body, level)
+        compressed_cache.set(key, data)
+    else:
+        stats.cached += 1
+        stats.bytes_in += len(body)
+        stats.bytes_out += len(data)
+    return data
+
+
+class StreamCompressor:
+    """流式压缩: 每个分块以 Z_SYNC_FLUSH 结束, 客户端可以立即解压已收到的数据"""
+
+    __slots__ = ("_compressor",)
+
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+        stats.streamed += 1
+
+    def compress(self, chunk: bytes, final: bool) -> bytes:
+        started = time.thread_time()
+        data = self._compressor.compress(chunk)
+        data += self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        _record(len(chunk), len(data), time.thread_time() - started, count=False)
+        return data
+
+
+def _record(size_in: int, size_out: int, seconds: float, count: bool = True) -> None:
+    budget.record(seconds)
+    if count:
+        stats.responses += 1
+    stats.bytes_in += size_in
+    stats.bytes_out += size_out
+    stats.cpu_seconds += seconds
+
+
+def get_compression_stats() -> dict[str, Any]:
+    return {
+        "responses": stats.responses,
+        "streamed": stats.streamed,
+        "cached": stats.cached,
+        "skipped": stats.skipped,
+        "bytes_in": stats.bytes_in,
+        "bytes_out": stats.bytes_out,
+        "ratio": round(stats.bytes_out / stats.bytes_in, 4) if stats.bytes_in else 0.0,
+        "cpu_seconds": round(stats.cpu_seconds, 3),
+        "cpu_usage": round(budget.usage, 4),
+        "cache": compressed_cache.stats(),
+    }
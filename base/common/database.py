@@ -1,29 +1,193 @@
-import shutil
+import hashlib
+import json
 import logging
+import os
+import zlib
+from contextlib import asynccontextmanager
+from pathlib import Path
 from aerich import Command
+from aerich.coder import decoder, encoder
+from aerich.models import Aerich
+from aerich.utils import get_models_describe
 from fastapi import FastAPI
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
+from tortoise import Tortoise
+from tortoise.exceptions import OperationalError
 from tortoise.expressions import Q
 
+from base.common.instrument import instrument_queries
+from base.common.model_cache import close_model_cache, install_model_cache
+from base.common.pool import instrument_pools
 from base.common.setting import settings
 
-async def init_db():
-    command = Command(tortoise_config=settings.TORTOISE_ORM)
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+APP_LABEL = "models"
+MIGRATIONS_LOCATION = "./migrations"
+# 由 serve 命令在启动 worker 前执行迁移, 并为 worker 设置此环境变量跳过迁移
+SKIP_MIGRATIONS_ENV = "AIPANEL_SKIP_MIGRATIONS"
+
+
+def models_fingerprint(content: dict) -> str:
+    """计算模型描述的稳定哈希 (与 aerich 存储格式一致地编码后排序)"""
+    normalized = json.loads(encoder(content))
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _latest_migration_file() -> str | None:
+    """本地最新的迁移文件名"""
+    migrations_dir = Path(MIGRATIONS_LOCATION, APP_LABEL)
+    if not migrations_dir.exists():
+        return None
+    versions = [
+        file.name for file in migrations_dir.glob("*.py")
+        if file.name.split("_", 1)[0].isdigit()
+    ]
+    return max(versions, key=lambda name: int(name.split("_", 1)[0]), default=None)
+
+
+async def is_schema_up_to_date() -> bool:
+    """
+    用一次查询判断数据库是否已是最新结构
+
+    读取 aerich 最后一次应用的版本, 比较其模型描述哈希与当前 get_model_list()
+    加载的模型描述哈希, 并确认本地没有更新的迁移文件未应用。
+    """
+    try:
+        last_version = await Aerich.filter(app=APP_LABEL).order_by("-id").first()
+    except OperationalError:
+        return False
+    if last_version is None:
+        return False
+    if last_version.version != _latest_migration_file():
+        return False
+    content = last_version.content
+    if isinstance(content, (str, bytes)):
+        content = decoder(content)
+    return models_fingerprint(content) == models_fingerprint(get_models_describe(APP_LABEL))
+
+
+def _migration_lock_key() -> int:
+    """按数据库名生成固定的 advisory lock 键"""
+    credentials = _default_connection_config().get("credentials", {})
+    return zlib.crc32(f"aerich:{credentials.get('database', '')}".encode("utf-8"))
+
+
+def _default_connection_config() -> dict:
+    app_config = settings.TORTOISE_ORM["apps"][APP_LABEL]
+    return settings.TORTOISE_ORM["connections"][app_config["default_connection"]]
+
+
+@asynccontextmanager
+async def migration_lock():
+    """
+    迁移互斥锁
+
+    PostgreSQL 使用独立连接上的 pg_advisory_lock, 其余数据库使用文件锁,
+    保证多个 worker 中只有一个执行迁移, 其他 worker 阻塞等待。
+    """
+    connection_config = _default_connection_config()
+    if connection_config.get("engine") == "tortoise.backends.asyncpg":
+        import asyncpg
+
+        credentials = connection_config["credentials"]
+        connection = await asyncpg.connect(
+            host=credentials.get("host"),
+            port=credentials.get("port"),
+            user=credentials.get("user"),
+            password=credentials.get("password"),
+            database=credentials.get("database"),
+        )
+        key = _migration_lock_key()
+        try:
+            await connection.execute("SELECT pg_advisory_lock($1)", key)
+            try:
+                yield
+            finally:
+                await connection.execute("SELECT pg_advisory_unlock($1)", key)
+        finally:
+            await connection.close()
+    elif fcntl is not None:
+        lock_path = Path(MIGRATIONS_LOCATION)
+        lock_path.mkdir(parents=True, exist_ok=True)
+        with open(lock_path / ".migrate.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+async def run_migrations():
+    command = Command(tortoise_config=settings.TORTOISE_ORM, app=APP_LABEL, location=MIGRATIONS_LOCATION)
     try:
         await command.init_db(safe=True)
     except FileExistsError:
         pass
 
     await command.init()
+    # 先执行本地已有但未应用的迁移文件, 再对比模型生成新迁移: 否则 migrate 生成的同号迁移
+    # 会覆盖手写迁移 (如 operation_log 分区表), 空库时也不再因没有历史而重建迁移目录
+    if await command.upgrade(run_in_transaction=True):
+        # 重新读取最新版本的模型描述
+        await command.init()
     try:
         await command.migrate()
     except AttributeError:
-        logging.warning("unable to retrieve model history from database, model history will be created from scratch")
-        shutil.rmtree("migrations")
-        await command.init_db(safe=True)
+        # 不再删除迁移目录重建: 目录中有手写迁移 (如 operation_log 分区表), 重建会丢失它们
+        logging.error(
+            "unable to retrieve model history from the aerich table, "
+            "restore the aerich table (its latest row holds the model history) and restart"
+        )
+        raise
 
     await command.upgrade(run_in_transaction=True)
-    
+
+
+async def init_db():
+    """
+    初始化数据库并按 settings.DB_MIGRATE_MODE 处理迁移
+
+    - off: 只初始化连接
+    - always: 每次启动都执行 aerich init/migrate/upgrade (旧行为)
+    - fast: 先用一次查询比较模型哈希, 无变化时跳过全部迁移工作;
+      有变化时在迁移锁内执行, 等锁的 worker 拿到锁后再次检查, 避免重复迁移
+
+    设置了 SKIP_MIGRATIONS_ENV 环境变量时按 off 处理。
+    """
+    mode = "off" if os.environ.get(SKIP_MIGRATIONS_ENV) == "1" else settings.DB_MIGRATE_MODE
+    if mode == "always":
+        await run_migrations()
+        return
+
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    if mode == "off":
+        return
+    if await is_schema_up_to_date():
+        logging.info("database schema is up to date, skip migrations")
+        return
+
+    async with migration_lock():
+        # 等待锁期间可能已由其他 worker 完成迁移
+        if await is_schema_up_to_date():
+            logging.info("database schema migrated by another worker")
+            return
+        await run_migrations()
+
+
 async def init_data():
-    await init_db()
\ No newline at end of file
+    await init_db()
+    instrument_pools()
+    instrument_queries()
+    await install_model_cache()
+
+
+async def close_data():
+    await close_model_cache()
+    await Tortoise.close_connections()
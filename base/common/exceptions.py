@@ -8,6 +8,8 @@ from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from tortoise.exceptions import DoesNotExist, IntegrityError
 
+from base.common.pool import PoolAcquireTimeout
+
 
 
 class SettingNotFound(Exception):
@@ -44,9 +46,14 @@ async def ResponseValidationHandle(_: Request, exc: ResponseValidationError) ->
     content = dict(code=500, msg=f"ResponseValidationError, {exc}")
     return JSONResponse(content=content, status_code=500)
 
+async def PoolAcquireTimeoutHandle(_: Request, exc: PoolAcquireTimeout) -> JSONResponse:
+    content = dict(code=503, msg=f"PoolAcquireTimeout, {exc}")
+    return JSONResponse(content=content, status_code=503)
+
 def register_exceptions(app: FastAPI):
     app.add_exception_handler(DoesNotExist, DoesNotExistHandle)
     app.add_exception_handler(HTTPException, HttpExcHandle)
     app.add_exception_handler(IntegrityError, IntegrityHandle)
     app.add_exception_handler(RequestValidationError, RequestValidationHandle)
-    app.add_exception_handler(ResponseValidationError, ResponseValidationHandle)
\ No newline at end of file
+    app.add_exception_handler(ResponseValidationError, ResponseValidationHandle)
+    app.add_exception_handler(PoolAcquireTimeout, PoolAcquireTimeoutHandle)
\ No newline at end of file
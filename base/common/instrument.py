@@ -0,0 +1,141 @@
+import time
+from contextvars import ContextVar, Token
+from functools import wraps
+from typing import Any, Callable
+
+from tortoise import connections
+
+from base.common.log import log
+from base.common.setting import settings
+
+# 需要统计的客户端执行方法
+EXECUTE_METHODS = ("execute_query", "execute_query_dict", "execute_insert", "execute_many", "execute_script")
+
+
+class QueryStats:
+    """单个请求内的 SQL 执行统计"""
+
+    __slots__ = ("count", "total_ms", "slowest_ms", "slowest_sql", "statements")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql: str | None = None
+        # {参数化 SQL: 执行次数}
+        self.statements: dict[str, int] = {}
+
+    def record(self, sql: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = sql
+        self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """执行次数超过阈值的语句 (疑似 N+1), 按次数降序"""
+        return sorted(
+            ((sql, count) for sql, count in self.statements.items() if count > threshold),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def server_timing(self) -> str:
+        """Server-Timing 头的 db 部分"""
+        return (
+            f'db;dur={self.total_ms:.3f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_ms:.3f}"
+        )
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def begin_query_stats() -> tuple[QueryStats, Token]:
+    """为当前请求开启 SQL 统计"""
+    stats = QueryStats()
+    return stats, _query_stats.set(stats)
+
+
+def end_query_stats(token: Token) -> None:
+    _query_stats.reset(token)
+
+
+def current_query_stats() -> QueryStats | None:
+    return _query_stats.get()
+
+
+class RequestTimings:
+    """单个请求的标识与阶段耗时 (序列化耗时由 response.json_dumps 累加)"""
+
+    __slots__ = ("request_id", "started", "serialize_ms")
+
+    def __init__(self, request_id: str) -> None:
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.serialize_ms = 0.0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Server-Timing 头的 handler/serialize 部分, 在响应开始时调用"""
+        serialize_ms = self.serialize_ms
+        return f"handler;dur={self.elapsed_ms() - serialize_ms:.3f}, serialize;dur={serialize_ms:.3f}"
+
+
+_request_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def begin_request_timings(request_id: str) -> tuple[RequestTimings, Token]:
+    timings = RequestTimings(request_id)
+    return timings, _request_timings.set(timings)
+
+
+def end_request_timings(token: Token) -> None:
+    _request_timings.reset(token)
+
+
+def current_request_timings() -> RequestTimings | None:
+    return _request_timings.get()
+
+
+def _wrap_execute(method: Callable) -> Callable:
+    @wraps(method)
+    async def instrumented(self: Any, query: str, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await method(self, query, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats = _query_stats.get()
+            if stats is not None:
+                stats.record(query, elapsed_ms)
+            if elapsed_ms >= settings.SLOW_QUERY_MS:
+                log.warning(f"慢查询 {elapsed_ms:.1f}ms [{self.connection_name}]: {query}")
+
+    instrumented.__query_instrumented__ = True
+    return instrumented
+
+
+def _instrument_class(client_class: type) -> None:
+    for klass in (client_class, *client_class.__subclasses__()):
+        for name in EXECUTE_METHODS:
+            method = klass.__dict__.get(name)
+            if method is not None and not getattr(method, "__query_instrumented__", False):
+                setattr(klass, name, _wrap_execute(method))
+        if klass is not client_class:
+            _instrument_class(klass)
+
+
+def instrument_queries() -> None:
+    """
+    为所有连接的客户端类安装 SQL 执行统计 (需在 Tortoise.init 之后调用)
+
+    在类上包装执行方法, 事务中创建的 TransactionWrapper 子类同样生效。
+    """
+    if not settings.SQL_INSTRUMENT:
+        return
+    for client in connections.all():
+        _instrument_class(type(client))
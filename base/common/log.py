@@ -1,6 +1,17 @@
+import inspect
 import logging
+import random
 import sys
 import atexit
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+import orjson
 from typing_extensions import override
 from loguru import logger
 from base.common.setting import settings
@@ -9,6 +20,36 @@ from base.common.setting import settings
 # 全局变量记录日志处理器ID
 _logger_handlers = []
 
+ACCESS_LOGGER = "uvicorn.access"
+
+# 标准库级别名称 -> loguru 级别 (未注册的级别名称记为级别数值)
+_levels: dict[str, str | int] = {}
+# 热点日志器的当前记录, 由 _stdlib_origin 读取
+_origin = threading.local()
+
+
+def _loguru_level(record: logging.LogRecord) -> str | int:
+    level = _levels.get(record.levelname)
+    if level is None:
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        _levels[record.levelname] = level
+    return level
+
+
+def _stdlib_origin(record: dict) -> None:
+    """用标准库 LogRecord 中已有的模块、函数和行号代替逐帧查找调用位置"""
+    origin = getattr(_origin, "record", None)
+    if origin is not None:
+        record["name"] = origin.name
+        record["function"] = origin.funcName
+        record["line"] = origin.lineno
+
+
+_hot_logger = logger.patch(_stdlib_origin)
+
 
 class InterceptHandler(logging.Handler):
     """
@@ -18,18 +59,39 @@ class InterceptHandler(logging.Handler):
     1. 继承自 logging.Handler
     2. 重写 emit 方法处理日志记录
     3. 将标准库日志转换为 Loguru 格式
+
+    settings.LOG_HOT_LOGGERS 中的日志器 (如 uvicorn 访问日志) 每个请求都会输出, 直接使用
+    LogRecord 自带的调用位置, 不再逐帧查找; 访问日志按 settings.LOG_ACCESS_SAMPLE 采样,
+    状态码 >= 400 的请求总是记录。
     """
+
+    sampled_out = 0
+
+    def __init__(self, level: int | str = logging.NOTSET) -> None:
+        super().__init__(level)
+        self.hot_loggers = frozenset(settings.LOG_HOT_LOGGERS)
+        self.access_sample = settings.LOG_ACCESS_SAMPLE
+
     @override
     def emit(self, record: logging.LogRecord) -> None:
-        # 尝试获取日志级别名称
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
+        name = record.name
+        if name == ACCESS_LOGGER and self.access_sample < 1.0 and not self._keep_access(record):
+            InterceptHandler.sampled_out += 1
+            return
+        level = _loguru_level(record)
+
+        if name in self.hot_loggers:
+            _origin.record = record
+            try:
+                hot_logger = _hot_logger if record.exc_info is None else _hot_logger.opt(exception=record.exc_info)
+                hot_logger.log(level, record.getMessage())
+            finally:
+                _origin.record = None
+            return
 
         # 获取调用帧信息，增加None检查
-        frame, depth = logging.currentframe(), 2
-        while frame and frame.f_code.co_filename == logging.__file__:
+        frame, depth = inspect.currentframe(), 0
+        while frame and (depth == 0 or frame.f_code.co_filename == logging.__file__):
             frame = frame.f_back
             depth += 1
 
@@ -38,14 +100,149 @@ class InterceptHandler(logging.Handler):
             level,
             record.getMessage()
         )
-        
+
+    def _keep_access(self, record: logging.LogRecord) -> bool:
+        # uvicorn 访问日志参数: (客户端地址, 方法, 路径, HTTP 版本, 状态码)
+        args = record.args
+        if isinstance(args, tuple) and len(args) >= 5 and isinstance(args[4], int) and args[4] >= 400:
+            return True
+        return random.random() < self.access_sample
+
+
+class JsonLogSink:
+    """
+    高吞吐日志 sink (settings.LOG_MODE = "fast")
+
+    记录在调用线程中序列化为 JSON 行放入有界环形缓冲后立即返回, 不经过 loguru enqueue 的
+    跨进程队列 (每条记录都要 pickle); 后台线程每隔 LOG_FLUSH_INTERVAL 秒或积累
+    LOG_BATCH_SIZE 条时一次性写入按天命名的文件。缓冲满时丢弃最旧的记录并计数,
+    磁盘变慢只会丢日志, 不会阻塞请求。
+    """
+
+    def __init__(self, directory: Path, size: int, flush_interval: float, batch_size: int, retention: int) -> None:
+        self.directory = directory
+        self.buffer: deque[bytes] = deque(maxlen=max(1, size))
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.retention = retention
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._file = None
+        self._file_date: date | None = None
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.last_flush_ms = 0.0
+        self._thread.start()
+
+    def __call__(self, message: Any) -> None:
+        # loguru 对同一 handler 的调用已加锁, 这里只需保证与写入线程之间的安全 (deque 操作是原子的)
+        record = message.record
+        data = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "name": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+            **record["extra"],
+        }
+        exception = record["exception"]
+        if exception is not None:
+            data["exception"] = "".join(traceback.format_exception(exception.type, exception.value, exception.traceback))
+        line = orjson.dumps(data, default=str) + b"\n"
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(line)
+        self.enqueued += 1
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._closing:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """写出调用时缓冲中的记录"""
+        count = len(self.buffer)
+        if not count:
+            return
+        started = time.perf_counter()
+        lines = []
+        for _ in range(count):
+            try:
+                lines.append(self.buffer.popleft())
+            except IndexError:
+                break
+        try:
+            self._target().write(b"".join(lines))
+            self._file.flush()
+        except Exception as e:
+            self.write_errors += 1
+            self.dropped += len(lines)
+            print(f"写入日志文件失败, 丢弃 {len(lines)} 条记录: {e}", file=sys.stderr)
+        else:
+            self.written += len(lines)
+            self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _target(self):
+        today = date.today()
+        if self._file is None or self._file_date != today:
+            if self._file is not None:
+                self._file.close()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.directory / f"app-{today:%Y-%m-%d}.jsonl", "ab")
+            self._file_date = today
+            self._clean(today)
+        return self._file
+
+    def _clean(self, today: date) -> None:
+        if self.retention <= 0:
+            return
+        oldest = f"app-{today - timedelta(days=self.retention):%Y-%m-%d}.jsonl"
+        for file in self.directory.glob("app-*.jsonl"):
+            # 文件名按日期补零, 可以直接按字符串比较
+            if file.name < oldest:
+                file.unlink(missing_ok=True)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """停止写入线程并写出剩余记录"""
+        self._closing = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": len(self.buffer),
+            "capacity": self.buffer.maxlen,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+_json_sink: JsonLogSink | None = None
+
 
 def cleanup_logging():
     """
     清理日志资源
     在程序退出时调用,确保所有日志处理器被正确关闭
     """
-    global _logger_handlers
+    global _logger_handlers, _json_sink
     
     for handler_id in _logger_handlers:
         try:
@@ -54,6 +251,9 @@ def cleanup_logging():
             pass
     
     _logger_handlers.clear()
+    if _json_sink is not None:
+        _json_sink.close()
+        _json_sink = None
 
 
 def setup_logging():
@@ -65,11 +265,14 @@ def setup_logging():
     2. 文件日志轮转
     3. 错误日志单独存储
     4. 智能异步策略：开发环境同步(避免reload资源泄漏)，生产环境异步(高性能)
+    5. settings.LOG_MODE = "fast" 时文件日志改为 JSON 行, 经 JsonLogSink 的环形缓冲由后台线程批量写入
     """
-    global _logger_handlers
+    global _logger_handlers, _json_sink
+    cleanup_logging()
     
     # 添加上下文信息
-    _ = logger.configure(extra={"app_name": settings.APP_NAME})
+    # request_id 由请求中间件通过 logger.contextualize 绑定, 请求之外为 "-"
+    _ = logger.configure(extra={"app_name": settings.app_name, "request_id": "-"})
     # 步骤1：移除默认处理器
     logger.remove()
 
@@ -79,6 +282,8 @@ def setup_logging():
         "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
         # 日志级别，居中对齐
         "<level>{level: <8}</level> | "
+        # 请求 ID
+        "<magenta>{extra[request_id]}</magenta> | "
         # 文件、函数和行号
         "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
         # 日志消息
@@ -86,52 +291,66 @@ def setup_logging():
     )
 
     # 智能选择异步策略：开发环境禁用异步(避免reload时资源泄漏)，生产环境启用异步(提升性能)
-    use_async = not settings.debug
+    # fast 模式不使用 enqueue (每条记录 pickle 后经进程间队列传递), 文件日志由 JsonLogSink 异步写入
+    fast = settings.LOG_MODE == "fast"
+    use_async = not settings.debug and not fast
     
     # 步骤3：配置控制台输出
-    handler_id = logger.add(
-        sys.stdout,
-        format=log_format,
-        level="DEBUG" if settings.debug else "INFO",
-        enqueue=use_async,   # 开发同步,生产异步
-        backtrace=True,      # 显示完整的异常回溯
-        diagnose=True,       # 显示变量值等诊断信息
-        colorize=True        # 启用彩色输出
-    )
-    _logger_handlers.append(handler_id)
+    if settings.LOG_CONSOLE:
+        handler_id = logger.add(
+            sys.stdout,
+            format=log_format,
+            level="DEBUG" if settings.debug else "INFO",
+            enqueue=use_async,   # 开发同步,生产异步
+            backtrace=True,      # 显示完整的异常回溯
+            diagnose=True,       # 显示变量值等诊断信息
+            colorize=True        # 启用彩色输出
+        )
+        _logger_handlers.append(handler_id)
 
     # 步骤4：创建日志目录
-    log_dir = settings.LOG_DIR
+    log_dir = Path(settings.LOG_DIR)
     # 确保日志目录存在,如果不存在则创建
     log_dir.mkdir(parents=True, exist_ok=True)
 
-    # 步骤5：配置常规日志文件
-    handler_id = logger.add(
-        str(log_dir / "info.log"),
-        format=log_format,
-        level="INFO",
-        rotation="00:00",  # 每天午夜轮转
-        retention=30,      # 日志保留天数，超过此天数的日志文件将被自动清理
-        compression="gz",
-        encoding="utf-8",
-        enqueue=use_async  # 开发同步,生产异步
-    )
-    _logger_handlers.append(handler_id)
-
-    # 步骤6：配置错误日志文件
-    handler_id = logger.add(
-        str(log_dir / "error.log"),
-        format=log_format,
-        level="ERROR",
-        rotation="00:00",  # 每天午夜轮转
-        retention=30,      # 日志保留天数，超过此天数的日志文件将被自动清理
-        compression="gz",
-        encoding="utf-8",
-        enqueue=use_async, # 开发同步,生产异步
-        backtrace=True,
-        diagnose=True
-    )
-    _logger_handlers.append(handler_id)
+    if fast:
+        _json_sink = JsonLogSink(
+            log_dir,
+            size=settings.LOG_BUFFER_SIZE,
+            flush_interval=settings.LOG_FLUSH_INTERVAL,
+            batch_size=settings.LOG_BATCH_SIZE,
+            retention=settings.LOG_RETENTION_DAYS,
+        )
+        handler_id = logger.add(_json_sink, format="{message}", level=settings.LOG_LEVEL, catch=True)
+        _logger_handlers.append(handler_id)
+    else:
+        # 步骤5：配置常规日志文件
+        handler_id = logger.add(
+            str(log_dir / "info.log"),
+            format=log_format,
+            level=settings.LOG_LEVEL,
+            rotation="00:00",  # 每天午夜轮转
+            retention=30,      # 日志保留天数，超过此天数的日志文件将被自动清理
+            compression="gz",
+            encoding="utf-8",
+            enqueue=use_async  # 开发同步,生产异步
+        )
+        _logger_handlers.append(handler_id)
+
+        # 步骤6：配置错误日志文件
+        handler_id = logger.add(
+            str(log_dir / "error.log"),
+            format=log_format,
+            level="ERROR",
+            rotation="00:00",  # 每天午夜轮转
+            retention=30,      # 日志保留天数，超过此天数的日志文件将被自动清理
+            compression="gz",
+            encoding="utf-8",
+            enqueue=use_async, # 开发同步,生产异步
+            backtrace=True,
+            diagnose=True
+        )
+        _logger_handlers.append(handler_id)
 
     # 步骤7：配置标准库日志
     logging.basicConfig(handlers=[InterceptHandler()], level="DEBUG" if settings.debug else "INFO", force=True)
@@ -146,4 +365,14 @@ def setup_logging():
     # 注册退出清理函数
     atexit.register(cleanup_logging)
 
+
+def get_log_stats() -> dict[str, Any]:
+    return {
+        "mode": settings.LOG_MODE,
+        "access_sample": settings.LOG_ACCESS_SAMPLE,
+        "access_sampled_out": InterceptHandler.sampled_out,
+        "sink": _json_sink.stats() if _json_sink is not None else None,
+    }
+
+
 log = logger
\ No newline at end of file
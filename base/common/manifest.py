@@ -0,0 +1,124 @@
+import hashlib
+import importlib
+import json
+import os
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from base.common.setting import settings
+
+MANIFEST_VERSION = 2
+# 参与指纹计算的目录 (相对项目根目录)
+SCAN_ROOTS = ("base/core", "base/plugins")
+
+# {模块名: 导入耗时(毫秒)}, 记录本进程发现阶段导入的模块
+_import_timings: dict[str, float] = {}
+
+
+def timed_import(module_name: str) -> ModuleType:
+    """导入模块并记录耗时 (已导入的模块不重复计时)"""
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _import_timings.setdefault(module_name, elapsed_ms)
+    return module
+
+
+def get_import_timings() -> dict[str, float]:
+    """发现阶段各模块的导入耗时, 按耗时降序"""
+    return {
+        name: round(elapsed_ms, 3)
+        for name, elapsed_ms in sorted(_import_timings.items(), key=lambda item: item[1], reverse=True)
+    }
+
+
+def import_mark() -> int:
+    """当前已记录的模块数, 配合 report_import_timings 统计某个阶段导入的模块"""
+    return len(_import_timings)
+
+
+def report_import_timings(title: str, mark: int = 0) -> None:
+    """打印 mark 之后导入的模块耗时, 超过 settings.DISCOVERY_SLOW_IMPORT_MS 的模块单独标出"""
+    timings = list(_import_timings.items())[mark:]
+    total = sum(elapsed_ms for _, elapsed_ms in timings)
+    print(f"⏱️ {title}: 导入 {len(timings)} 个模块, 耗时 {total:.1f}ms")
+    for name, elapsed_ms in sorted(timings, key=lambda item: item[1], reverse=True):
+        if elapsed_ms >= settings.DISCOVERY_SLOW_IMPORT_MS:
+            print(f"    🐢 {name}: {elapsed_ms:.1f}ms")
+
+
+def source_fingerprint(roots: tuple[str, ...] = SCAN_ROOTS) -> str:
+    """
+    业务模块源码指纹
+
+    只读取目录项的修改时间与大小, 不导入任何模块; 新增/删除/修改文件都会改变指纹。
+    """
+    digest = hashlib.sha1()
+    for root in roots:
+        root_path = settings.base_path / root
+        if not root_path.exists():
+            continue
+        for dir_path, dir_names, file_names in os.walk(root_path):
+            dir_names[:] = sorted(name for name in dir_names if name != "__pycache__")
+            for file_name in sorted(file_names):
+                if file_name.endswith((".pyc", ".pyo")):
+                    continue
+                stat = os.stat(os.path.join(dir_path, file_name))
+                relative = os.path.relpath(os.path.join(dir_path, file_name), settings.base_path)
+                digest.update(f"{relative}:{stat.st_mtime_ns}:{stat.st_size}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DiscoveryManifest:
+    """
+    路由/中间件发现清单
+
+    记录上次完整扫描时发现路由和中间件的模块, 源码指纹不变时启动只导入这些模块;
+    指纹变化 (文件新增/删除/修改) 时清单失效, 由下一次完整扫描重建。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.fingerprint = source_fingerprint()
+        self.sections: dict[str, Any] = {}
+        self.fresh = False
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION and data.get("fingerprint") == self.fingerprint:
+            self.sections = data.get("sections", {})
+            self.fresh = True
+
+    def get(self, section: str) -> Any:
+        """读取未失效的清单节, 失效或不存在时返回 None"""
+        return self.sections.get(section) if self.fresh else None
+
+    def update(self, section: str, value: Any) -> None:
+        """写入清单节 (先写临时文件再替换, 多进程同时写入时不会读到半个文件)"""
+        self.sections[section] = value
+        self.fresh = True
+        data = {"version": MANIFEST_VERSION, "fingerprint": self.fingerprint, "sections": self.sections}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ 写入发现清单失败 {self.path}: {e}")
+
+
+_manifest: DiscoveryManifest | None = None
+
+
+def get_manifest() -> DiscoveryManifest | None:
+    """当前进程的发现清单, 未启用时返回 None"""
+    global _manifest
+    if not settings.DISCOVERY_MANIFEST:
+        return None
+    if _manifest is None:
+        _manifest = DiscoveryManifest(Path(settings.DISCOVERY_MANIFEST_PATH))
+        print(f"📋 发现清单: {'命中' if _manifest.fresh else '失效, 将完整扫描并重建'} ({_manifest.path})")
+    return _manifest
@@ -0,0 +1,96 @@
+from bisect import bisect_left
+from typing import Any, Sequence
+
+# 默认耗时分桶上界(毫秒)
+DEFAULT_BUCKETS_MS: tuple[float, ...] = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """
+    固定分桶直方图
+
+    只做计数自增, 不加锁: 在单个事件循环线程内调用, 开销为一次二分查找。
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS) -> None:
+        self.buckets = tuple(buckets)
+        # 最后一个位置为 +Inf 桶
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """按分桶上界估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "max": round(self.max, 3),
+            "avg": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class RouteLatency:
+    """
+    按路由模板统计请求耗时
+
+    键为 "<METHOD> <路由模板>" (如 GET /api/v1/users/{user_id}), 未匹配路由的请求合并为
+    UNMATCHED, 键的数量与路由数量相同, 不随请求路径增长。同样只在事件循环线程内更新, 不加锁。
+    """
+
+    UNMATCHED = "unmatched"
+
+    __slots__ = ("histograms", "errors")
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, Histogram] = {}
+        # 5xx 响应数
+        self.errors: dict[str, int] = {}
+
+    def observe(self, key: str, elapsed_ms: float, status_code: int) -> None:
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(elapsed_ms)
+        if status_code >= 500:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def snapshot(self, top: int | None = None) -> list[dict[str, Any]]:
+        """按请求数降序返回各路由的统计"""
+        keys = sorted(self.histograms, key=lambda key: self.histograms[key].count, reverse=True)
+        return [
+            {"route": key, "errors": self.errors.get(key, 0), **self.histograms[key].snapshot()}
+            for key in keys[:top]
+        ]
+
+
+route_latency = RouteLatency()
@@ -1,14 +1,33 @@
 import os
+import re
+import time
+import uuid
+import asyncio
 import importlib
 import pkgutil
 import inspect
 from fastapi import FastAPI
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.types import ASGIApp
+from collections import deque
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette.middleware.base import BaseHTTPMiddleware
 from pathlib import Path
-from typing import List, Optional, Callable, Dict, Any
+from typing import List, Optional, Callable, Dict, Any, AsyncIterator, Awaitable, Union
+from . import compression
+from .instrument import begin_query_stats, begin_request_timings, end_query_stats, end_request_timings
+from .log import log
+from .metrics import RouteLatency, route_latency
+from .operation_log import build_record, operation_log_writer
+from .manifest import get_manifest, import_mark, report_import_timings, timed_import
+from .constant import RET
+from .plugin import load_plugin_specs, plugin_registry
+from .ratelimit import get_rate_limiter
+from .replica import begin_request, end_request, write_cookie_header
+from .response import ErrorResponse
 from .setting import settings
 
 class CustomCORSMiddleware(CORSMiddleware):
@@ -23,9 +42,555 @@ class CustomCORSMiddleware(CORSMiddleware):
             expose_headers=settings.CORS_EXPOSE_HEADERS,
         )
 
+class ReplicaRoutingMiddleware:
+    """
+    读写分离中间件: 为每个 HTTP 请求建立数据库路由状态 (纯 ASGI 实现)
+
+    发送响应头之前写过主库的请求附带读己之写标记 cookie, 随后落到任一 worker 的读请求都走主库。
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = begin_request(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                cookie = write_cookie_header()
+                if cookie is not None:
+                    message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+
+class QueryStatsMiddleware:
+    """
+    SQL 统计中间件: 记录每个请求的 SQL 次数、总耗时与最慢语句 (纯 ASGI 实现)
+
+    统计结果写入 Server-Timing 响应头; 同一语句执行次数超过
+    settings.N_PLUS_ONE_THRESHOLD 时记录 N+1 告警。
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = begin_query_stats()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_query_stats(token)
+            for sql, count in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+                log.warning(f"疑似 N+1 查询: {scope['method']} {scope['path']} 执行 {count} 次: {sql}")
+
+class LazyPluginMiddleware:
+    """延迟插件中间件: 请求路径命中未加载插件的前缀时先加载插件再处理请求 (纯 ASGI 实现)"""
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if plugin_registry.pending and scope["type"] in ("http", "websocket"):
+            spec = plugin_registry.match(scope["path"])
+            if spec is not None:
+                await plugin_registry.activate(scope["app"], spec)
+        await self.app(scope, receive, send)
+
+# 客户端传入的请求 ID 只接受有限长度的安全字符, 否则重新生成
+_REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+class RequestContextMiddleware:
+    """
+    请求上下文中间件 (纯 ASGI 实现, 位于最外层)
+    
+    - 沿用客户端传入的 X-Request-ID 或生成新的 ID, 写入响应头、request.state.request_id,
+      并通过 logger.contextualize 绑定到请求内的所有日志
+    - 响应开始时输出 Server-Timing: handler (处理耗时, 含 SQL) 与 serialize (JSON 序列化耗时),
+      db 部分由 QueryStatsMiddleware 追加
+    - 响应结束后按路由模板记录耗时直方图 (settings.REQUEST_METRICS)
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.header = settings.REQUEST_ID_HEADER.lower().encode("latin-1")
+        self.metrics = settings.REQUEST_METRICS
+
+    def _request_id(self, scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                request_id = value.decode("latin-1")
+                if _REQUEST_ID_PATTERN.fullmatch(request_id):
+                    return request_id
+                break
+        return uuid.uuid4().hex
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = self._request_id(scope)
+        scope.setdefault("state", {})["request_id"] = request_id
+        timings, token = begin_request_timings(request_id)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(settings.REQUEST_ID_HEADER, request_id)
+                if self.metrics:
+                    headers.append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            with log.contextualize(request_id=request_id):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request_timings(token)
+            if self.metrics:
+                route = scope.get("route")
+                key = f"{scope['method']} {route.path}" if route is not None else RouteLatency.UNMATCHED
+                route_latency.observe(key, timings.elapsed_ms(), status_code)
+
+class RateLimitMiddleware:
+    """限流中间件: 令牌不足时返回 429 与 Retry-After (纯 ASGI 实现), 429 响应同样经过 CORS 处理"""
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.limiter = get_rate_limiter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        kind, wait = self.limiter.check(scope)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+        response = ErrorResponse(
+            msg=RET.RATE_LIMIT_EXCEEDED.msg,
+            code=RET.RATE_LIMIT_EXCEEDED.code,
+            status_code=RET.TOO_MANY_REQUESTS.code,
+        )
+        response.headers["Retry-After"] = str(max(1, int(wait + 0.999)))
+        response.headers["X-RateLimit-Scope"] = kind
+        # 限流位于 CORS 中间件外层, 429 需要自行带上 CORS 响应头, 浏览器才能读取 Retry-After
+        await CustomCORSMiddleware(response)(scope, receive, send)
+
+class _CompressionResponder:
+    """
+    压缩单个响应
+    
+    单条消息的响应整体压缩; 多条消息的可缓存响应在 Content-Length 不超过
+    settings.GZIP_CACHE_MAX_ITEM 时缓冲后整体压缩并复用缓存, 其余逐块流式压缩。
+    """
+    __slots__ = ("send", "start", "mode", "chunks", "stream")
+
+    def __init__(self, send: Send) -> None:
+        self.send = send
+        self.start: Optional[Message] = None
+        # pass: 原样转发; pending: 等待第一个响应体; buffer: 缓冲整个响应体; stream: 流式压缩
+        self.mode = "pass"
+        self.chunks: List[bytes] = []
+        self.stream: Optional[compression.StreamCompressor] = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message.get("headers", []))
+            status = message["status"]
+            if (200 <= status < 300 and status not in (204, 206)
+                    and "content-encoding" not in headers
+                    and compression.compressible(headers.get("content-type", ""))):
+                self.start = message
+                self.mode = "pending"
+                return
+            compression.stats.skipped += 1
+            await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.mode == "pass":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.mode == "pending":
+            headers = Headers(raw=self.start.get("headers", []))
+            content_length = headers.get("content-length")
+            content_length = int(content_length) if content_length and content_length.isdigit() else None
+            if not more_body:
+                await self._send_whole(body, compression.is_cacheable(headers))
+                return
+            if content_length is not None and content_length < settings.GZIP_MIN_SIZE:
+                self.mode = "pass"
+                compression.stats.skipped += 1
+                await self.send(self.start)
+                await self.send(message)
+                return
+            if (content_length is not None and content_length <= settings.GZIP_CACHE_MAX_ITEM
+                    and compression.is_cacheable(headers)):
+                self.mode = "buffer"
+            else:
+                self.mode = "stream"
+                self.stream = compression.StreamCompressor(compression.choose_level(content_length))
+                self._encode_headers(None)
+                await self.send(self.start)
+
+        if self.mode == "buffer":
+            self.chunks.append(body)
+            if not more_body:
+                await self._send_whole(b"".join(self.chunks), True)
+            return
+        await self.send({
+            "type": "http.response.body",
+            "body": self.stream.compress(body, final=not more_body),
+            "more_body": more_body,
+        })
+
+    async def _send_whole(self, body: bytes, cacheable: bool) -> None:
+        if len(body) < settings.GZIP_MIN_SIZE:
+            compression.stats.skipped += 1
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+        if cacheable:
+            if compression.is_static(Headers(raw=self.start.get("headers", []))):
+                level = settings.GZIP_COMPRESS_LEVEL
+            else:
+                level = compression.choose_level(len(body))
+            data = compression.compress_cached(body, level)
+        else:
+            data = compression.compress(body, compression.choose_level(len(body)))
+        self._encode_headers(len(data))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": data})
+
+    def _encode_headers(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=list(self.start.get("headers", [])))
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        # 压缩后字节不同, 强 ETag 改为弱 ETag
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        self.start = {**self.start, "headers": headers.raw}
+
+class CompressionMiddleware:
+    """
+    Gzip 压缩中间件 (纯 ASGI 实现)
+    
+    只压缩 settings.GZIP_CONTENT_TYPES 中的类型且不小于 GZIP_MIN_SIZE 的响应, 已带
+    Content-Encoding 的响应原样转发。动态响应按大小与 CPU 预算选择级别, 可缓存响应
+    (ETag/Last-Modified/Cache-Control/cached_response) 的压缩结果按响应体复用, 其中静态内容
+    按最高级别压缩, 条件 GET 与 cached_response 的响应同样按大小与 CPU 预算选择级别,
+    流式响应逐块以 Z_SYNC_FLUSH 压缩转发, 不缓冲。
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or scope["method"] == "HEAD"
+                or not compression.accepts_gzip(Headers(scope=scope).get("accept-encoding", ""))):
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressionResponder(send))
+
+class OperationLogMiddleware:
+    """
+    操作日志中间件: settings.OPERATION_LOG_METHODS 中的请求结束后生成一条记录交给
+    operation_log_writer 批量写入, 请求内不执行 SQL (纯 ASGI 实现)
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.methods = frozenset(settings.OPERATION_LOG_METHODS)
+        self.exclude = tuple(settings.OPERATION_LOG_EXCLUDE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self.methods or scope["path"].startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await operation_log_writer.submit(build_record(scope, status_code, (time.perf_counter() - started) * 1000))
+
+class _Channel:
+    """
+    单生产者/单消费者消息通道
+
+    put 在上一条消息被取走前等待 (反压, 流式响应不会在内存中堆积),
+    close 不等待, 保证下游结束或异常时一定能通知到消费者。
+    """
+    __slots__ = ("_items", "_getter", "_putter")
+
+    def __init__(self) -> None:
+        self._items: deque = deque()
+        self._getter: Optional[asyncio.Future] = None
+        self._putter: Optional[asyncio.Future] = None
+
+    @staticmethod
+    def _wake(waiter: Optional[asyncio.Future]) -> None:
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def put(self, item: Any) -> None:
+        while self._items:
+            self._putter = asyncio.get_running_loop().create_future()
+            await self._putter
+        self._items.append(item)
+        self._wake(self._getter)
+
+    def close(self, item: Any) -> None:
+        self._items.append(item)
+        self._wake(self._getter)
+
+    async def get(self) -> Any:
+        while not self._items:
+            self._getter = asyncio.get_running_loop().create_future()
+            await self._getter
+        item = self._items.popleft()
+        self._wake(self._putter)
+        return item
+
+# 下游应用结束的标记
+_DONE = object()
+
+class _DownstreamResponse(Response):
+    """
+    call_next 返回的响应: 状态码和响应头来自下游的 http.response.start,
+    响应体在发送时从通道中逐条转发, 保持下游的流式输出
+
+    与 BaseHTTPMiddleware 一样提供 body_iterator: 中间件读取或替换它之后,
+    按 StreamingResponse 的方式发送迭代器产生的响应体; 未访问时直接转发下游消息。
+    """
+    def __init__(self, start: Message, channel: _Channel, call: "_CallNext") -> None:
+        self.status_code = start["status"]
+        self.raw_headers = list(start.get("headers", []))
+        self.background = None
+        self._start = start
+        self._channel = channel
+        self._call = call
+        self._body_iterator: Optional[AsyncIterator[Union[str, bytes]]] = None
+
+    @property
+    def body_iterator(self) -> AsyncIterator[Union[str, bytes]]:
+        if self._body_iterator is None:
+            self._body_iterator = self._iterate_body()
+        return self._body_iterator
+
+    @body_iterator.setter
+    def body_iterator(self, iterator: AsyncIterator[Union[str, bytes]]) -> None:
+        self._body_iterator = iterator
+
+    async def _iterate_body(self) -> AsyncIterator[bytes]:
+        while True:
+            message = await self._channel.get()
+            if message is _DONE:
+                break
+            if message["type"] == "http.response.body" and message.get("body"):
+                yield message["body"]
+        self._call.raise_error()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # 透传 trailers 等扩展字段, 状态码与响应头以中间件修改后的为准
+        await send({**self._start, "status": self.status_code, "headers": self.raw_headers})
+        if self._body_iterator is not None:
+            async for chunk in self._body_iterator:
+                if not isinstance(chunk, bytes):
+                    chunk = chunk.encode(self.charset)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        while True:
+            message = await self._channel.get()
+            if message is _DONE:
+                break
+            await send(message)
+        self._call.raise_error()
+
+class _CallNext:
+    """函数中间件的 call_next: 在独立任务中运行下游应用, 收到响应头后立即返回"""
+    __slots__ = ("app", "scope", "receive", "task", "error")
+
+    def __init__(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        self.app = app
+        self.scope = scope
+        self.receive = receive
+        self.task: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None
+
+    def _downstream_receive(self, request: Request) -> Receive:
+        """中间件读取过请求体时, 向下游重放请求体"""
+        body = getattr(request, "_body", None)
+        if body is None and not request._stream_consumed:
+            return self.receive
+        replayed = False
+
+        async def receive() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body or b"", "more_body": False}
+            return await self.receive()
+
+        return receive
+
+    async def __call__(self, request: Request) -> Response:
+        if self.task is not None:
+            raise RuntimeError("call_next() can only be called once")
+        channel = _Channel()
+        receive = self._downstream_receive(request)
+
+        async def run() -> None:
+            try:
+                await self.app(self.scope, receive, channel.put)
+            except BaseException as e:
+                self.error = e
+            finally:
+                channel.close(_DONE)
+
+        self.task = asyncio.create_task(run())
+        start = await channel.get()
+        if start is _DONE:
+            self.raise_error()
+            raise RuntimeError("No response returned.")
+        return _DownstreamResponse(start, channel, self)
+
+    def raise_error(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self) -> None:
+        """中间件没有返回下游响应时停止下游任务"""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+class FunctionMiddleware:
+    """
+    函数中间件适配器 (纯 ASGI 实现)
+
+    将 async def mw(request, call_next) 形式的函数编译为 ASGI 中间件, 替代
+    BaseHTTPMiddleware 包装: 不使用 anyio 内存流和响应体重新包装, 只有在函数调用
+    call_next 时才为下游创建一个任务, 流式响应逐块转发。
+    """
+    def __init__(self, app: ASGIApp, dispatch: Callable[[Request, Callable[[Request], Awaitable[Response]]], Awaitable[Response]]) -> None:
+        self.app = app
+        self.dispatch = dispatch
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        call_next = _CallNext(self.app, scope, receive)
+        try:
+            response = await self.dispatch(Request(scope, receive), call_next)
+            await response(scope, receive, send)
+        finally:
+            call_next.cancel()
+
+def _path_segments(path: str) -> List[str]:
+    return [segment for segment in path.split("/") if segment]
+
+class _TrieNode:
+    """路径前缀树节点, entries 为在该前缀登记的中间件序号"""
+    __slots__ = ("children", "entries")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.entries: List[int] = []
+
+class ScopedMiddleware:
+    """
+    按路径前缀/请求方法生效的中间件组 (纯 ASGI 实现)
+
+    声明了 PATHS 或 METHODS 的中间件不包裹整个应用, 而是登记到按路径分段构建的前缀树中。
+    请求沿路径遍历前缀树收集匹配的中间件, 按匹配组合缓存组装好的调用链, 因此请求开销只与
+    相关中间件数量有关, 与安装总数无关。同一中间件在不同调用链中各有一个实例。
+    """
+    def __init__(self, app: ASGIApp, entries: List[Dict]) -> None:
+        self.app = app
+        # entries: [{'middleware_class', 'options', 'paths', 'methods'}], 按注册顺序排列
+        self.entries = entries
+        self.root = _TrieNode()
+        for index, entry in enumerate(entries):
+            for prefix in entry['paths'] or ("/",):
+                node = self.root
+                for segment in _path_segments(prefix):
+                    node = node.children.setdefault(segment, _TrieNode())
+                node.entries.append(index)
+        self._chains: Dict[tuple, ASGIApp] = {(): app}
+
+    def match(self, path: str, method: Optional[str]) -> tuple:
+        """返回匹配的中间件序号 (升序)"""
+        node = self.root
+        matched = list(node.entries)
+        for segment in _path_segments(path):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            matched.extend(node.entries)
+        if not matched:
+            return ()
+        return tuple(sorted({
+            index for index in matched
+            if self.entries[index]['methods'] is None or method in self.entries[index]['methods']
+        }))
+
+    def _chain(self, key: tuple) -> ASGIApp:
+        chain = self._chains.get(key)
+        if chain is None:
+            # 与 add_middleware 顺序一致: 后注册的中间件在外层
+            chain = self.app
+            for index in key:
+                entry = self.entries[index]
+                chain = entry['middleware_class'](chain, **entry['options'])
+            self._chains[key] = chain
+        return chain
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        key = self.match(scope["path"], scope.get("method"))
+        await self._chain(key)(scope, receive, send)
+
 class MiddlewareAutoDiscover:
     """中间件自动发现和注册类 - 支持多模块"""
     
+    # 注册日志前缀
+    REGISTER_LABELS = {
+        'class': '🟦 注册类中间件',
+        'asgi': '🟪 注册ASGI中间件',
+        'function': '🟩 注册函数中间件',
+    }
+    
     def __init__(self, app: FastAPI):
         self.app = app
         self.registered_middleware = []
@@ -40,10 +605,26 @@ class MiddlewareAutoDiscover:
         Returns:
             注册的中间件信息列表
         """
+        manifest = get_manifest()
+        recorded = manifest.get("middleware") if manifest else None
+        discovered: Dict[str, List] = {}
+        mark = import_mark()
         try:
             all_middleware = []
             for base_package in base_packages:
-                base_module = importlib.import_module(base_package)
+                if recorded is not None and base_package in recorded:
+                    # 清单命中: 只导入记录的中间件模块
+                    print(f"📋 按清单加载中间件: {base_package}")
+                    package_middleware = []
+                    for module_name, full_module_path in recorded[base_package]:
+                        package_middleware.extend(self._load_middleware(full_module_path, module_name))
+                    package_middleware.sort(key=lambda x: x.get('priority', 999))
+                    self._register_middlewares(package_middleware)
+                    all_middleware.extend(package_middleware)
+                    continue
+
+                discovered[base_package] = []
+                base_module = timed_import(base_package)
                 base_path = Path(base_module.__path__[0])
                 
                 print(f"🔍 开始扫描基础包: {base_package}")
@@ -63,20 +644,43 @@ class MiddlewareAutoDiscover:
                 
                 
                 # 扫描每个业务模块的middleware目录
+                package_middleware = []
                 for module_name in business_modules:
                     middleware_package = f"{base_package}.{module_name}.middleware"
                     module_middleware = self._discover_module_middleware(middleware_package, module_name)
-                    all_middleware.extend(module_middleware)
+                    package_middleware.extend(module_middleware)
+                    discovered[base_package].extend(
+                        [module_name, mw_info['module_path']] for mw_info in module_middleware
+                    )
                 
-                # 按优先级排序并注册
-                all_middleware.sort(key=lambda x: x.get('priority', 999))
-                self._register_middlewares(all_middleware)
+                # 按优先级排序并注册 (只注册本包的中间件, 避免前一个包的中间件重复注册)
+                package_middleware.sort(key=lambda x: x.get('priority', 999))
+                self._register_middlewares(package_middleware)
+                all_middleware.extend(package_middleware)
             
             return all_middleware
             
         except ImportError as e:
             print(f"❌ 无法导入基础包 {base_package}: {e}")
             return []
+        finally:
+            if manifest and discovered:
+                manifest.update("middleware", {**(recorded or {}), **discovered})
+            report_import_timings("中间件发现", mark)
+    
+    def _load_middleware(self, full_module_path: str, module_name: str) -> List[Dict]:
+        """按清单导入单个中间件模块"""
+        try:
+            middleware_module = timed_import(full_module_path)
+        except ImportError as e:
+            print(f"    ⚠️ 导入失败: {full_module_path} -> {e}")
+            return []
+        middleware_info = self._extract_middleware(middleware_module, full_module_path.rsplit(".", 1)[-1], module_name)
+        if not middleware_info:
+            return []
+        middleware_info['module_path'] = full_module_path
+        print(f"    ✅ 发现中间件: {module_name}.{middleware_info['file_name']}")
+        return [middleware_info]
     
     def _discover_module_middleware(self, middleware_package: str, module_name: str) -> List[Dict]:
         """发现单个业务模块中的中间件"""
@@ -99,10 +703,11 @@ class MiddlewareAutoDiscover:
                     full_module_path = f"{middleware_package}.{middleware_file_name}"
                     
                     try:
-                        middleware_module = importlib.import_module(full_module_path)
+                        middleware_module = timed_import(full_module_path)
                         middleware_info = self._extract_middleware(middleware_module, middleware_file_name, module_name)
                         
                         if middleware_info:
+                            middleware_info['module_path'] = full_module_path
                             module_middleware.append(middleware_info)
                             print(f"    ✅ 发现中间件: {module_name}.{middleware_file_name}")
                             
@@ -126,7 +731,9 @@ class MiddlewareAutoDiscover:
             'type': None,
             'middleware_obj': None,
             'priority': getattr(module, 'PRIORITY', 999),
-            'config': getattr(module, 'CONFIG', {})
+            'config': getattr(module, 'CONFIG', {}),
+            'paths': self._scope_values(getattr(module, 'PATHS', None)),
+            'methods': self._scope_values(getattr(module, 'METHODS', None), str.upper)
         }
         
         # 查找类中间件
@@ -138,6 +745,13 @@ class MiddlewareAutoDiscover:
                 middleware_info['type'] = 'class'
                 return middleware_info
         
+        # 查找本模块定义的原生 ASGI 中间件类
+        for name, obj in inspect.getmembers(module):
+            if getattr(obj, '__module__', None) == module.__name__ and self._is_asgi_middleware(obj):
+                middleware_info['middleware_obj'] = obj
+                middleware_info['type'] = 'asgi'
+                return middleware_info
+        
         # 查找函数中间件
         for name, obj in inspect.getmembers(module):
             if (inspect.isfunction(obj) and 
@@ -156,6 +770,9 @@ class MiddlewareAutoDiscover:
             if inspect.isclass(middleware_obj) and issubclass(middleware_obj, BaseHTTPMiddleware):
                 middleware_info['middleware_obj'] = middleware_obj
                 middleware_info['type'] = 'class'
+            elif self._is_asgi_middleware(middleware_obj):
+                middleware_info['middleware_obj'] = middleware_obj
+                middleware_info['type'] = 'asgi'
             elif inspect.isfunction(middleware_obj):
                 middleware_info['middleware_func'] = middleware_obj
                 middleware_info['type'] = 'function'
@@ -163,44 +780,96 @@ class MiddlewareAutoDiscover:
         
         return None
     
+    @staticmethod
+    def _scope_values(value: Any, normalize: Callable[[str], str] = str) -> Optional[frozenset]:
+        """PATHS/METHODS 可以是字符串或字符串列表, 未声明时返回 None (对所有请求生效)"""
+        if not value:
+            return None
+        if isinstance(value, str):
+            value = [value]
+        return frozenset(normalize(item) for item in value)
+    
+    @staticmethod
+    def _is_asgi_middleware(obj: Any) -> bool:
+        """原生 ASGI 中间件类: __init__(self, app, ...) 与 async __call__(self, scope, receive, send)"""
+        if not inspect.isclass(obj) or issubclass(obj, BaseHTTPMiddleware):
+            return False
+        call = getattr(obj, '__call__', None)
+        if not inspect.iscoroutinefunction(call):
+            return False
+        return list(inspect.signature(call).parameters)[1:] == ['scope', 'receive', 'send']
+    
     def _register_middlewares(self, middleware_list: List[Dict]):
-        """批量注册中间件"""
+        """
+        批量注册中间件
+        
+        未声明 PATHS/METHODS 的中间件包裹整个应用; 声明了的中间件按顺序合并到 ScopedMiddleware 中,
+        连续的多个限定范围中间件共用一个分发器, 与其他中间件的先后顺序保持不变。
+        """
         registered_count = 0
+        scoped_entries = []
         
         for mw_info in middleware_list:
+            label = self.REGISTER_LABELS.get(mw_info['type'])
+            if label is None:
+                continue
             try:
-                if mw_info['type'] == 'class':
-                    # 注册类中间件
-                    self.app.add_middleware(mw_info['middleware_obj'])
-                    registered_count += 1
-                    print(f"    🟦 注册类中间件: {mw_info['module_name']}.{mw_info['file_name']}")
-                    
-                elif mw_info['type'] == 'function':
-                    # 注册函数中间件
-                    self._register_function_middleware(mw_info)
-                    registered_count += 1
-                    print(f"    🟩 注册函数中间件: {mw_info['module_name']}.{mw_info['file_name']}")
+                middleware_class, options = self._middleware_factory(mw_info)
+                if mw_info['paths'] or mw_info['methods']:
+                    scoped_entries.append({
+                        'middleware_class': middleware_class,
+                        'options': options,
+                        'paths': mw_info['paths'],
+                        'methods': mw_info['methods'],
+                    })
+                    scope = f" [路径: {', '.join(sorted(mw_info['paths'] or ['*']))}; 方法: {', '.join(sorted(mw_info['methods'] or ['*']))}]"
+                else:
+                    self._register_scoped(scoped_entries)
+                    scoped_entries = []
+                    self.app.add_middleware(middleware_class, **options)
+                    scope = ""
+                registered_count += 1
+                print(f"    {label}: {mw_info['module_name']}.{mw_info['file_name']}{scope}")
                     
             except Exception as e:
                 print(f"    ❌ 注册失败 {mw_info['module_name']}.{mw_info['file_name']}: {e}")
         
+        self._register_scoped(scoped_entries)
         print(f"✅ 中间件注册完成: 成功 {registered_count} 个, 总数 {len(middleware_list)} 个")
     
-    def _register_function_middleware(self, mw_info: Dict):
-        """注册函数中间件"""
-        func = mw_info['middleware_func']
-        
-        class FunctionMiddleware(BaseHTTPMiddleware):
-            async def dispatch(self, request, call_next):
-                return await func(request, call_next)
-        
-        self.app.add_middleware(FunctionMiddleware)
+    @staticmethod
+    def _middleware_factory(mw_info: Dict) -> tuple:
+        """中间件类与构造参数, 函数中间件编译为纯 ASGI 中间件"""
+        if mw_info['type'] == 'function':
+            return FunctionMiddleware, {'dispatch': mw_info['middleware_func']}
+        return mw_info['middleware_obj'], {}
+    
+    def _register_scoped(self, entries: List[Dict]):
+        if entries:
+            self.app.add_middleware(ScopedMiddleware, entries=entries)
 
 def auto_discover_middleware(app: FastAPI, base_package: List[str] = ["base.core", "base.plugins"]) -> List[Dict]:
     """自动发现中间件（简化入口）"""
     app.add_middleware(CustomCORSMiddleware)
+    if settings.DB_REPLICAS:
+        app.add_middleware(ReplicaRoutingMiddleware)
+    if settings.SQL_INSTRUMENT:
+        app.add_middleware(QueryStatsMiddleware)
+    if any(spec.lazy for spec in load_plugin_specs()):
+        app.add_middleware(LazyPluginMiddleware)
+    if settings.OPERATION_LOG_RECORD:
+        app.add_middleware(OperationLogMiddleware)
     discoverer = MiddlewareAutoDiscover(app)
-    return discoverer.auto_discover_all_modules(base_package)
+    discovered = discoverer.auto_discover_all_modules(base_package)
+    if settings.RATE_LIMIT_ENABLE:
+        # 在业务中间件外层, 被限流的请求不进入后续处理
+        app.add_middleware(RateLimitMiddleware)
+    if settings.GZIP_ENABLE:
+        # 放在业务中间件外层, 业务中间件处理的仍是未压缩的响应
+        app.add_middleware(CompressionMiddleware)
+    # 最外层: 请求 ID 与耗时覆盖所有中间件
+    app.add_middleware(RequestContextMiddleware)
+    return discovered
 
 def register_middlewares(app: FastAPI):
 	"""注册中间件"""
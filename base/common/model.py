@@ -1,53 +1,426 @@
 import asyncio
+from collections import OrderedDict
 from datetime import datetime
+from operator import attrgetter, itemgetter
+from typing import Any, AsyncIterable, Callable, Iterable
 
+from pypika import Table
 from tortoise import fields, models
+from tortoise.expressions import Subquery
+from tortoise.functions import Count, Max
 
+from base.common import model_cache
+from base.common.bulk import BatchReport, BulkUpsertReport, bulk_upsert
+from base.common.pagination import KeysetPage, KeysetPaginator
+from base.common.response import Validator
 from base.common.setting import settings
 
 
+class SerializerPlan:
+    """
+    模型序列化计划
+
+    按 (模型, 排除字段) 预先计算一次需要输出的字段、批量取值器以及需要格式化的
+    日期时间字段, 之后对同一模型的所有实例复用, 避免逐行逐字段的 isinstance 判断。
+    """
+
+    __slots__ = ("fields", "getter", "datetime_indexes")
+
+    def __init__(self, model: type["BaseModel"], exclude_fields: frozenset[str]) -> None:
+        meta = model._meta
+        # 按模型定义顺序输出数据库字段
+        self.fields: tuple[str, ...] = tuple(
+            db_field
+            for db_field in meta.fields_db_projection.values()
+            if db_field in meta.db_fields and db_field not in exclude_fields
+        )
+        getter = attrgetter(*self.fields) if self.fields else None
+        if len(self.fields) == 1:
+            # attrgetter 单字段时返回值本身, 统一为元组
+            self.getter = lambda obj: (getter(obj),)
+        elif getter is None:
+            self.getter = lambda obj: ()
+        else:
+            self.getter = getter
+        self.datetime_indexes: tuple[int, ...] = tuple(
+            index
+            for index, db_field in enumerate(self.fields)
+            if isinstance(
+                meta.fields_map.get(meta.fields_db_projection_reverse.get(db_field, db_field)),
+                fields.DatetimeField,
+            )
+        )
+
+    def serialize(self, instances: Iterable["BaseModel"]) -> list[dict]:
+        """批量序列化实例, 日期时间字段按列统一格式化"""
+        getter = self.getter
+        rows = [list(getter(instance)) for instance in instances]
+        datetime_format = settings.DATETIME_FORMAT
+        for index in self.datetime_indexes:
+            for row in rows:
+                value = row[index]
+                if value is not None:
+                    row[index] = value.strftime(datetime_format)
+        field_names = self.fields
+        return [dict(zip(field_names, row)) for row in rows]
+
+
+# 序列化计划与投影行类型按 (模型, 字段集合) 缓存; 字段集合可能来自请求参数,
+# 以 LRU 方式限制条目数, 避免不断出现的新组合使缓存无限增长
+_PLAN_CACHE_LIMIT = 1024
+_serializer_plans: OrderedDict[tuple[type, frozenset[str]], SerializerPlan] = OrderedDict()
+
+
+class Row(tuple):
+    """
+    只读投影行
+
+    基于元组实现 (无 __dict__), 支持按字段名属性访问, 由 BaseModel.rows 按字段集合
+    动态生成子类。响应序列化时通过 _asdict 转换为字典。日期时间字段与 to_dict 一致,
+    已按 settings.DATETIME_FORMAT 格式化为字符串。
+    """
+
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    # 需要格式化的日期时间字段下标
+    _datetime_indexes: tuple[int, ...] = ()
+
+    def _asdict(self) -> dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={value!r}" for name, value in zip(self._fields, self))
+        return f"{type(self).__name__}({values})"
+
+
+_row_classes: OrderedDict[tuple[type, tuple[str, ...]], type[Row]] = OrderedDict()
+
+
+def _lru_put(cache: OrderedDict, key: Any, value: Any) -> Any:
+    cache[key] = value
+    if len(cache) > _PLAN_CACHE_LIMIT:
+        cache.popitem(last=False)
+    return value
+
+
 class BaseModel(models.Model):
     id = fields.BigIntField(pk=True, index=True)
 
+    @classmethod
+    def serializer_plan(cls, exclude_fields: Iterable[str] | None = None) -> SerializerPlan:
+        """获取 (并缓存) 当前模型在给定排除字段下的序列化计划"""
+        key = (cls, frozenset(exclude_fields or ()))
+        plan = _serializer_plans.get(key)
+        if plan is None:
+            return _lru_put(_serializer_plans, key, SerializerPlan(cls, key[1]))
+        _serializer_plans.move_to_end(key)
+        return plan
+
+    @classmethod
+    def serialize(cls, instances: Iterable["BaseModel"], exclude_fields: list[str] | None = None) -> list[dict]:
+        """
+        将一批实例一次性序列化为字典列表
+
+        Args:
+            instances: 同一模型的实例列表 (如查询集结果)
+            exclude_fields: 需要排除的字段
+
+        Returns:
+            与 to_dict(m2m=False) 结果一致的字典列表
+        """
+        return cls.serializer_plan(exclude_fields).serialize(instances)
+
+    @classmethod
+    def row_class(cls, field_names: tuple[str, ...]) -> type[Row]:
+        """获取 (并缓存) 指定字段集合对应的投影行类型"""
+        key = (cls, field_names)
+        row_cls = _row_classes.get(key)
+        if row_cls is None:
+            fields_map = cls._meta.fields_map
+            namespace: dict[str, Any] = {
+                "__slots__": (),
+                "_fields": field_names,
+                "_datetime_indexes": tuple(
+                    index
+                    for index, name in enumerate(field_names)
+                    if isinstance(fields_map.get(name), fields.DatetimeField)
+                ),
+            }
+            for index, name in enumerate(field_names):
+                namespace[name] = property(itemgetter(index))
+            return _lru_put(_row_classes, key, type(f"{cls.__name__}Row", (Row,), namespace))
+        _row_classes.move_to_end(key)
+        return row_cls
+
+    @classmethod
+    async def rows(
+        cls,
+        *fields: str,
+        queryset: Any = None,
+        exclude_fields: list[str] | None = None,
+        **filters: Any
+    ) -> list[Row]:
+        """
+        投影查询: 通过 values_list 直接返回轻量行对象, 不实例化模型
+
+        Args:
+            fields: 需要查询的字段, 默认与 to_dict 输出的字段一致
+            queryset: 基础查询集, 默认为 cls.filter(**filters)
+            exclude_fields: 未指定 fields 时需要排除的字段
+            filters: 过滤条件
+
+        Returns:
+            行对象列表 (日期时间字段按 settings.DATETIME_FORMAT 格式化), 可直接传给 SuccessResponse 序列化
+        """
+        if not fields:
+            reverse = cls._meta.fields_db_projection_reverse
+            fields = tuple(
+                reverse.get(db_field, db_field)
+                for db_field in cls.serializer_plan(exclude_fields).fields
+            )
+        if queryset is None:
+            queryset = cls.filter(**filters)
+        elif filters:
+            queryset = queryset.filter(**filters)
+        row_cls = cls.row_class(tuple(fields))
+        values = await queryset.values_list(*fields)
+        datetime_indexes = row_cls._datetime_indexes
+        if not datetime_indexes:
+            return list(map(row_cls, values))
+        # 与 SerializerPlan 相同, 按列统一格式化日期时间字段
+        values = [list(value) for value in values]
+        datetime_format = settings.DATETIME_FORMAT
+        for index in datetime_indexes:
+            for value in values:
+                if value[index] is not None:
+                    value[index] = value[index].strftime(datetime_format)
+        return list(map(row_cls, values))
+
+    @classmethod
+    async def paginate(
+        cls,
+        cursor: str | None = None,
+        page_size: int | None = None,
+        order_by: Iterable[str] = ("-created_at", "-id"),
+        queryset: Any = None,
+        with_total: bool = False,
+        **filters: Any
+    ) -> KeysetPage:
+        """
+        游标分页查询
+
+        Args:
+            cursor: 上一页返回的 next_cursor/prev_cursor, 为空时返回第一页
+            page_size: 每页条数
+            order_by: 排序字段 (应为索引列), 默认 (created_at, id) 倒序
+            queryset: 基础查询集, 默认为 cls.filter(**filters)
+            with_total: 是否附带缓存的近似总数
+            filters: 过滤条件
+
+        Returns:
+            KeysetPage, 可通过 to_response() 返回标准响应
+        """
+        if queryset is None:
+            queryset = cls.filter(**filters)
+        elif filters:
+            queryset = queryset.filter(**filters)
+        paginator = KeysetPaginator(queryset, order_by=order_by, page_size=page_size)
+        return await paginator.page(cursor, with_total=with_total)
+
+    @classmethod
+    async def validator(
+        cls,
+        queryset: Any = None,
+        salt: str = "",
+        field: str = "updated_at",
+        **filters: Any
+    ) -> Validator:
+        """
+        条件 GET 校验值: 一次聚合查询 max(updated_at) 与记录数, 不加载任何行
+
+        单个对象传主键过滤条件 (如 pk=1), 列表传与列表查询相同的查询集或过滤条件;
+        查询集上的排序与分页会被忽略, 分页、字段集合等影响响应内容的参数应放入 salt。
+
+        Args:
+            queryset: 基础查询集, 默认为 cls.filter(**filters)
+            salt: 区分同一数据不同表示的附加值
+            field: 最后修改时间字段 (应为索引列)
+            filters: 过滤条件
+
+        Returns:
+            Validator, 可先调用 not_modified(request) 短路返回 304, 再传给 SuccessResponse
+        """
+        if queryset is None:
+            queryset = cls.filter(**filters)
+        elif filters:
+            queryset = queryset.filter(**filters)
+        # 查询集只用于筛选主键, 排序与分页不影响结果; 关联过滤产生的 JOIN 留在子查询中,
+        # 外层聚合不会因 JOIN 或排序生成 GROUP BY, 也不会重复计数
+        queryset = queryset._clone()
+        queryset._orderings = []
+        queryset._limit = None
+        queryset._offset = None
+        pk = cls._meta.pk_attr
+        aggregate = cls.filter(**{f"{pk}__in": Subquery(queryset.values(pk))})
+        rows = await aggregate.annotate(_last_modified=Max(field), _count=Count(pk)).values("_last_modified", "_count")
+        row = rows[0] if rows else {"_last_modified": None, "_count": 0}
+        return Validator(row["_last_modified"], row["_count"], salt=f"{cls._meta.db_table}|{salt}")
+
+    @classmethod
+    async def bulk_upsert(
+        cls,
+        rows: Iterable[dict] | AsyncIterable[dict],
+        conflict_on: Iterable[str],
+        update_fields: Iterable[str] | None = None,
+        batch_size: int = 5000,
+        using_db: Any = None,
+        on_batch: Callable[[BatchReport], Any] | None = None
+    ) -> BulkUpsertReport:
+        """
+        批量导入 (存在则更新), asyncpg 后端使用 COPY + INSERT ... ON CONFLICT
+
+        Args:
+            rows: 记录 (字段名 -> 值) 的同步或异步可迭代对象
+            conflict_on: 冲突判定字段, 如 ("username",)
+            update_fields: 冲突时更新的字段, 默认更新除冲突字段外的全部写入字段
+            batch_size: 每批记录数
+            using_db: 指定连接或事务
+            on_batch: 每批完成后的回调
+
+        Returns:
+            BulkUpsertReport, 包含各批次耗时与被拒绝的记录
+        """
+        try:
+            return await bulk_upsert(
+                cls,
+                rows,
+                conflict_on=conflict_on,
+                update_fields=update_fields,
+                batch_size=batch_size,
+                using_db=using_db,
+                on_batch=on_batch,
+            )
+        finally:
+            # COPY 写入不经过 ORM, 需要手动失效模型缓存
+            cls.invalidate_cache()
+
+    @classmethod
+    async def cached_get(cls, pk: Any, ttl: float | None = None) -> "BaseModel | None":
+        """
+        按主键读取 (带缓存), 不存在时返回 None
+
+        缓存保存列值快照, 每次返回新实例; 保存/删除信号、QuerySet.update/delete、
+        bulk_create/bulk_update 与 bulk_upsert 会自动失效, 事务内直接查询数据库。
+
+        Args:
+            pk: 主键
+            ttl: 过期时间(秒), 默认 settings.MODEL_CACHE_TTL
+
+        Returns:
+            模型实例或 None
+        """
+        return await model_cache.cached_get(cls, pk, ttl)
+
+    @classmethod
+    async def cached_get_by(cls, ttl: float | None = None, **filters: Any) -> "BaseModel | None":
+        """
+        按唯一条件读取单条记录 (带缓存), 如 User.cached_get_by(username="admin")
+
+        Args:
+            ttl: 过期时间(秒), 默认 settings.MODEL_CACHE_TTL
+            **filters: 能唯一确定一条记录的过滤条件
+
+        Returns:
+            模型实例或 None
+        """
+        return await model_cache.cached_get_by(cls, ttl, **filters)
+
+    @classmethod
+    def invalidate_cache(cls, *pks: Any) -> None:
+        """失效指定主键的模型缓存, 不传主键时失效该模型的全部缓存"""
+        model_cache.invalidate(cls, *pks)
+
+    @classmethod
+    async def bulk_to_dict(
+        cls,
+        instances: Iterable["BaseModel"],
+        m2m: bool = False,
+        exclude_fields: list[str] | None = None
+    ) -> list[dict]:
+        """
+        批量序列化实例, m2m=True 时每个多对多字段只发起一次 IN 查询
+
+        Args:
+            instances: 同一模型的实例列表
+            m2m: 是否包含多对多字段
+            exclude_fields: 需要排除的字段 (同时作用于多对多关联对象)
+
+        Returns:
+            与逐个调用 to_dict 结果一致的字典列表
+        """
+        instances = list(instances)
+        result = cls.serialize(instances, exclude_fields)
+        if m2m and instances:
+            exclude = set(exclude_fields or ())
+            fields_to_fetch = [field for field in cls._meta.m2m_fields if field not in exclude]
+            relations = await asyncio.gather(
+                *(cls._bulk_fetch_m2m_field(instances, field, exclude) for field in fields_to_fetch)
+            )
+            for field, relation_map in zip(fields_to_fetch, relations):
+                for instance, d in zip(instances, result):
+                    d[field] = relation_map.get(instance.pk, [])
+        return result
+
     async def to_dict(self, m2m: bool = False, exclude_fields: list[str] | None = None):
-        if exclude_fields is None:
-            exclude_fields = []
+        return (await self.bulk_to_dict((self,), m2m=m2m, exclude_fields=exclude_fields))[0]
 
-        d = {}
-        for field in self._meta.db_fields:
-            if field not in exclude_fields:
-                value = getattr(self, field)
-                if isinstance(value, datetime):
-                    value = value.strftime(settings.DATETIME_FORMAT)
-                d[field] = value
-
-        if m2m:
-            tasks = [
-                self.__fetch_m2m_field(field, exclude_fields)
-                for field in self._meta.m2m_fields
-                if field not in exclude_fields
-            ]
-            results = await asyncio.gather(*tasks)
-            for field, values in results:
-                d[field] = values
-
-        return d
-
-    async def __fetch_m2m_field(self, field, exclude_fields):
-        values = await getattr(self, field).all().values()
-        formatted_values = []
-
-        for value in values:
+    @classmethod
+    async def _bulk_fetch_m2m_field(
+        cls,
+        instances: list["BaseModel"],
+        field: str,
+        exclude_fields: set[str]
+    ) -> dict:
+        """通过中间表一次性查询一批实例的多对多关联, 返回 {实例主键: [关联对象字典]}"""
+        field_object = cls._meta.fields_map[field]
+        related_model = field_object.related_model
+        related_meta = related_model._meta
+        db = related_model._choose_db()
+        pk_field = cls._meta.pk
+        instance_ids = {pk_field.to_db_value(instance.pk, instance) for instance in instances}
+
+        columns = [
+            (name, column)
+            for name, column in related_meta.fields_db_projection.items()
+            if name not in exclude_fields
+        ]
+        related_table = related_meta.basetable
+        through_table = Table(field_object.through)
+        query = (
+            db.query_class.from_(related_table)
+            .join(through_table)
+            .on(through_table[field_object.forward_key] == related_table[related_meta.db_pk_column])
+            .select(
+                through_table[field_object.backward_key].as_("_backward_relation_key"),
+                *[related_table[column].as_(name) for name, column in columns],
+            )
+            .where(through_table[field_object.backward_key].isin(instance_ids))
+        )
+        _, rows = await db.execute_query(*query.get_parameterized_sql())
+
+        converters = [(name, related_meta.fields_map[name].to_python_value) for name, _ in columns]
+        datetime_format = settings.DATETIME_FORMAT
+        relation_map: dict = {}
+        for row in rows:
             formatted_value = {}
-            for k, v in value.items():
-                if k not in exclude_fields:
-                    if isinstance(v, datetime):
-                        formatted_value[k] = v.strftime(settings.DATETIME_FORMAT)
-                    else:
-                        formatted_value[k] = v
-            formatted_values.append(formatted_value)
-
-        return field, formatted_values
+            for name, to_python in converters:
+                value = to_python(row[name])
+                if isinstance(value, datetime):
+                    value = value.strftime(datetime_format)
+                formatted_value[name] = value
+            key = pk_field.to_python_value(row["_backward_relation_key"])
+            relation_map.setdefault(key, []).append(formatted_value)
+        return relation_map
 
     class Meta:
         abstract = True
@@ -0,0 +1,336 @@
+import asyncio
+import importlib
+import os
+import socket
+import sys
+import weakref
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from tortoise import Tortoise, connections
+from tortoise.backends.base.client import BaseTransactionWrapper
+from tortoise.queryset import BulkCreateQuery, BulkUpdateQuery, DeleteQuery, UpdateQuery
+from tortoise.signals import Signals
+
+from base.common.cache import TTLCache
+from base.common.log import log
+from base.common.setting import settings
+
+# 未命中 (查询结果为空) 的缓存项标签后缀, 任意写入都会使其失效
+MISS_TAG = "miss"
+
+
+def table_tag(model: Any) -> str:
+    return model._meta.db_table
+
+
+def pk_tag(model: Any, pk: Any) -> str:
+    return f"{model._meta.db_table}:{pk}"
+
+
+def miss_tag(model: Any) -> str:
+    return f"{model._meta.db_table}:{MISS_TAG}"
+
+
+class LocalModelCacheBackend:
+    """
+    进程内 LRU 后端 (默认)
+
+    每个 worker 进程独立缓存, 失效只作用于当前进程, 适合单 worker 部署。
+    """
+
+    def __init__(self) -> None:
+        self.cache = TTLCache(
+            "model",
+            max_entries=settings.MODEL_CACHE_MAX_ENTRIES,
+            max_bytes=settings.MODEL_CACHE_MAX_BYTES,
+            default_ttl=settings.MODEL_CACHE_TTL,
+        )
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.cache.clear()
+
+    async def get_or_load(self, key: Any, loader: Callable, ttl: float | None, tags: Callable[[Any], Iterable[str]]) -> Any:
+        value, _ = await self.cache.get_or_load(key, loader, ttl=ttl, tags=tags, sizeof=_sizeof_row)
+        return value
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        tags = tuple(tags)
+        self.cache.invalidate_tags(*tags)
+        self.broadcast(tags)
+
+    def broadcast(self, tags: tuple[str, ...]) -> None:
+        """通知其他进程失效, 进程内后端无需处理"""
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": type(self).__name__, **self.cache.stats()}
+
+
+class UnixSocketModelCacheBackend(LocalModelCacheBackend):
+    """
+    进程内 LRU + 本地 Unix 数据报套接字广播失效
+
+    每个 worker 在 settings.MODEL_CACHE_SOCKET_DIR 下绑定 <pid>.sock, 本进程失效缓存时
+    把标签发送给目录中的其他套接字, 多个 uvicorn worker 因此能看到彼此的写入。
+    已退出进程遗留的套接字在发送失败时清理。不支持 AF_UNIX 的平台退化为进程内后端。
+    """
+
+    def __init__(self, socket_dir: str | None = None) -> None:
+        super().__init__()
+        self.socket_dir = Path(socket_dir or settings.MODEL_CACHE_SOCKET_DIR)
+        self.path: Path | None = None
+        self._socket: socket.socket | None = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            log.warning("当前平台不支持 Unix 套接字, 模型缓存失效不会广播到其他 worker")
+            return
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.socket_dir / f"{os.getpid()}.sock"
+        self.path.unlink(missing_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(str(self.path))
+        self._socket = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._on_readable)
+
+    async def close(self) -> None:
+        if self._socket is not None:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+        await super().close()
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            self.received += 1
+            self.cache.invalidate_tags(*data.decode("utf-8").split("\n"))
+
+    def broadcast(self, tags: tuple[str, ...]) -> None:
+        if self._socket is None or not tags:
+            return
+        payload = "\n".join(tags).encode("utf-8")
+        for peer in self.socket_dir.glob("*.sock"):
+            if peer == self.path:
+                continue
+            try:
+                self._socket.sendto(payload, str(peer))
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 对应进程已退出
+                peer.unlink(missing_ok=True)
+            except (BlockingIOError, OSError) as e:
+                # 对端接收缓冲区已满等, 该进程的缓存只能等待过期
+                self.dropped += 1
+                log.warning(f"模型缓存失效广播失败 {peer.name}: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **super().stats(),
+            "socket": str(self.path) if self.path else None,
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+
+BACKENDS: dict[str, type[LocalModelCacheBackend]] = {
+    "local": LocalModelCacheBackend,
+    "socket": UnixSocketModelCacheBackend,
+}
+
+_backend: LocalModelCacheBackend | None = None
+
+
+def get_backend() -> LocalModelCacheBackend:
+    """当前进程的缓存后端, settings.MODEL_CACHE_BACKEND 可为 local/socket 或自定义类的导入路径"""
+    global _backend
+    if _backend is None:
+        name = settings.MODEL_CACHE_BACKEND
+        backend_class = BACKENDS.get(name)
+        if backend_class is None:
+            module_name, _, class_name = name.rpartition(".")
+            backend_class = getattr(importlib.import_module(module_name), class_name)
+        _backend = backend_class()
+    return _backend
+
+
+def _sizeof_row(row: dict | None) -> int:
+    if row is None:
+        return sys.getsizeof(None)
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+
+
+def _snapshot(instance: Any) -> dict | None:
+    """实例的数据库列值快照, 缓存快照而非实例本身, 每次命中构造新实例"""
+    if instance is None:
+        return None
+    meta = instance._meta
+    return {column: getattr(instance, field) for field, column in meta.fields_db_projection.items()}
+
+
+def _restore(model: Any, row: dict | None) -> Any:
+    return None if row is None else model._init_from_db(**row)
+
+
+def _bypass(model: Any) -> bool:
+    # 事务内可能读到未提交的数据, 不读写缓存
+    return not settings.MODEL_CACHE_ENABLE or isinstance(model._meta.db, BaseTransactionWrapper)
+
+
+async def _cached_lookup(model: Any, key: tuple, filters: dict, ttl: float | None) -> Any:
+    if _bypass(model):
+        return await model.get_or_none(**filters)
+
+    async def load() -> dict | None:
+        # 从主库加载, 避免把副本的延迟数据写入缓存
+        return _snapshot(await model.filter(**filters).using_db(model._meta.db).get_or_none())
+
+    def tags(row: dict | None) -> tuple[str, ...]:
+        if row is None:
+            # 不存在的记录在任意写入后失效
+            return table_tag(model), miss_tag(model)
+        # 按条件查询的结果同样挂在主键标签下, 该行更新/删除时一并失效
+        return table_tag(model), pk_tag(model, row[model._meta.db_pk_column])
+
+    row = await get_backend().get_or_load(key, load, ttl, tags)
+    return _restore(model, row)
+
+
+async def cached_get(model: Any, pk: Any, ttl: float | None = None) -> Any:
+    """按主键读取, 不存在时返回 None (结果同样缓存, 任意写入后失效)"""
+    return await _cached_lookup(model, (model._meta.db_table, "pk", pk), {"pk": pk}, ttl)
+
+
+async def cached_get_by(model: Any, ttl: float | None = None, **filters: Any) -> Any:
+    """按唯一条件 (如 username/email) 读取单条记录"""
+    key = (model._meta.db_table, "by", tuple(sorted(filters.items())))
+    return await _cached_lookup(model, key, filters, ttl)
+
+
+# 事务内写入涉及的标签, 最外层事务提交后再失效一次: {事务连接: 标签}
+_pending: "weakref.WeakKeyDictionary[Any, set[str]]" = weakref.WeakKeyDictionary()
+
+
+def _root_transaction(db: Any) -> Any:
+    # asyncpg 等后端的嵌套事务是以外层事务为 _parent 的新连接对象
+    while isinstance(getattr(db, "_parent", None), BaseTransactionWrapper):
+        db = db._parent
+    return db
+
+
+def invalidate(model: Any, *pks: Any, using_db: Any = None) -> None:
+    """
+    失效指定主键的缓存, 不传主键时失效整个模型
+
+    写入发生在事务中 (using_db 为事务连接) 时, 提交前其他请求仍会读到旧数据并重新写入缓存,
+    因此除立即失效外, 还会在事务提交后再失效一次。
+    """
+    if not settings.MODEL_CACHE_ENABLE:
+        return
+    if pks:
+        tags = [miss_tag(model), *(pk_tag(model, pk) for pk in pks)]
+    else:
+        tags = [table_tag(model)]
+    get_backend().invalidate(tags)
+    if isinstance(using_db, BaseTransactionWrapper):
+        _pending.setdefault(_root_transaction(using_db), set()).update(tags)
+
+
+async def _on_post_save(sender: Any, instance: Any, created: bool, using_db: Any, update_fields: Any) -> None:
+    invalidate(sender, instance.pk, using_db=using_db)
+
+
+async def _on_post_delete(sender: Any, instance: Any, using_db: Any) -> None:
+    invalidate(sender, instance.pk, using_db=using_db)
+
+
+def _invalidate_after(method: Callable) -> Callable:
+    @wraps(method)
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            if getattr(self.model, "cached_get", None) is not None:
+                invalidate(self.model, using_db=self._db)
+
+    wrapper.__model_cache_patched__ = True
+    return wrapper
+
+
+def _finish_transaction(method: Callable, committed: bool) -> Callable:
+    @wraps(method)
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        result = await method(self, *args, **kwargs)
+        # 嵌套事务 (保存点) 不在 _pending 中; 回滚后数据库恢复原值, 无需再次失效
+        tags = _pending.pop(self, None)
+        if tags and committed:
+            get_backend().invalidate(tags)
+        return result
+
+    wrapper.__model_cache_patched__ = True
+    return wrapper
+
+
+def _patch_transactions(client_class: type) -> None:
+    """在各后端的事务连接类上包装 commit/rollback, 与 SQL 统计的做法相同"""
+    for klass in client_class.__subclasses__():
+        if issubclass(klass, BaseTransactionWrapper):
+            for name, committed in (("commit", True), ("rollback", False)):
+                method = klass.__dict__.get(name)
+                if method is not None and not getattr(method, "__model_cache_patched__", False):
+                    setattr(klass, name, _finish_transaction(method, committed))
+        _patch_transactions(klass)
+
+
+def _patch_bulk_queries() -> None:
+    """QuerySet.update/delete、bulk_update、bulk_create 不触发信号, 执行后按模型整体失效"""
+    for query_class, name in (
+        (UpdateQuery, "_execute"),
+        (DeleteQuery, "_execute"),
+        (BulkUpdateQuery, "_execute_many"),
+        (BulkCreateQuery, "_execute_many"),
+    ):
+        method = query_class.__dict__[name]
+        if not getattr(method, "__model_cache_patched__", False):
+            setattr(query_class, name, _invalidate_after(method))
+
+
+async def install_model_cache() -> None:
+    """注册保存/删除信号并启动缓存后端 (需在 Tortoise.init 之后调用)"""
+    if not settings.MODEL_CACHE_ENABLE:
+        return
+    for app in Tortoise.apps.values():
+        for model in app.values():
+            if getattr(model, "cached_get", None) is None:
+                continue
+            model.register_listener(Signals.post_save, _on_post_save)
+            model.register_listener(Signals.post_delete, _on_post_delete)
+    _patch_bulk_queries()
+    for client in connections.all():
+        _patch_transactions(type(client))
+    await get_backend().start()
+
+
+async def close_model_cache() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+def get_model_cache_stats() -> dict[str, Any]:
+    return get_backend().stats() if settings.MODEL_CACHE_ENABLE else {}
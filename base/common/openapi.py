@@ -0,0 +1,257 @@
+import asyncio
+import gzip
+import hashlib
+import os
+from pathlib import Path
+from typing import Any
+
+import orjson
+from fastapi import FastAPI
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from base.common import compression
+from base.common.manifest import source_fingerprint
+from base.common.response import etag_matches
+from base.common.setting import settings
+
+# 参与持久化文档指纹的源码目录: 除路由所在模块外, 公共 schema 也会影响文档
+SOURCE_ROOTS = ("base",)
+CACHE_FILE_PREFIX = "openapi-"
+# 缓存的文档数上限 (完整文档 + 各标签组合的部分文档)
+MAX_DOCUMENTS = 64
+# 只请求了不存在的标签时使用的键, 不匹配任何接口
+UNKNOWN_TAGS = ("",)
+
+
+class OpenAPIDocument:
+    """序列化后的 OpenAPI 文档: 原始字节、gzip 字节与 ETag"""
+
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, body: bytes, gzipped: bytes | None = None) -> None:
+        self.body = body
+        self.gzipped = gzipped if gzipped is not None else compression.compress(body, 9)
+        # 原始与 gzip 两种表示语义相同, 使用弱 ETag
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _collect_refs(node: Any, refs: set[str]) -> None:
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            refs.add(ref)
+        for value in node.values():
+            _collect_refs(value, refs)
+    elif isinstance(node, list):
+        for value in node:
+            _collect_refs(value, refs)
+
+
+def filter_by_tags(schema: dict[str, Any], tags: tuple[str, ...]) -> dict[str, Any]:
+    """只保留带有指定标签的接口, 以及它们 (直接或间接) 引用的 components"""
+    wanted = set(tags)
+    paths = {}
+    for path, item in schema.get("paths", {}).items():
+        operations = {
+            key: value for key, value in item.items()
+            if isinstance(value, dict) and wanted.intersection(value.get("tags", ()))
+        }
+        if operations:
+            # 路径级别的 parameters 等字段原样保留
+            paths[path] = {**{key: value for key, value in item.items() if not isinstance(value, dict)}, **operations}
+
+    source = schema.get("components", {})
+    components: dict[str, dict[str, Any]] = {}
+    if "securitySchemes" in source:
+        # 安全方案按名称引用, 不经过 $ref
+        components["securitySchemes"] = source["securitySchemes"]
+    pending: set[str] = set()
+    _collect_refs(paths, pending)
+    seen: set[str] = set()
+    while pending:
+        ref = pending.pop()
+        if ref in seen:
+            continue
+        seen.add(ref)
+        parts = ref.split("/")
+        if len(parts) != 4 or parts[:2] != ["#", "components"]:
+            continue
+        value = source.get(parts[2], {}).get(parts[3])
+        if value is None:
+            continue
+        components.setdefault(parts[2], {})[parts[3]] = value
+        _collect_refs(value, pending)
+
+    result = {key: value for key, value in schema.items() if key not in ("paths", "components", "tags")}
+    result["paths"] = paths
+    if components:
+        result["components"] = components
+    if "tags" in schema:
+        result["tags"] = [tag for tag in schema["tags"] if tag.get("name") in wanted]
+    return result
+
+
+class OpenAPICache:
+    """
+    OpenAPI 文档缓存
+
+    每个路由集合指纹 (源码指纹 + 应用版本 + 全部路由的路径/方法/名称) 只生成一次文档,
+    保存序列化后的原始与 gzip 字节, 按 ?tag= 生成的部分文档同样缓存。完整文档以 gzip 形式
+    持久化到发现清单所在目录, 代码未变化时新 worker 直接读取文件, 不再生成 schema。
+    延迟加载的插件注册路由后路由数变化, 下次请求时重新计算指纹。
+    """
+
+    def __init__(self) -> None:
+        self.fingerprint: str | None = None
+        self.documents: dict[tuple[str, ...], OpenAPIDocument] = {}
+        self._route_count = -1
+        self._source: str | None = None
+        self._schema: dict[str, Any] | None = None
+        self._tags: set[str] | None = None
+        self._lock = asyncio.Lock()
+        self.builds = 0
+        self.loaded = 0
+
+    async def get(self, app: FastAPI, tags: tuple[str, ...] = ()) -> OpenAPIDocument:
+        if len(app.routes) == self._route_count:
+            document = self.documents.get(tags)
+            if document is not None:
+                return document
+        # 生成文档是 CPU 密集操作, 在线程中执行; 并发的首批请求只生成一次
+        async with self._lock:
+            return await asyncio.to_thread(self.get_sync, app, tags)
+
+    def get_sync(self, app: FastAPI, tags: tuple[str, ...] = ()) -> OpenAPIDocument:
+        self._refresh(app)
+        if tags:
+            # 忽略文档中不存在的标签, 只请求了不存在的标签时返回空文档
+            known = self._known_tags(app)
+            tags = tuple(tag for tag in tags if tag in known) or UNKNOWN_TAGS
+        document = self.documents.get(tags)
+        if document is None:
+            document = self._build(app, tags)
+            if len(self.documents) < MAX_DOCUMENTS:
+                self.documents[tags] = document
+        return document
+
+    def _known_tags(self, app: FastAPI) -> set[str]:
+        if self._tags is None:
+            self._tags = {
+                tag
+                for item in self._full_schema(app).get("paths", {}).values()
+                for operation in item.values() if isinstance(operation, dict)
+                for tag in operation.get("tags", ())
+            }
+        return self._tags
+
+    def _refresh(self, app: FastAPI) -> None:
+        # 路由只会增加 (延迟加载插件), 数量不变时不必重新计算指纹
+        if len(app.routes) == self._route_count:
+            return
+        self._route_count = len(app.routes)
+        fingerprint = self._fingerprint(app)
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.documents.clear()
+            self._schema = None
+            self._tags = None
+            app.openapi_schema = None
+
+    def _fingerprint(self, app: FastAPI) -> str:
+        if self._source is None:
+            self._source = source_fingerprint(SOURCE_ROOTS)
+        digest = hashlib.sha1(f"{self._source}|{app.title}|{app.version}|{app.openapi_version}\n".encode("utf-8"))
+        for route in app.routes:
+            methods = ",".join(sorted(getattr(route, "methods", None) or ()))
+            include = getattr(route, "include_in_schema", True)
+            digest.update(f"{getattr(route, 'path', '')}|{methods}|{getattr(route, 'name', '')}|{include}\n".encode("utf-8"))
+        return digest.hexdigest()[:20]
+
+    def _build(self, app: FastAPI, tags: tuple[str, ...]) -> OpenAPIDocument:
+        if not tags:
+            document = self._load()
+            if document is not None:
+                return document
+        schema = self._full_schema(app)
+        if tags:
+            schema = filter_by_tags(schema, tags)
+        document = OpenAPIDocument(orjson.dumps(schema))
+        self.builds += 1
+        if not tags:
+            self._save(document)
+        return document
+
+    def _full_schema(self, app: FastAPI) -> dict[str, Any]:
+        if self._schema is None:
+            full = self.documents.get(())
+            # 完整文档来自磁盘时不再调用 app.openapi()
+            self._schema = orjson.loads(full.body) if full is not None else app.openapi()
+        return self._schema
+
+    def _path(self) -> Path | None:
+        if not settings.OPENAPI_CACHE:
+            return None
+        return Path(settings.DISCOVERY_MANIFEST_PATH).parent / f"{CACHE_FILE_PREFIX}{self.fingerprint}.json.gz"
+
+    def _load(self) -> OpenAPIDocument | None:
+        path = self._path()
+        if path is None:
+            return None
+        try:
+            gzipped = path.read_bytes()
+            document = OpenAPIDocument(gzip.decompress(gzipped), gzipped)
+        except (OSError, EOFError, gzip.BadGzipFile):
+            return None
+        self.loaded += 1
+        return document
+
+    def _save(self, document: OpenAPIDocument) -> None:
+        """先写临时文件再替换, 并删除其他指纹的旧文件"""
+        path = self._path()
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            temp_path.write_bytes(document.gzipped)
+            os.replace(temp_path, path)
+            for old in path.parent.glob(f"{CACHE_FILE_PREFIX}*.json.gz"):
+                if old != path:
+                    old.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"⚠️ 写入 OpenAPI 缓存失败 {path}: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "documents": {",".join(tags) if tags else "*": len(document.body) for tags, document in self.documents.items()},
+            "builds": self.builds,
+            "loaded": self.loaded,
+        }
+
+
+openapi_cache = OpenAPICache()
+
+
+def register_openapi(app: FastAPI) -> None:
+    """用缓存的文档替换 FastAPI 自带的 openapi_url 路由, 支持 ETag/If-None-Match 与 ?tag= 部分文档"""
+    if not app.openapi_url:
+        return
+
+    async def openapi(request: Request) -> Response:
+        tags = tuple(sorted(set(request.query_params.getlist("tag"))))
+        document = await openapi_cache.get(app, tags)
+        headers = {"ETag": document.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), document.etag):
+            return Response(status_code=304, headers=headers)
+        if compression.accepts_gzip(request.headers.get("accept-encoding", "")):
+            return Response(document.gzipped, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+        return Response(document.body, media_type="application/json", headers=headers)
+
+    for index, route in enumerate(app.router.routes):
+        if isinstance(route, Route) and route.path == app.openapi_url:
+            app.router.routes[index] = Route(app.openapi_url, openapi, include_in_schema=False)
+            return
+    app.add_route(app.openapi_url, openapi, include_in_schema=False)
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from collections import deque
+from datetime import date
+from typing import Any
+
+from starlette.types import Scope
+from tortoise import timezone
+
+from base.common.log import log
+from base.common.setting import settings
+
+TABLE = "operation_log"
+
+
+def _month_start(day: date, months: int = 0) -> date:
+    """day 所在月份偏移 months 个月后的第一天"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+def build_record(scope: Scope, status_code: int, duration_ms: float) -> dict[str, Any]:
+    """
+    由请求生成一条操作日志
+
+    操作人取自 request.state.user_id / request.state.username (由认证依赖或中间件设置),
+    请求 ID 取自 RequestContextMiddleware 设置的 request.state.request_id。
+    """
+    state = scope.get("state") or {}
+    route = scope.get("route")
+    client = scope.get("client")
+    user_agent = None
+    for name, value in scope["headers"]:
+        if name == b"user-agent":
+            user_agent = value.decode("latin-1")[:255]
+            break
+    return {
+        "created_at": timezone.now(),
+        "request_id": state.get("request_id"),
+        "user_id": state.get("user_id"),
+        "username": state.get("username"),
+        "client_ip": client[0] if client else None,
+        "method": scope["method"],
+        "path": scope["path"][:512],
+        "route": route.path[:255] if route is not None else None,
+        "status_code": status_code,
+        "success": status_code < 400,
+        "duration_ms": round(duration_ms, 3),
+        "user_agent": user_agent,
+    }
+
+
+class OperationLogWriter:
+    """
+    操作日志异步批量写入
+
+    请求结束时把记录放入有界内存队列, 后台任务在攒够 settings.OPERATION_LOG_BATCH_SIZE 条或
+    每隔 OPERATION_LOG_FLUSH_INTERVAL 秒时批量插入, 请求本身不执行 SQL。队列满时按
+    OPERATION_LOG_DROP_POLICY 丢弃或短暂等待。PostgreSQL 下表按月分区, 写入时确保当月与
+    下月的分区存在, 并清理超出 OPERATION_LOG_RETENTION_MONTHS 的旧分区。
+    """
+
+    def __init__(self) -> None:
+        self.records: deque[dict[str, Any]] = deque()
+        self.max_size = settings.OPERATION_LOG_QUEUE_SIZE
+        self.batch_size = settings.OPERATION_LOG_BATCH_SIZE
+        self.policy = settings.OPERATION_LOG_DROP_POLICY
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        # 已确保分区存在的月份, None 表示表未分区 (或非 PostgreSQL)
+        self._partitioned = False
+        self._partition_month: date | None = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    async def start(self) -> None:
+        """在 lifespan 中、数据库初始化之后调用"""
+        if not settings.OPERATION_LOG_RECORD or self._task is not None:
+            return
+        self._closing = False
+        self._partitioned = await self._is_partitioned()
+        await self._maintain_partitions()
+        self._task = asyncio.create_task(self._run(), name="operation-log-writer")
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """停止后台任务, 写入队列中剩余的记录"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"操作日志写入超时, 丢弃 {len(self.records)} 条记录")
+            self.dropped += len(self.records)
+            self.records.clear()
+        self._task = None
+
+    async def submit(self, record: dict[str, Any]) -> bool:
+        """放入队列, 被丢弃时返回 False; 写入任务未启动时直接丢弃"""
+        if self._task is None or self._closing:
+            return False
+        if len(self.records) >= self.max_size:
+            if self.policy == "drop_oldest":
+                self.records.popleft()
+                self.dropped += 1
+            elif self.policy == "block":
+                self._space.clear()
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(self._space.wait(), settings.OPERATION_LOG_BLOCK_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+                if len(self.records) >= self.max_size:
+                    self.dropped += 1
+                    return False
+            else:
+                self.dropped += 1
+                return False
+        self.records.append(record)
+        if len(self.records) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.OPERATION_LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._closing:
+                # flush 只写调用时已在队列中的记录, 关闭时还要写完写入期间新到的记录
+                while self.records:
+                    await self.flush()
+                return
+
+    async def flush(self) -> None:
+        """写入调用时已在队列中的记录, 写入期间新到的记录留到下一轮, 保证每批尽量攒满"""
+        pending = len(self.records)
+        while pending > 0 and self.records:
+            size = min(self.batch_size, pending, len(self.records))
+            batch = [self.records.popleft() for _ in range(size)]
+            pending -= size
+            self._space.set()
+            await self._write(batch)
+
+    async def _write(self, batch: list[dict[str, Any]]) -> None:
+        from base.core.monitor.models.operation_log import OperationLog
+
+        started = time.perf_counter()
+        try:
+            await self._maintain_partitions()
+            await OperationLog.bulk_create([OperationLog(**record) for record in batch])
+        except Exception as e:
+            self.failed += len(batch)
+            log.error(f"操作日志写入失败, 丢弃 {len(batch)} 条记录: {e}")
+        else:
+            self.written += len(batch)
+            self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    @staticmethod
+    def _connection() -> Any:
+        from base.core.monitor.models.operation_log import OperationLog
+
+        return OperationLog._meta.db
+
+    async def _is_partitioned(self) -> bool:
+        connection = self._connection()
+        if connection.capabilities.dialect != "postgres":
+            return False
+        try:
+            _, rows = await connection.execute_query(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass($1)", [TABLE]
+            )
+        except Exception as e:
+            log.warning(f"无法检查操作日志分区: {e}")
+            return False
+        return bool(rows)
+
+    async def _maintain_partitions(self) -> None:
+        """每个月第一次写入时创建当月与下月分区并清理过期分区, 其余时候只比较一次月份"""
+        if not self._partitioned:
+            return
+        month = _month_start(timezone.now().date())
+        if month == self._partition_month:
+            return
+        connection = self._connection()
+        try:
+            for offset in (0, 1):
+                start, end = _month_start(month, offset), _month_start(month, offset + 1)
+                # 与 created_at 写入方式一致: 不带时区的时间按 UTC 存储
+                await connection.execute_script(
+                    f'CREATE TABLE IF NOT EXISTS "{_partition_name(start)}" PARTITION OF "{TABLE}" '
+                    f"FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00')"
+                )
+            if settings.OPERATION_LOG_RETENTION_MONTHS > 0:
+                oldest = _partition_name(_month_start(month, 1 - settings.OPERATION_LOG_RETENTION_MONTHS))
+                _, rows = await connection.execute_query(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = to_regclass($1)",
+                    [TABLE],
+                )
+                prefix = f"{TABLE}_p"
+                for row in rows:
+                    name = row["relname"]
+                    # 分区名按年月补零, 可以直接按字符串比较
+                    if name.startswith(prefix) and name < oldest:
+                        await connection.execute_script(f'DROP TABLE IF EXISTS "{name}"')
+                        log.info(f"已删除过期的操作日志分区 {name}")
+        except Exception as e:
+            # 多个 worker 同时创建分区等情况, 下次写入时重试
+            log.warning(f"维护操作日志分区失败: {e}")
+            return
+        self._partition_month = month
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "queued": len(self.records),
+            "max_size": self.max_size,
+            "policy": self.policy,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "partitioned": self._partitioned,
+            "partition_month": str(self._partition_month) if self._partition_month else None,
+        }
+
+
+operation_log_writer = OperationLogWriter()
@@ -0,0 +1,203 @@
+import base64
+import binascii
+from typing import Any, Callable, Iterable, Sequence
+
+import orjson
+from fastapi import HTTPException, status
+from tortoise.expressions import Q
+
+from base.common.cache import TTLCache
+from base.common.response import SuccessResponse, json_dumps
+from base.common.setting import settings
+
+# 游标方向
+NEXT = "n"
+PREV = "p"
+
+# 近似总数缓存: {内联参数的 COUNT 语句: 总数}, 过滤条件来自用户输入, 按条目数限制容量
+count_cache = TTLCache(
+    "pagination_count",
+    max_entries=settings.PAGINATION_COUNT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.PAGINATION_COUNT_CACHE_MAX_ENTRIES * 1024,
+    default_ttl=settings.PAGINATION_COUNT_CACHE_TTL,
+)
+
+
+def encode_cursor(direction: str, values: Sequence[Any]) -> str:
+    """将方向与排序键值编码为不透明游标"""
+    return base64.urlsafe_b64encode(json_dumps([direction, list(values)])).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[str, list[Any]]:
+    """解析游标, 格式错误时抛出 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, values = orjson.loads(base64.urlsafe_b64decode(padded))
+        if direction not in (NEXT, PREV) or not isinstance(values, list):
+            raise ValueError(cursor)
+        return direction, values
+    except (ValueError, TypeError, binascii.Error, orjson.JSONDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
+
+
+class KeysetPage:
+    """游标分页结果"""
+
+    __slots__ = ("items", "next_cursor", "prev_cursor", "has_next", "has_prev", "page_size", "total")
+
+    def __init__(
+            self,
+            items: list,
+            next_cursor: str | None,
+            prev_cursor: str | None,
+            has_next: bool,
+            has_prev: bool,
+            page_size: int,
+            total: int | None = None
+    ) -> None:
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.page_size = page_size
+        self.total = total
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "items": self.items,
+            "next_cursor": self.next_cursor,
+            "prev_cursor": self.prev_cursor,
+            "has_next": self.has_next,
+            "has_prev": self.has_prev,
+            "page_size": self.page_size,
+            "total": self.total,
+        }
+
+    def to_response(self, **kwargs: Any) -> SuccessResponse:
+        """包装为标准成功响应"""
+        return SuccessResponse(data=self.to_dict(), **kwargs)
+
+
+class KeysetPaginator:
+    """
+    基于排序键 (默认 created_at, id) 的游标分页器
+
+    通过 WHERE (k1, k2) < (v1, v2) 的展开条件定位下一页, 配合索引列
+    查询耗时与页码深度无关, 避免 OFFSET 随页数线性变慢。
+    """
+
+    def __init__(
+            self,
+            queryset: Any,
+            order_by: Iterable[str] = ("-created_at", "-id"),
+            page_size: int | None = None,
+            serializer: Callable[[list], list] | None = None
+    ) -> None:
+        """
+        初始化分页器
+
+        参数:
+        - queryset (QuerySet): 基础查询集。
+        - order_by (Iterable[str]): 排序字段, "-" 前缀表示降序, 需包含唯一列 (缺省时自动追加主键)。
+        - page_size (int | None): 每页条数, 不超过 settings.MAX_PAGE_SIZE。
+        - serializer (Callable | None): 结果序列化函数, 默认使用模型的 serialize。
+
+        返回:
+        - None
+        """
+        model = queryset.model
+        self.queryset = queryset
+        self.model = model
+        self.order_by: list[tuple[str, bool]] = [
+            (field.lstrip("-"), field.startswith("-")) for field in order_by
+        ]
+        pk_name = model._meta.pk_attr
+        if pk_name not in {field for field, _ in self.order_by}:
+            descending = self.order_by[-1][1] if self.order_by else False
+            self.order_by.append((pk_name, descending))
+        self.page_size = min(page_size or settings.PAGE_SIZE, settings.MAX_PAGE_SIZE)
+        self.serializer = serializer or getattr(model, "serialize", None)
+
+    def _key(self, item: Any) -> list[Any]:
+        return [getattr(item, field) for field, _ in self.order_by]
+
+    def _keyset_filter(self, values: list[Any], forward: bool) -> Q:
+        """展开 (k1, k2, ...) 比较为 k1 > v1 OR (k1 = v1 AND k2 > v2) ..."""
+        fields_map = self.model._meta.fields_map
+        values = [fields_map[field].to_python_value(value) for (field, _), value in zip(self.order_by, values)]
+        condition: Q | None = None
+        for index, (field, descending) in enumerate(self.order_by):
+            lookup = "lt" if descending == forward else "gt"
+            branch = Q(**{f"{field}__{lookup}": values[index]})
+            for prev_index in range(index):
+                branch &= Q(**{self.order_by[prev_index][0]: values[prev_index]})
+            condition = branch if condition is None else condition | branch
+        return condition
+
+    async def page(self, cursor: str | None = None, with_total: bool = False) -> KeysetPage:
+        """
+        获取一页数据
+
+        参数:
+        - cursor (str | None): 上一次返回的 next_cursor/prev_cursor, 为空时返回第一页。
+        - with_total (bool): 是否附带 (近似) 总数。
+
+        返回:
+        - KeysetPage: 分页结果。
+        """
+        direction, values = decode_cursor(cursor) if cursor else (NEXT, None)
+        forward = direction == NEXT
+        queryset = self.queryset
+        if values is not None:
+            if len(values) != len(self.order_by):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
+            queryset = queryset.filter(self._keyset_filter(values, forward))
+        ordering = [
+            f"-{field}" if descending == forward else field
+            for field, descending in self.order_by
+        ]
+        items = list(await queryset.order_by(*ordering).limit(self.page_size + 1))
+        has_more = len(items) > self.page_size
+        items = items[:self.page_size]
+        if not forward:
+            items.reverse()
+
+        if forward:
+            has_next, has_prev = has_more, values is not None
+        else:
+            has_next, has_prev = True, has_more
+        next_cursor = encode_cursor(NEXT, self._key(items[-1])) if items and has_next else None
+        prev_cursor = encode_cursor(PREV, self._key(items[0])) if items and has_prev else None
+        total = await self.approximate_count() if with_total else None
+        data = self.serializer(items) if self.serializer else items
+        return KeysetPage(data, next_cursor, prev_cursor, has_next, has_prev, self.page_size, total)
+
+    async def approximate_count(self, ttl: int | None = None) -> int:
+        """
+        获取 (近似) 总数并缓存
+
+        未附加过滤条件的 PostgreSQL 查询直接读取 pg_class.reltuples 统计值,
+        其余情况执行 COUNT 并按 ttl 秒缓存结果。
+        """
+        ttl = settings.PAGINATION_COUNT_CACHE_TTL if ttl is None else ttl
+        count_query = self.queryset.count()
+
+        async def load() -> int:
+            total = -1
+            meta = self.model._meta
+            db = self.model._choose_db()
+            if not self.queryset._q_objects and db.capabilities.dialect == "postgres":
+                _, rows = await db.execute_query(
+                    "SELECT reltuples::BIGINT AS estimate FROM pg_class WHERE oid = $1::regclass",
+                    [meta.db_table],
+                )
+                total = rows[0]["estimate"] if rows else -1
+            if total < 0:
+                # 表未 ANALYZE 过或带过滤条件时回退为精确计数
+                total = await count_query
+            return total
+
+        # 相同语句的并发未命中只计数一次
+        total, _ = await count_cache.get_or_load(count_query.sql(params_inline=True), load, ttl=ttl)
+        return total
@@ -0,0 +1,122 @@
+import asyncio
+import configparser
+from pathlib import Path
+from typing import Any, List
+
+from fastapi import APIRouter
+
+from base.common.log import log
+from base.common.setting import settings
+
+PLUGINS_PACKAGE = "base.plugins"
+PLUGINS_DIR = Path(__file__).parent.parent / "plugins"
+
+
+class PluginSpec:
+    """
+    插件声明, 读取自插件目录下的 plugin.conf (不导入插件代码)
+
+    [plugin]
+    prefix = /api/v1/cms
+    lazy = true
+    """
+
+    __slots__ = ("name", "prefix", "lazy")
+
+    def __init__(self, name: str, prefix: str | None = None, lazy: bool = False) -> None:
+        self.name = name
+        self.prefix = prefix.rstrip("/") if prefix else None
+        # 未声明前缀的插件无法按请求路径激活, 只能启动时加载
+        self.lazy = lazy and bool(self.prefix)
+
+    @property
+    def package(self) -> str:
+        return f"{PLUGINS_PACKAGE}.{self.name}"
+
+    def matches(self, path: str) -> bool:
+        return path == self.prefix or path.startswith(self.prefix + "/")
+
+
+def load_plugin_specs() -> List[PluginSpec]:
+    """读取 base/plugins 下所有插件包的声明, 没有 plugin.conf 的插件视为启动时加载"""
+    specs = []
+    if not PLUGINS_DIR.is_dir():
+        return specs
+    for plugin_dir in sorted(PLUGINS_DIR.iterdir()):
+        if not plugin_dir.is_dir() or plugin_dir.name.startswith("_") or not (plugin_dir / "__init__.py").exists():
+            continue
+        parser = configparser.ConfigParser()
+        parser.read(plugin_dir / "plugin.conf", encoding="utf-8")
+        specs.append(PluginSpec(
+            plugin_dir.name,
+            prefix=parser.get("plugin", "prefix", fallback=None),
+            lazy=parser.getboolean("plugin", "lazy", fallback=False) and plugin_dir.name not in settings.PLUGIN_WARM,
+        ))
+    return specs
+
+
+class _RouterCollector:
+    """代替 FastAPI 应用传给 discover_plugin_routers, 只收集路由不注册"""
+
+    def __init__(self) -> None:
+        self.routers: List[APIRouter] = []
+
+    def include_router(self, router: APIRouter) -> None:
+        self.routers.append(router)
+
+
+class LazyPluginRegistry:
+    """
+    延迟加载插件注册表
+
+    插件在第一次收到其前缀下的请求时才导入并注册路由; 同一插件的并发首个请求
+    通过锁串行化, 只导入一次。导入在线程中执行, 不阻塞事件循环处理其他请求。
+    """
+
+    def __init__(self) -> None:
+        self.pending: dict[str, PluginSpec] = {}
+        self.activated: List[str] = []
+        self.failed: dict[str, str] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def register(self, spec: PluginSpec) -> None:
+        self.pending[spec.name] = spec
+        print(f"💤 延迟加载插件: {spec.name} -> {spec.prefix}")
+
+    def match(self, path: str) -> PluginSpec | None:
+        for spec in self.pending.values():
+            if spec.matches(path):
+                return spec
+        return None
+
+    async def activate(self, app: Any, spec: PluginSpec) -> None:
+        lock = self._locks.setdefault(spec.name, asyncio.Lock())
+        async with lock:
+            if spec.name not in self.pending:
+                # 等待锁期间已由其他请求完成加载
+                return
+            try:
+                collector = await asyncio.to_thread(self._import_plugin, spec)
+            except Exception as e:
+                self.failed[spec.name] = str(e)
+                log.error(f"延迟加载插件 {spec.name} 失败: {e}")
+            else:
+                for router in collector.routers:
+                    app.include_router(router)
+                # 路由变化后重新生成 OpenAPI 文档
+                app.openapi_schema = None
+                self.activated.append(spec.name)
+                log.info(f"已加载插件 {spec.name}, 注册 {len(collector.routers)} 个路由")
+            finally:
+                self.pending.pop(spec.name, None)
+
+    @staticmethod
+    def _import_plugin(spec: PluginSpec) -> _RouterCollector:
+        from base.common.router import discover_plugin_routers
+
+        collector = _RouterCollector()
+        discover_plugin_routers(collector, spec.package)
+        return collector
+
+
+plugin_registry = LazyPluginRegistry()
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from typing import Any
+
+from tortoise import connections
+
+from base.common.metrics import Histogram
+from base.common.setting import settings
+
+
+class PoolAcquireTimeout(Exception):
+    """等待连接池连接超时"""
+
+    def __init__(self, connection_name: str, timeout: float) -> None:
+        super().__init__(f"acquire connection from pool '{connection_name}' timed out after {timeout}s")
+        self.connection_name = connection_name
+        self.timeout = timeout
+
+
+class PoolMetrics:
+    """单个连接池的获取连接统计"""
+
+    __slots__ = ("connection_name", "acquires", "timeouts", "waiting", "max_waiting", "wait_ms")
+
+    def __init__(self, connection_name: str) -> None:
+        self.connection_name = connection_name
+        self.acquires = 0
+        self.timeouts = 0
+        # 当前正在等待连接的协程数
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_ms = Histogram()
+
+
+class InstrumentedPool:
+    """
+    asyncpg 连接池代理
+
+    Tortoise 通过 `await pool.acquire()` / `await pool.release(conn)` 使用连接池,
+    代理在这两处统计等待耗时并施加获取超时, 其余属性透传给原始连接池。
+    """
+
+    def __init__(self, pool: Any, metrics: PoolMetrics, acquire_timeout: float | None) -> None:
+        self._pool = pool
+        self._metrics = metrics
+        self._acquire_timeout = acquire_timeout
+
+    async def acquire(self, *, timeout: float | None = None) -> Any:
+        metrics = self._metrics
+        timeout = timeout if timeout is not None else self._acquire_timeout
+        metrics.waiting += 1
+        if metrics.waiting > metrics.max_waiting:
+            metrics.max_waiting = metrics.waiting
+        started = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            metrics.timeouts += 1
+            raise PoolAcquireTimeout(metrics.connection_name, timeout)
+        finally:
+            metrics.waiting -= 1
+            metrics.wait_ms.observe((time.perf_counter() - started) * 1000)
+        metrics.acquires += 1
+        return connection
+
+    async def release(self, connection: Any, *, timeout: float | None = None) -> None:
+        await self._pool.release(connection, timeout=timeout)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
+# {连接名: PoolMetrics}
+_pool_metrics: dict[str, PoolMetrics] = {}
+
+
+def _instrument_client(connection_name: str, client: Any) -> None:
+    if getattr(client, "_pool_instrumented", False):
+        return
+    metrics = _pool_metrics.setdefault(connection_name, PoolMetrics(connection_name))
+    acquire_timeout = settings.DB_POOL_ACQUIRE_TIMEOUT.get(connection_name)
+    create_pool = client.create_pool
+
+    async def instrumented_create_pool(**kwargs: Any) -> InstrumentedPool:
+        return InstrumentedPool(await create_pool(**kwargs), metrics, acquire_timeout)
+
+    # 连接池在首次使用时才创建, 替换实例上的 create_pool 以包装之后创建的连接池
+    client.create_pool = instrumented_create_pool
+    if client._pool is not None and not isinstance(client._pool, InstrumentedPool):
+        client._pool = InstrumentedPool(client._pool, metrics, acquire_timeout)
+    client._pool_instrumented = True
+
+
+def instrument_pools() -> None:
+    """为所有 asyncpg 连接安装连接池统计 (需在 Tortoise.init 之后调用)"""
+    for connection_name, connection_config in settings.TORTOISE_ORM["connections"].items():
+        if isinstance(connection_config, dict) and connection_config.get("engine") == "tortoise.backends.asyncpg":
+            _instrument_client(connection_name, connections.get(connection_name))
+
+
+def get_pool_stats() -> dict[str, Any]:
+    """各连接池当前状态: 使用中/空闲连接数、等待数、获取耗时分布与超时次数"""
+    stats = {}
+    for connection_name, metrics in _pool_metrics.items():
+        pool = getattr(connections.get(connection_name), "_pool", None)
+        size = pool.get_size() if pool is not None else 0
+        idle = pool.get_idle_size() if pool is not None else 0
+        stats[connection_name] = {
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "min_size": pool.get_min_size() if pool is not None else 0,
+            "max_size": pool.get_max_size() if pool is not None else 0,
+            "waiting": metrics.waiting,
+            "max_waiting": metrics.max_waiting,
+            "acquires": metrics.acquires,
+            "acquire_timeouts": metrics.timeouts,
+            "acquire_wait_ms": metrics.wait_ms.snapshot(),
+        }
+    return stats
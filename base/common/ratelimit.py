@@ -0,0 +1,320 @@
+import hashlib
+import mmap
+import os
+import struct
+import time
+from typing import Any
+
+from starlette.types import Scope
+
+from base.common.log import log
+from base.common.setting import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# 由 serve 命令设置, worker 使用主进程启动时重置过的共享内存文件
+SHM_PATH_ENV = "AIPANEL_RATELIMIT_SHM"
+
+
+def shm_path(port: int) -> str:
+    """
+    共享内存文件路径: settings.RATE_LIMIT_SHM_PATH 加上项目目录摘要与端口
+
+    同一主机上的不同实例 (不同部署目录或端口) 各用一个文件, 不会共用限额。
+    """
+    project = hashlib.blake2b(str(settings.base_path.resolve()).encode("utf-8"), digest_size=4).hexdigest()
+    return f"{settings.RATE_LIMIT_SHM_PATH}-{project}-{port}"
+
+
+def reset_shm(path: str) -> None:
+    """删除共享内存文件, 由主进程在启动 worker 前与退出后调用, 上次运行的计数不会延续"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class Limit:
+    """
+    令牌桶参数, 配置格式为 "次数/周期", 如 20/s、600/m、10000/h
+
+    桶容量等于次数 (允许的突发量), 按 次数/周期 的速率补充令牌。
+    """
+
+    __slots__ = ("rate", "capacity", "text")
+
+    def __init__(self, count: int, period: float, text: str) -> None:
+        self.capacity = float(count)
+        self.rate = count / period
+        self.text = text
+
+    @classmethod
+    def parse(cls, text: str) -> "Limit | None":
+        """空字符串或 0 表示不限制"""
+        text = text.strip()
+        if not text:
+            return None
+        count, _, period = text.partition("/")
+        count = int(count)
+        if count <= 0:
+            return None
+        period = period.strip().lower() or "s"
+        seconds = PERIODS.get(period[-1])
+        if seconds is None:
+            raise ValueError(f"无效的限流配置: {text}")
+        multiple = period[:-1]
+        return cls(count, seconds * (float(multiple) if multiple else 1), text)
+
+
+def _take(tokens: float, last: float, now: float, limit: Limit) -> tuple[float, float]:
+    """
+    从桶中取一个令牌
+
+    Returns:
+        (剩余令牌数, 需要等待的秒数), 等待秒数为 0 表示放行
+    """
+    tokens = min(limit.capacity, tokens + (now - last) * limit.rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / limit.rate
+
+
+class LocalRateLimitBackend:
+    """
+    进程内令牌桶 (默认)
+
+    桶按键的哈希分布在多个分片字典中, 每隔 sweep_interval / 分片数 秒在请求路径上清理一个
+    分片里已经回满的桶 (回满的桶与新建的桶等价), 单次清理只涉及一个分片, 不会造成长时间停顿。
+    多 worker 部署时各进程分别计数。
+    """
+
+    def __init__(self, shards: int, sweep_interval: float) -> None:
+        # {键: [令牌数, 上次更新时间, 回满时间]}
+        self.shards: list[dict[str, list[float]]] = [{} for _ in range(max(1, shards))]
+        self._sweep_step = sweep_interval / len(self.shards)
+        self._next_sweep = time.monotonic() + self._sweep_step
+        self._sweep_index = 0
+
+    def acquire(self, key: str, limit: Limit, now: float) -> float:
+        """取一个令牌, 返回需要等待的秒数 (0 表示放行)"""
+        if now >= self._next_sweep:
+            self._sweep(now)
+        shard = self.shards[hash(key) % len(self.shards)]
+        bucket = shard.get(key)
+        if bucket is None:
+            tokens, wait = limit.capacity - 1, 0.0
+            shard[key] = bucket = [0.0, 0.0, 0.0]
+        else:
+            tokens, wait = _take(bucket[0], bucket[1], now, limit)
+        bucket[0] = tokens
+        bucket[1] = now
+        bucket[2] = now + (limit.capacity - tokens) / limit.rate
+        return wait
+
+    def _sweep(self, now: float) -> None:
+        shard = self.shards[self._sweep_index]
+        for key in [key for key, bucket in shard.items() if bucket[2] <= now]:
+            del shard[key]
+        self._sweep_index = (self._sweep_index + 1) % len(self.shards)
+        self._next_sweep = now + self._sweep_step
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "local", "buckets": sum(len(shard) for shard in self.shards), "shards": len(self.shards)}
+
+
+class SharedMemoryRateLimitBackend:
+    """
+    共享内存令牌桶, 同一主机上的多个 worker 共用限额
+
+    桶保存在共享内存文件 (见 shm_path) 映射的固定大小哈希表中 (每个槽位: 键哈希、令牌数、
+    上次更新时间、回满时间), 槽位按分片划分, 每个分片用 fcntl 记录锁保护。键在分片内线性探测
+    最多 PROBES 个槽位, 已回满的槽位直接复用, 探测范围全部被占用时覆盖最久未更新的槽位。
+    时间使用系统范围的单调时钟, 各进程一致。
+    """
+
+    SLOT = struct.Struct("<Qddd")
+    PROBES = 8
+
+    def __init__(self, path: str, slots: int, shards: int) -> None:
+        self.path = path
+        self.shards = max(1, shards)
+        self.shard_slots = max(self.PROBES, slots // self.shards)
+        size = self.SLOT.size * self.shard_slots * self.shards
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self.evictions = 0
+
+    def acquire(self, key: str, limit: Limit, now: float) -> float:
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+        shard = digest % self.shards
+        region = self.SLOT.size * self.shard_slots
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, region, region * shard)
+        try:
+            offset = self._find_slot(digest, shard, now)
+            slot_key, tokens, last, full_at = self.SLOT.unpack_from(self._map, offset)
+            if slot_key != digest or full_at <= now or last > now:
+                # 新桶 (或上次开机遗留的数据)
+                tokens, wait = limit.capacity - 1, 0.0
+            else:
+                tokens, wait = _take(tokens, last, now, limit)
+            self.SLOT.pack_into(self._map, offset, digest, tokens, now, now + (limit.capacity - tokens) / limit.rate)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, region, region * shard)
+        return wait
+
+    def _find_slot(self, digest: int, shard: int, now: float) -> int:
+        start = (digest // self.shards) % self.shard_slots
+        base = shard * self.shard_slots
+        free = None
+        oldest, oldest_last = None, None
+        for probe in range(self.PROBES):
+            offset = (base + (start + probe) % self.shard_slots) * self.SLOT.size
+            slot_key, _, last, full_at = self.SLOT.unpack_from(self._map, offset)
+            if slot_key == digest:
+                return offset
+            if free is None and (slot_key == 0 or full_at <= now):
+                free = offset
+            if oldest is None or last < oldest_last:
+                oldest, oldest_last = offset, last
+        if free is not None:
+            return free
+        self.evictions += 1
+        return oldest
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        used = sum(
+            1 for offset in range(0, len(self._map), self.SLOT.size)
+            if self.SLOT.unpack_from(self._map, offset)[3] > now
+        )
+        return {
+            "backend": "shm",
+            "path": self.path,
+            "slots": self.shard_slots * self.shards,
+            "buckets": used,
+            "evictions": self.evictions,
+        }
+
+
+class RateLimiter:
+    """
+    请求限流: 按客户端 IP、用户 (认证头) 与路由分别计数
+
+    - settings.RATE_LIMIT_IP: 每个 IP 的限额
+    - settings.RATE_LIMIT_USER: 每个认证头 (用户令牌) 的限额
+    - settings.RATE_LIMIT_ROUTES: 路由前缀的限额, 按 用户 (无认证头时按 IP) 分别计数,
+      键为 "<路径前缀>" 或 "<METHOD> <路径前缀>", 取最长匹配前缀
+
+    每个请求只做常数次字典查找 (路由匹配与路径深度有关, 与规则数量无关)。
+    """
+
+    def __init__(self) -> None:
+        self.ip_limit = Limit.parse(settings.RATE_LIMIT_IP)
+        self.user_limit = Limit.parse(settings.RATE_LIMIT_USER)
+        # {(方法 或 None, 路径前缀): 限额}
+        self.routes: dict[tuple[str | None, str], Limit] = {}
+        for rule, text in settings.RATE_LIMIT_ROUTES.items():
+            limit = Limit.parse(text)
+            if limit is None:
+                continue
+            method, _, prefix = rule.strip().rpartition(" ")
+            self.routes[(method.strip().upper() or None, prefix.rstrip("/").lower() or "/")] = limit
+        self.exempt = frozenset(settings.RATE_LIMIT_EXEMPT)
+        self.backend = self._create_backend()
+        self.allowed = 0
+        self.limited: dict[str, int] = {"ip": 0, "user": 0, "route": 0}
+
+    @staticmethod
+    def _create_backend() -> LocalRateLimitBackend | SharedMemoryRateLimitBackend:
+        if settings.RATE_LIMIT_BACKEND == "shm":
+            if fcntl is not None:
+                # 单进程启动 (未经 serve) 时按配置端口确定文件
+                path = os.environ.get(SHM_PATH_ENV) or shm_path(settings.SERVER_PORT)
+                return SharedMemoryRateLimitBackend(path, settings.RATE_LIMIT_SHM_SLOTS, settings.RATE_LIMIT_SHARDS)
+            log.warning("当前平台不支持 fcntl, 限流使用进程内后端, 多 worker 时各自计数")
+        return LocalRateLimitBackend(settings.RATE_LIMIT_SHARDS, settings.RATE_LIMIT_SWEEP_INTERVAL)
+
+    def match_route(self, method: str, path: str) -> tuple[str, Limit] | None:
+        if not self.routes:
+            return None
+        segments = path.lower().rstrip("/").split("/")
+        for depth in range(len(segments), 0, -1):
+            prefix = "/".join(segments[:depth]) or "/"
+            for rule in ((method, prefix), (None, prefix)):
+                limit = self.routes.get(rule)
+                if limit is not None:
+                    return f"{rule[0] or '*'} {prefix}", limit
+        return None
+
+    def check(self, scope: Scope) -> tuple[str, float]:
+        """
+        为请求取令牌
+
+        Returns:
+            (触发限流的维度, 需要等待的秒数), 放行时返回 ("", 0)
+        """
+        client = scope.get("client")
+        ip = client[0] if client else ""
+        if ip in self.exempt:
+            return "", 0.0
+        authorization = None
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                authorization = value
+                break
+        now = time.monotonic()
+        acquire = self.backend.acquire
+
+        if self.ip_limit is not None:
+            wait = acquire(f"ip:{ip}", self.ip_limit, now)
+            if wait:
+                return self._limited("ip", wait)
+        user = None
+        if authorization is not None:
+            user = hashlib.blake2b(authorization, digest_size=8).hexdigest()
+            if self.user_limit is not None:
+                wait = acquire(f"user:{user}", self.user_limit, now)
+                if wait:
+                    return self._limited("user", wait)
+        route = self.match_route(scope["method"], scope["path"])
+        if route is not None:
+            rule, limit = route
+            wait = acquire(f"route:{rule}:{user or ip}", limit, now)
+            if wait:
+                return self._limited("route", wait)
+        self.allowed += 1
+        return "", 0.0
+
+    def _limited(self, kind: str, wait: float) -> tuple[str, float]:
+        self.limited[kind] += 1
+        return kind, wait
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "ip": self.ip_limit.text if self.ip_limit else None,
+            "user": self.user_limit.text if self.user_limit else None,
+            "routes": {f"{method or '*'} {prefix}": limit.text for (method, prefix), limit in self.routes.items()},
+            "allowed": self.allowed,
+            "limited": self.limited,
+            **self.backend.stats(),
+        }
+
+
+_limiter: RateLimiter | None = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
+
+
+def get_rate_limit_stats() -> dict[str, Any]:
+    return get_rate_limiter().stats() if settings.RATE_LIMIT_ENABLE else {}
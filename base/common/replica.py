@@ -0,0 +1,152 @@
+import hashlib
+import itertools
+import time
+from contextvars import ContextVar, Token
+from typing import Any
+
+from starlette.requests import cookie_parser
+from starlette.types import Scope
+from tortoise import connections
+from tortoise.backends.base.client import BaseTransactionWrapper
+
+from base.common.setting import settings
+
+# 只读请求方法, 这些请求中的查询允许路由到副本
+READ_METHODS = frozenset({"GET", "HEAD"})
+# 读己之写记录的上限, 超过后清理过期记录
+_RECENT_WRITES_LIMIT = 10000
+# 读己之写标记 cookie, 值为窗口截止的 Unix 时间戳; 多 worker (及多主机) 部署中写请求与
+# 随后的读请求通常落在不同进程, 进程内记录看不到, 由客户端带回的 cookie 标记
+WRITE_COOKIE = "db_rw"
+
+
+class RoutingState:
+    """单个请求的读写路由状态"""
+
+    __slots__ = ("read_only", "wrote", "client_key")
+
+    def __init__(self, read_only: bool, client_key: str | None) -> None:
+        self.read_only = read_only
+        self.wrote = False
+        self.client_key = client_key
+
+
+_routing_state: ContextVar[RoutingState | None] = ContextVar("db_routing_state", default=None)
+# {客户端标识: 截止时间}, 截止前该客户端在本进程的读请求走主库 (不接受 cookie 的客户端)
+_recent_writes: dict[str, float] = {}
+
+
+def _client_key(scope: Scope) -> str | None:
+    """按认证头 (摘要) 区分客户端, 无认证头时使用客户端地址"""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            return hashlib.blake2b(value, digest_size=16).hexdigest()
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def _cookie_marked(scope: Scope) -> bool:
+    """
+    请求是否带有未过期的写入标记 cookie
+
+    标记未签名: 伪造只能让自己的读请求走主库, 截止时间超出一个窗口的标记视为无效,
+    因此伪造得到的效果不超过一次真实的写入。
+    """
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie":
+            marker = cookie_parser(value.decode("latin-1")).get(WRITE_COOKIE)
+            if not marker:
+                return False
+            try:
+                deadline = float(marker)
+            except ValueError:
+                return False
+            now = time.time()
+            return now < deadline <= now + settings.DB_READ_YOUR_WRITES_SECONDS
+    return False
+
+
+def begin_request(scope: Scope) -> Token:
+    """请求开始时设置路由状态, GET/HEAD 且不在读己之写窗口内时允许读副本"""
+    client_key = _client_key(scope)
+    read_only = scope.get("method") in READ_METHODS
+    if read_only and settings.DB_READ_YOUR_WRITES_SECONDS > 0 and _cookie_marked(scope):
+        read_only = False
+    if read_only and client_key is not None:
+        deadline = _recent_writes.get(client_key)
+        if deadline is not None:
+            if deadline > time.monotonic():
+                read_only = False
+            else:
+                _recent_writes.pop(client_key, None)
+    return _routing_state.set(RoutingState(read_only, client_key))
+
+
+def end_request(token: Token) -> None:
+    _routing_state.reset(token)
+
+
+def write_cookie_header() -> bytes | None:
+    """当前请求写过主库时, 返回设置读己之写标记的 Set-Cookie 响应头值"""
+    state = _routing_state.get()
+    window = settings.DB_READ_YOUR_WRITES_SECONDS
+    if state is None or not state.wrote or window <= 0:
+        return None
+    # 截止时间截断到毫秒: 四舍五入可能超出一个窗口, 紧接着的读请求会把标记当作伪造
+    deadline = int((time.time() + window) * 1000) / 1000
+    return (
+        f"{WRITE_COOKIE}={deadline:.3f}; Max-Age={max(1, int(window + 0.999))}; "
+        f"Path=/; HttpOnly; SameSite=Lax"
+    ).encode("latin-1")
+
+
+def _record_write(state: RoutingState) -> None:
+    state.wrote = True
+    window = settings.DB_READ_YOUR_WRITES_SECONDS
+    if window <= 0 or state.client_key is None:
+        return
+    now = time.monotonic()
+    if len(_recent_writes) >= _RECENT_WRITES_LIMIT:
+        for key in [key for key, deadline in _recent_writes.items() if deadline <= now]:
+            del _recent_writes[key]
+    _recent_writes[state.client_key] = now + window
+
+
+class ReplicaRouter:
+    """
+    Tortoise 读写分离路由
+
+    只读请求 (GET/HEAD) 中的查询按策略分发到只读副本; 写操作、事务内的查询、
+    请求之外 (启动任务/后台任务) 的查询以及读己之写窗口内的请求全部走主库。
+    返回 None 表示使用模型的默认连接 (主库)。
+    """
+
+    def __init__(self) -> None:
+        self.replicas = list(settings.DB_REPLICAS)
+        self._round_robin = itertools.cycle(self.replicas) if self.replicas else None
+
+    def _least_busy(self) -> str:
+        def busy(name: str) -> int:
+            pool = getattr(connections.get(name), "_pool", None)
+            if pool is None:
+                return 0
+            return pool.get_size() - pool.get_idle_size() + getattr(getattr(pool, "_metrics", None), "waiting", 0)
+
+        return min(self.replicas, key=busy)
+
+    def db_for_read(self, model: Any) -> str | None:
+        state = _routing_state.get()
+        if state is None or not state.read_only or state.wrote or not self.replicas:
+            return None
+        if isinstance(model._meta.db, BaseTransactionWrapper):
+            # 事务内的读取必须与写入使用同一连接
+            return None
+        if settings.DB_REPLICA_STRATEGY == "least_busy":
+            return self._least_busy()
+        return next(self._round_robin)
+
+    def db_for_write(self, model: Any) -> str | None:
+        state = _routing_state.get()
+        if state is not None:
+            _record_write(state)
+        return None
@@ -1,10 +1,210 @@
+import base64
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from email.utils import format_datetime, parsedate_to_datetime
 from typing import Any, Mapping
+
+import orjson
 from fastapi import status
 from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import Response
 from pydantic import Field, BaseModel
+from tortoise import timezone
+from tortoise.models import Model
 
 from base.common.constant import RET
+from base.common.instrument import current_request_timings
+
+# orjson 原生支持 datetime/date/UUID/Enum/dataclass, 其余类型由 _default 兜底
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """
+    orjson 无法原生序列化的类型的兜底转换
+    
+    参数:
+    - obj (Any): 待序列化对象。
+    
+    返回:
+    - Any: orjson 可序列化的对象。
+    """
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, Model):
+        return {field: getattr(obj, field) for field in obj._meta.db_fields}
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if hasattr(obj, "_asdict"):
+        # 投影行 (BaseModel.rows) 与 namedtuple
+        return obj._asdict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        # 二进制内容不一定是合法 UTF-8, 统一按 Base64 输出
+        return base64.b64encode(obj).decode("ascii")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def json_dumps(content: Any) -> bytes:
+    """
+    使用 orjson 将对象直接序列化为 bytes
+    
+    参数:
+    - content (Any): 待序列化对象。
+    
+    返回:
+    - bytes: JSON 字节串。
+    """
+    timings = current_request_timings()
+    if timings is None:
+        return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+    # 计入当前请求的序列化耗时 (Server-Timing: serialize)
+    started = time.perf_counter()
+    try:
+        return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+    finally:
+        timings.serialize_ms += (time.perf_counter() - started) * 1000
+
+
+def render_envelope(
+        data: Any,
+        msg: str,
+        code: int,
+        status_code: int,
+        success: bool
+) -> bytes:
+    """
+    直接将响应信封 {code, msg, data, status_code, success} 序列化为 bytes,
+    跳过 ResponseSchema 的构建与 model_dump, 字段顺序与 ResponseSchema 保持一致。
+    
+    参数:
+    - data (Any): 响应数据。
+    - msg (str): 响应消息。
+    - code (int): 业务状态码。
+    - status_code (int): HTTP 状态码。
+    - success (bool): 操作是否成功。
+    
+    返回:
+    - bytes: JSON 字节串。
+    """
+    return json_dumps({
+        "code": code,
+        "msg": msg,
+        "data": data,
+        "status_code": status_code,
+        "success": success,
+    })
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    If-None-Match 是否命中 (弱比较)
+    
+    参数:
+    - if_none_match (str | None): 请求头 If-None-Match 的值。
+    - etag (str): 当前表示的 ETag。
+    
+    返回:
+    - bool: 命中时返回 True。
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class Validator:
+    """
+    条件请求校验值 (ETag 与 Last-Modified)
+
+    单个对象由 updated_at 计算, 列表由 max(updated_at) 与记录数计算 (见 BaseModel.validator):
+    新增、修改都会改变最大更新时间, 删除会改变记录数。处理函数可以在加载完整数据之前调用
+    not_modified(request), 命中时直接返回 304, 不再查询与序列化响应体。
+    """
+
+    __slots__ = ("etag", "last_modified", "count")
+
+    def __init__(self, last_modified: datetime | None, count: int = 1, salt: str = "") -> None:
+        """
+        初始化校验值
+        
+        参数:
+        - last_modified (datetime | None): 最后修改时间, 没有记录时为 None。
+        - count (int): 记录数。
+        - salt (str): 区分不同表示的附加值, 如表名、字段集合或当前用户。
+        
+        返回:
+        - None
+        """
+        if last_modified is not None:
+            if timezone.is_naive(last_modified):
+                last_modified = timezone.make_aware(last_modified)
+            last_modified = last_modified.astimezone(dt_timezone.utc)
+        self.last_modified = last_modified
+        self.count = count
+        stamp = last_modified.isoformat() if last_modified is not None else "-"
+        digest = hashlib.blake2b(f"{salt}|{count}|{stamp}".encode("utf-8"), digest_size=12).hexdigest()
+        # 响应体可能被压缩, 使用弱 ETag
+        self.etag = f'W/"{digest}"'
+
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        """
+        判断客户端缓存是否仍然有效 (If-None-Match 优先于 If-Modified-Since)
+        
+        参数:
+        - request (Request): 当前请求。
+        
+        返回:
+        - bool: 仅 GET/HEAD 请求且校验值未变化时返回 True。
+        """
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        if_modified_since = request.headers.get("if-modified-since")
+        if not if_modified_since or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=dt_timezone.utc)
+        # HTTP 日期只精确到秒
+        return self.last_modified.replace(microsecond=0) <= since
+
+    def not_modified(self, request: Request) -> "NotModifiedResponse | None":
+        """
+        客户端缓存有效时返回 304 响应, 否则返回 None
+        
+        参数:
+        - request (Request): 当前请求。
+        
+        返回:
+        - NotModifiedResponse | None: 304 响应或 None。
+        """
+        return NotModifiedResponse(self) if self.matches(request) else None
+
+
+class NotModifiedResponse(Response):
+    """304 响应, 只携带校验值响应头"""
+
+    def __init__(self, validator: Validator) -> None:
+        super().__init__(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator.headers())
+
 
 class ResponseSchema(BaseModel):
     """响应模型"""
@@ -15,7 +215,17 @@ class ResponseSchema(BaseModel):
     success: bool = Field(default=True, description='操作是否成功')
 
 
-class SuccessResponse(JSONResponse):
+class ORJSONResponse(JSONResponse):
+    """基于 orjson 的 JSON 响应类"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            # 已经序列化好的信封直接透传
+            return content
+        return json_dumps(content)
+
+
+class SuccessResponse(ORJSONResponse):
     """成功响应类"""
 
     def __init__(
@@ -24,7 +234,8 @@ class SuccessResponse(JSONResponse):
             msg: str = RET.OK.msg,
             code: int = RET.OK.code,
             status_code: int = status.HTTP_200_OK,
-            success: bool = True
+            success: bool = True,
+            validator: Validator | None = None
     ) -> None:
         """
         初始化成功响应类
@@ -35,21 +246,26 @@ class SuccessResponse(JSONResponse):
         - code (int): 业务状态码。
         - status_code (int): HTTP 状态码。
         - success (bool): 操作是否成功。
+        - validator (Validator | None): 条件请求校验值, 设置后输出 ETag/Last-Modified 响应头。
         
         返回:
         - None
         """
-        content = ResponseSchema(
-            code=code,
-            msg=msg,
+        content = render_envelope(
             data=data,
+            msg=msg,
+            code=code,
             status_code=status_code,
             success=success
-        ).model_dump()
-        super().__init__(content=content, status_code=status_code)
+        )
+        super().__init__(
+            content=content,
+            status_code=status_code,
+            headers=validator.headers() if validator is not None else None
+        )
 
 
-class ErrorResponse(JSONResponse):
+class ErrorResponse(ORJSONResponse):
     """错误响应类"""
 
     def __init__(
@@ -73,13 +289,13 @@ class ErrorResponse(JSONResponse):
         返回:
         - None
         """
-        content = ResponseSchema(
-            code=code,
-            msg=msg,
+        content = render_envelope(
             data=data,
+            msg=msg,
+            code=code,
             status_code=status_code,
             success=success
-        ).model_dump()
+        )
         super().__init__(content=content, status_code=status_code)
 
 
@@ -8,12 +8,15 @@ from typing import Callable, Iterable, Any
 from functools import wraps
 from typing import List, Optional
 from base.common.log import log
+from base.common.manifest import get_manifest, import_mark, report_import_timings, timed_import
+from base.common.plugin import load_plugin_specs, plugin_registry
 
 def auto_discover_routers(
     app: FastAPI,
     base_package: str,
     router_variable_name: str = "router",
-    skip_modules: Optional[List[str]] = None
+    skip_modules: Optional[List[str]] = None,
+    discovered: Optional[List[str]] = None
 ) -> None:
     """
     自动发现并注册 FastAPI 路由
@@ -23,6 +26,7 @@ def auto_discover_routers(
         base_package: 要扫描的基础包名（如 "base.core.users.api.v1"）
         router_variable_name: 路由实例的变量名（默认为 "router"）
         skip_modules: 要跳过的模块名列表
+        discovered: 传入列表时追加注册了路由的模块名 (用于生成发现清单)
     """
     if skip_modules is None:
         skip_modules = ["__pycache__","middleware", "models", "schemas", "tests"]
@@ -52,7 +56,7 @@ def auto_discover_routers(
             continue
             
         try:
-            module = importlib.import_module(full_name)
+            module = timed_import(full_name)
             
             # 查找路由实例
             router_instance = getattr(module, router_variable_name, None)
@@ -61,11 +65,13 @@ def auto_discover_routers(
                 # 注册路由到主应用
                 app.include_router(router_instance)
                 routers_found += 1
+                if discovered is not None:
+                    discovered.append(full_name)
                 print(f"✅ 已注册路由: {full_name} -> {router_instance.prefix or '/'}")
             
             # 如果是包，递归扫描（支持子目录）
             if ispkg:
-                num = _discover_in_subpackage(app, full_name, router_variable_name, routers_found,skip_modules)
+                num = _discover_in_subpackage(app, full_name, router_variable_name, routers_found,skip_modules, discovered)
                 routers_found += num if num else 0
         except ImportError as e:
             print(f"⚠️ 导入模块失败 {full_name}: {e}")
@@ -74,7 +80,7 @@ def auto_discover_routers(
     
     print(f"🎯 路由自动发现完成，共注册 {routers_found} 个路由")
 
-def _discover_in_subpackage(app: FastAPI, package_name: str, router_var: str, routers_found: int, skip_modules: List[str]):
+def _discover_in_subpackage(app: FastAPI, package_name: str, router_var: str, routers_found: int, skip_modules: List[str], discovered: Optional[List[str]] = None):
     """递归发现子包中的路由"""
     try:
         sub_module = importlib.import_module(package_name)
@@ -89,17 +95,19 @@ def _discover_in_subpackage(app: FastAPI, package_name: str, router_var: str, ro
                 continue
                 
             try:
-                module = importlib.import_module(full_name)
+                module = timed_import(full_name)
                 router_instance = getattr(module, router_var, None)
                 
                 if isinstance(router_instance, APIRouter):
                     app.include_router(router_instance)
                     routers_found += 1
+                    if discovered is not None:
+                        discovered.append(full_name)
                     print(f"✅ 已注册子包路由: {full_name}")
                 
                 # 继续递归
                 if ispkg:
-                    num = _discover_in_subpackage(app, full_name, router_var,routers_found, skip_modules)
+                    num = _discover_in_subpackage(app, full_name, router_var,routers_found, skip_modules, discovered)
                     routers_found += num if num else 0
                     
             except ImportError as e:
@@ -108,7 +116,63 @@ def _discover_in_subpackage(app: FastAPI, package_name: str, router_var: str, ro
     except ImportError:
         return
 
+def discover_plugin_routers(
+    app: FastAPI,
+    package_name: str,
+    router_variable_name: str = "router",
+    discovered: Optional[List[str]] = None
+) -> None:
+    """注册单个插件包的路由 (包自身导出的路由及其子模块中的路由)"""
+    try:
+        package = timed_import(package_name)
+    except ImportError as e:
+        print(f"⚠️ 导入插件失败 {package_name}: {e}")
+        return
+    router_instance = getattr(package, router_variable_name, None)
+    if isinstance(router_instance, APIRouter):
+        app.include_router(router_instance)
+        if discovered is not None:
+            discovered.append(package_name)
+        print(f"✅ 已注册路由: {package_name} -> {router_instance.prefix or '/'}")
+    auto_discover_routers(app, package_name, router_variable_name, discovered=discovered)
+
+def register_routers_from_manifest(app: FastAPI, module_names: List[str], router_variable_name: str = "router") -> None:
+    """按发现清单只导入记录的模块并注册路由, 不再遍历包目录"""
+    routers_found = 0
+    for full_name in module_names:
+        try:
+            module = timed_import(full_name)
+        except ImportError as e:
+            print(f"⚠️ 导入模块失败 {full_name}: {e}")
+            continue
+        router_instance = getattr(module, router_variable_name, None)
+        if isinstance(router_instance, APIRouter):
+            app.include_router(router_instance)
+            routers_found += 1
+            print(f"✅ 已注册路由: {full_name} -> {router_instance.prefix or '/'}")
+    print(f"🎯 路由清单加载完成，共注册 {routers_found} 个路由")
+
 def register_routers(app: FastAPI):
-    # 自动注册 core 和 plugins 目录下的所有路由
-    auto_discover_routers(app, base_package="base.core")
-    auto_discover_routers(app, base_package="base.plugins")
\ No newline at end of file
+    mark = import_mark()
+    plugin_specs = load_plugin_specs()
+    # 声明了 lazy 的插件在首次请求其前缀时才导入
+    for spec in plugin_specs:
+        if spec.lazy:
+            plugin_registry.register(spec)
+
+    eager_plugins = [spec.name for spec in plugin_specs if not spec.lazy]
+    manifest = get_manifest()
+    recorded = manifest.get("routers") if manifest else None
+    # 预加载列表在 config.conf 中配置, 不在源码指纹内, 变化时同样需要重新扫描
+    if recorded is not None and recorded.get("eager_plugins") == eager_plugins:
+        register_routers_from_manifest(app, recorded["modules"])
+    else:
+        router_modules = []
+        # 自动注册 core 和 plugins 目录下的所有路由
+        auto_discover_routers(app, base_package="base.core", discovered=router_modules)
+        for spec in plugin_specs:
+            if not spec.lazy:
+                discover_plugin_routers(app, spec.package, discovered=router_modules)
+        if manifest:
+            manifest.update("routers", {"eager_plugins": eager_plugins, "modules": router_modules})
+    report_import_timings("路由发现", mark)
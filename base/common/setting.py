@@ -1,5 +1,6 @@
 from . import config
 import os
+import tempfile
 import typing
 from pydantic_settings import BaseSettings
 from typing import Any, List, Optional, Literal
@@ -34,6 +35,57 @@ def get_model_list() -> List[str]:
 	model_list = core_models + plugin_models + ['aerich.models']
 	return model_list
 
+def get_pool_options(section: str = "db") -> dict[str, Any]:
+	"""
+	读取连接池配置, 作为 asyncpg 连接的 credentials 额外参数
+
+	Args:
+		section: config.conf 中的配置节
+
+	Returns:
+		minsize/maxsize 由 Tortoise 转换为 asyncpg 的 min_size/max_size, 其余参数直接传给 asyncpg.create_pool
+	"""
+	return {
+		"minsize": config.config.getint(section, "pool_minsize", fallback=2),
+		"maxsize": config.config.getint(section, "pool_maxsize", fallback=10),
+		# 空闲连接最长保留时间(秒)
+		"max_inactive_connection_lifetime": config.config.getfloat(section, "pool_max_inactive_lifetime", fallback=300.0),
+		# 单个连接最多执行的查询数, 超过后重建连接
+		"max_queries": config.config.getint(section, "pool_max_queries", fallback=50000),
+		# 每个连接的预编译语句缓存大小, 使用 pgbouncer 事务池模式时应设为 0
+		"statement_cache_size": config.config.getint(section, "statement_cache_size", fallback=100),
+	}
+
+
+def get_replica_connections() -> dict[str, dict]:
+	"""
+	读取只读副本连接配置
+
+	config.conf 中每个 [db.replica.<name>] 配置节对应一个名为 replica_<name> 的连接,
+	asyncpg 副本使用与 [db] 相同的配置项 (未配置时沿用主库), sqlite 副本 (本地测试用) 只需 file_path。
+	"""
+	replicas = {}
+	for section in config.config.sections():
+		if not section.startswith("db.replica."):
+			continue
+		name = f"replica_{section[len('db.replica.'):]}"
+		engine = config.config.get(section, "engine", fallback="tortoise.backends.asyncpg")
+		if engine == "tortoise.backends.sqlite":
+			credentials = {"file_path": config.config.get(section, "file_path")}
+		else:
+			credentials = {
+				# 未配置的项沿用主库 [db] 的配置 (配置项与默认值与 Settings.db_* 相同)
+				"host": config.config.get(section, "host", fallback=config.config.get("db", "host", fallback="127.0.0.1")),
+				"port": config.config.getint(section, "port", fallback=config.config.getint("db", "port", fallback=5432)),
+				"user": config.config.get(section, "user", fallback=config.config.get("db", "user", fallback="admin")),
+				"password": config.config.get(section, "password", fallback=config.config.get("db", "password", fallback="123456")),
+				"database": config.config.get(section, "name", fallback=config.config.get("db", "name", fallback="aipaneladmin")),
+				**get_pool_options(section),
+			}
+		replicas[name] = {"engine": engine, "credentials": credentials}
+	return replicas
+
+
 class Settings(BaseSettings):
 	
 	app_name: str = config.config.get("app", "name", fallback="AIPanelAdmin")
@@ -45,9 +97,20 @@ class Settings(BaseSettings):
 	db_user: str = config.config.get("db", "user", fallback="admin")
 	db_password: str = config.config.get("db", "password", fallback="123456")
 	db_port: int = config.config.getint("db", "port", fallback=5432)
+	# 启动迁移模式: fast(模型无变化时跳过) / always(每次启动执行) / off(不执行)
+	DB_MIGRATE_MODE: Literal["fast", "always", "off"] = config.config.get("db", "migrate_mode", fallback="fast")
 	# 项目根目录
 	base_path: Path = Path(__file__).parent.parent.parent
-	LOG_DIR: str = config.config.get("log", "path", fallback=str(base_path / "logs"))
+	# 日志目录, 相对路径相对于项目根目录
+	LOG_DIR: str = str(base_path / config.config.get("log", "path", fallback="logs"))
+	# 路由/中间件发现清单: 源码未变化时启动只导入清单中记录的模块
+	DISCOVERY_MANIFEST: bool = config.config.getboolean("app", "discovery_manifest", fallback=True)
+	DISCOVERY_MANIFEST_PATH: str = str(base_path / ".cache" / "discovery_manifest.json")
+	DISCOVERY_SLOW_IMPORT_MS: float = 50.0   # 导入耗时超过此值(毫秒)的模块在启动时单独列出
+	# 生成的 OpenAPI 文档 (gzip) 持久化到发现清单所在目录, 代码未变化时新 worker 直接读取
+	OPENAPI_CACHE: bool = config.config.getboolean("app", "openapi_cache", fallback=True)
+	# 声明了 lazy 但需要启动时预加载的热点插件, 见插件目录下的 plugin.conf
+	PLUGIN_WARM: list[str] = [name.strip() for name in config.config.get("plugins", "warm", fallback="").split(",") if name.strip()]
 	# ================================================= #
 	# ******************** 跨域配置 ******************** #
 	# ================================================= #
@@ -60,8 +123,17 @@ class Settings(BaseSettings):
 	ALLOW_METHODS: List[str] = ["*"]   # 允许的HTTP方法
 	ALLOW_HEADERS: List[str] = ["*"]   # 允许的请求头
 	ALLOW_CREDENTIALS: bool = True     # 是否允许携带cookie
-	CORS_EXPOSE_HEADERS: list[str] = ['X-Request-ID']	
+	CORS_EXPOSE_HEADERS: list[str] = ['X-Request-ID', 'Retry-After', 'X-RateLimit-Scope']	# 浏览器可读取的响应头 (Retry-After 不在默认允许范围内)
 	# ================================================= #	
+	# ******************** 读写分离 ******************** #
+	# ================================================= #
+	# 只读副本连接, 见 config.conf 中的 [db.replica.<name>]
+	DB_REPLICAS: dict[str, dict] = get_replica_connections()
+	# 副本选择策略: round_robin(轮询) / least_busy(使用中连接最少)
+	DB_REPLICA_STRATEGY: Literal["round_robin", "least_busy"] = config.config.get("db", "replica_strategy", fallback="round_robin")
+	# 请求发生写操作后, 同一客户端在此时间(秒)内的读请求仍走主库 (响应附带 db_rw cookie, 各 worker 都能识别)
+	DB_READ_YOUR_WRITES_SECONDS: float = config.config.getfloat("db", "read_your_writes", fallback=3.0)
+	# ================================================= #
 	TORTOISE_ORM: dict = {
 		"connections": {
 			# SQLite configuration
@@ -91,8 +163,11 @@ class Settings(BaseSettings):
 					"user": db_user,  # Database username
 					"password": db_password,  # Database password
 					"database": db_name,  # Database name
+					**get_pool_options("db"),
 				},
 			},
+			# 只读副本
+			**DB_REPLICAS,
 			# MSSQL/Oracle configuration
 			# Install with: tortoise-orm[asyncodbc]
 			# "oracle": {
@@ -124,18 +199,146 @@ class Settings(BaseSettings):
                 "default_connection": "postgres",
             },
         },
+		# 配置了只读副本时启用读写分离路由
+		"routers": ["base.common.replica.ReplicaRouter"] if DB_REPLICAS else [],
 		"use_tz": False,  # Whether to use timezone-aware datetimes
 		"timezone": "Asia/Shanghai",  # Timezone setting
 	}
 
+	# 各连接获取连接池连接的超时时间(秒), 超时返回 503
+	DB_POOL_ACQUIRE_TIMEOUT: dict[str, float] = {
+		"postgres": config.config.getfloat("db", "pool_acquire_timeout", fallback=10.0),
+		**{
+			name: config.config.getfloat(f"db.replica.{name[len('replica_'):]}", "pool_acquire_timeout", fallback=10.0)
+			for name in DB_REPLICAS
+		},
+	}
+
+	# ================================================= #
+	# ******************** SQL 统计 ******************** #
+	# ================================================= #
+	SQL_INSTRUMENT: bool = config.config.getboolean("db", "sql_instrument", fallback=True)   # 是否统计每个请求的 SQL
+	SLOW_QUERY_MS: float = config.config.getfloat("db", "slow_query_ms", fallback=200.0)    # 慢查询日志阈值(毫秒)
+	N_PLUS_ONE_THRESHOLD: int = config.config.getint("db", "n_plus_one_threshold", fallback=10)   # 同一语句在单个请求中执行超过此次数时告警
+
+	# ================================================= #
+	# ******************** 请求追踪 ******************** #
+	# ================================================= #
+	REQUEST_ID_HEADER: str = "X-Request-ID"    # 请求 ID 头, 客户端传入时沿用, 否则生成
+	REQUEST_METRICS: bool = config.config.getboolean("app", "request_metrics", fallback=True)   # 是否统计各路由耗时并输出 Server-Timing
+
+	# ================================================= #
+	# ******************** 响应缓存 ******************** #
+	# ================================================= #
+	RESPONSE_CACHE_ENABLE: bool = config.config.getboolean("cache", "enable", fallback=True)         # 是否启用 cached_response
+	RESPONSE_CACHE_TTL: float = config.config.getfloat("cache", "ttl", fallback=30.0)                 # 默认过期时间(秒)
+	RESPONSE_CACHE_MAX_ENTRIES: int = config.config.getint("cache", "max_entries", fallback=10000)    # 最大条目数
+	RESPONSE_CACHE_MAX_BYTES: int = config.config.getint("cache", "max_mb", fallback=64) * 1024 * 1024   # 最大占用内存
+	# 模型缓存 (BaseModel.cached_get/cached_get_by), 保存/删除/批量更新后自动失效
+	MODEL_CACHE_ENABLE: bool = config.config.getboolean("cache", "model_enable", fallback=True)
+	MODEL_CACHE_BACKEND: str = config.config.get("cache", "model_backend", fallback="local")   # local / socket / 自定义后端类导入路径
+	MODEL_CACHE_TTL: float = config.config.getfloat("cache", "model_ttl", fallback=60.0)
+	MODEL_CACHE_MAX_ENTRIES: int = config.config.getint("cache", "model_max_entries", fallback=50000)
+	MODEL_CACHE_MAX_BYTES: int = config.config.getint("cache", "model_max_mb", fallback=32) * 1024 * 1024
+	# socket 后端各 worker 的失效广播套接字目录
+	MODEL_CACHE_SOCKET_DIR: str = config.config.get("cache", "model_socket_dir", fallback=str(Path(tempfile.gettempdir()) / "aipaneladmin-model-cache"))
+
+	# ================================================= #
+	# ********************* 限流配置 ********************* #
+	# ================================================= #
+	RATE_LIMIT_ENABLE: bool = config.config.getboolean("ratelimit", "enable", fallback=True)
+	RATE_LIMIT_IP: str = config.config.get("ratelimit", "ip", fallback="50/s")        # 每个 IP 的限额, 格式 次数/周期, 为空不限制
+	RATE_LIMIT_USER: str = config.config.get("ratelimit", "user", fallback="20/s")    # 每个认证头 (用户) 的限额
+	# 路由限额: {"<路径前缀>" 或 "<METHOD> <路径前缀>": "次数/周期"}, 按用户 (无认证头时按 IP) 计数
+	RATE_LIMIT_ROUTES: dict[str, str] = dict(config.config.items("ratelimit.routes")) if config.config.has_section("ratelimit.routes") else {}
+	RATE_LIMIT_EXEMPT: list[str] = [ip.strip() for ip in config.config.get("ratelimit", "exempt", fallback="").split(",") if ip.strip()]   # 不限流的 IP
+	RATE_LIMIT_BACKEND: str = config.config.get("ratelimit", "backend", fallback="local")   # local: 进程内; shm: 同一主机的 worker 共享
+	RATE_LIMIT_SHARDS: int = config.config.getint("ratelimit", "shards", fallback=64)
+	RATE_LIMIT_SWEEP_INTERVAL: float = config.config.getfloat("ratelimit", "sweep_interval", fallback=60.0)   # 每轮清理所有分片的周期(秒)
+	# 共享内存文件路径前缀, 实际文件名追加项目目录摘要与端口, serve 主进程启动时重置
+	RATE_LIMIT_SHM_PATH: str = config.config.get(
+		"ratelimit", "shm_path",
+		fallback=str(Path("/dev/shm" if Path("/dev/shm").is_dir() else tempfile.gettempdir()) / "aipaneladmin-ratelimit"),
+	)
+	RATE_LIMIT_SHM_SLOTS: int = config.config.getint("ratelimit", "shm_slots", fallback=65536)   # 共享内存槽位数 (每个 32 字节)
+
 	DATETIME_FORMAT: str = "%Y-%m-%d %H:%M:%S"
-	OPERATION_LOG_RECORD: bool = True
+	# ================================================= #
+	# ******************** 分页配置 ******************** #
+	# ================================================= #
+	PAGE_SIZE: int = 20                     # 默认每页条数
+	MAX_PAGE_SIZE: int = 200                # 每页最大条数
+	PAGINATION_COUNT_CACHE_TTL: int = 60    # 近似总数缓存时间(秒)
+	PAGINATION_COUNT_CACHE_MAX_ENTRIES: int = 10000    # 近似总数缓存条目上限 (超出时淘汰最久未使用的)
+	# ================================================= #
+	# ******************** 操作日志 ******************** #
+	# ================================================= #
+	OPERATION_LOG_RECORD: bool = config.config.getboolean("operation_log", "enable", fallback=True)
+	# 记录的请求方法与不记录的路径前缀
+	OPERATION_LOG_METHODS: list[str] = [m.strip().upper() for m in config.config.get("operation_log", "methods", fallback="POST,PUT,PATCH,DELETE").split(",") if m.strip()]
+	OPERATION_LOG_EXCLUDE: list[str] = [p.strip() for p in config.config.get("operation_log", "exclude", fallback="/api/v1/monitor").split(",") if p.strip()]
+	OPERATION_LOG_QUEUE_SIZE: int = config.config.getint("operation_log", "queue_size", fallback=10000)        # 内存队列上限
+	OPERATION_LOG_BATCH_SIZE: int = config.config.getint("operation_log", "batch_size", fallback=500)          # 每次批量写入条数
+	OPERATION_LOG_FLUSH_INTERVAL: float = config.config.getfloat("operation_log", "flush_interval", fallback=1.0)   # 最长写入间隔(秒)
+	# 队列满时: drop_oldest 丢弃最早的记录 / drop_newest 丢弃新记录 / block 等待 block_timeout 秒后丢弃新记录
+	OPERATION_LOG_DROP_POLICY: Literal["drop_oldest", "drop_newest", "block"] = config.config.get("operation_log", "drop_policy", fallback="drop_oldest")
+	OPERATION_LOG_BLOCK_TIMEOUT: float = config.config.getfloat("operation_log", "block_timeout", fallback=0.05)
+	OPERATION_LOG_RETENTION_MONTHS: int = config.config.getint("operation_log", "retention_months", fallback=6)   # 保留的月分区数, 0 表示不清理
 	# ================================================= #
 	# ******************* Gzip压缩配置 ******************* #
 	# ================================================= #
-	GZIP_ENABLE: bool = True        # 是否启用Gzip
-	GZIP_MIN_SIZE: int = 1000       # 最小压缩大小(字节)
-	GZIP_COMPRESS_LEVEL: int = 9    # 压缩级别(1-9)
+	GZIP_ENABLE: bool = config.config.getboolean("gzip", "enable", fallback=True)           # 是否启用Gzip
+	GZIP_MIN_SIZE: int = config.config.getint("gzip", "min_size", fallback=1000)            # 最小压缩大小(字节)
+	GZIP_COMPRESS_LEVEL: int = config.config.getint("gzip", "level", fallback=9)            # 最高压缩级别(1-9), 动态响应按大小和 CPU 预算降级
+	# 压缩的响应类型 (前缀匹配)
+	GZIP_CONTENT_TYPES: list[str] = [
+		item.strip() for item in config.config.get(
+			"gzip", "content_types",
+			fallback="text/,application/json,application/javascript,application/xml,image/svg+xml",
+		).split(",") if item.strip()
+	]
+	GZIP_CPU_BUDGET: float = config.config.getfloat("gzip", "cpu_budget", fallback=0.2)    # 每个 worker 用于压缩的 CPU 时间占比上限
+	GZIP_CACHE_MAX_MB: int = config.config.getint("gzip", "cache_max_mb", fallback=32)      # 可缓存响应的压缩结果缓存大小
+	GZIP_CACHE_MAX_ITEM: int = config.config.getint("gzip", "cache_max_item_kb", fallback=1024) * 1024   # 单个可缓存响应最大缓冲字节数
+	# ================================================= #
+	# ******************** 启动预热 ******************** #
+	# ================================================= #
+	WARMUP_ENABLE: bool = config.config.getboolean("warmup", "enable", fallback=True)
+	WARMUP_TIMEOUT: float = config.config.getfloat("warmup", "timeout", fallback=10.0)      # 所有预热钩子的总时间预算(秒)
+	# 启动时各请求一次的 GET 路径
+	WARMUP_PATHS: list[str] = [p.strip() for p in config.config.get("warmup", "paths", fallback="").split(",") if p.strip()]
+	# ================================================= #
+	# ******************** 服务进程 ******************** #
+	# ================================================= #
+	# python -m base.cli serve 的默认参数, 命令行参数优先
+	SERVER_HOST: str = config.config.get("server", "host", fallback="0.0.0.0")
+	SERVER_PORT: int = config.config.getint("server", "port", fallback=9999)
+	SERVER_WORKERS: int = config.config.getint("server", "workers", fallback=0)               # 0 表示按可用 CPU 数
+	SERVER_BACKLOG: int = config.config.getint("server", "backlog", fallback=2048)
+	SERVER_MAX_REQUESTS: int = config.config.getint("server", "max_requests", fallback=0)     # worker 处理多少个请求后重启, 0 表示不限制
+	SERVER_MAX_REQUESTS_JITTER: int = config.config.getint("server", "max_requests_jitter", fallback=0)   # 随机增加 0~N, 避免 worker 同时重启
+	SERVER_GRACEFUL_TIMEOUT: int = config.config.getint("server", "graceful_timeout", fallback=30)   # 停止 worker 时等待进行中请求的秒数
+	SERVER_STARTUP_TIMEOUT: int = config.config.getint("server", "startup_timeout", fallback=60)     # 等待新 worker 就绪的秒数
+	SERVER_KEEP_ALIVE: int = config.config.getint("server", "keep_alive", fallback=5)
+	# ================================================= #
+	# ******************** 日志配置 ******************** #
+	# ================================================= #
+	# standard: loguru 文本日志文件 (生产环境 enqueue 异步) / fast: JSON 行写入环形缓冲, 后台线程批量落盘
+	LOG_MODE: Literal["standard", "fast"] = config.config.get("log", "mode", fallback="standard")
+	LOG_LEVEL: str = config.config.get("log", "level", fallback="INFO").upper()             # 文件日志级别
+	LOG_CONSOLE: bool = config.config.getboolean("log", "console", fallback=True)           # 控制台输出 (fast 模式下同步写出)
+	LOG_BUFFER_SIZE: int = config.config.getint("log", "buffer_size", fallback=65536)       # fast 模式环形缓冲条数, 满时丢弃最旧的记录
+	LOG_BATCH_SIZE: int = config.config.getint("log", "batch_size", fallback=2000)          # 积累多少条立即写入
+	LOG_FLUSH_INTERVAL: float = config.config.getfloat("log", "flush_interval", fallback=0.5)   # 最长写入间隔(秒)
+	LOG_RETENTION_DAYS: int = config.config.getint("log", "retention_days", fallback=30)     # fast 模式日志文件保留天数, 0 表示不清理
+	# 访问日志采样率 (0-1), 状态码 >= 400 的请求总是记录
+	LOG_ACCESS_SAMPLE: float = config.config.getfloat("log", "access_sample", fallback=1.0)
+	# 高频日志器: 直接使用 LogRecord 中的调用位置, 不逐帧查找
+	LOG_HOT_LOGGERS: list[str] = [
+		name.strip() for name in config.config.get(
+			"log", "hot_loggers", fallback="uvicorn.access,uvicorn.error,tortoise.db_client",
+		).split(",") if name.strip()
+	]
 
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from fastapi import FastAPI
+from tortoise import connections
+
+from base.common.log import log
+from base.common.manifest import timed_import
+from base.common.openapi import openapi_cache
+from base.common.plugin import load_plugin_specs
+from base.common.setting import settings
+
+WarmupHook = Callable[[FastAPI], Awaitable[None]]
+
+CORE_DIR = Path(__file__).parent.parent / "core"
+
+
+class WarmupRegistry:
+    """
+    启动预热钩子注册表
+
+    core 模块与插件在各自的 warmup.py 中用 @warmup.hook() 注册 `async def hook(app)`,
+    lifespan 在数据库初始化之后、开始接受请求之前并发执行所有钩子, 总耗时不超过
+    settings.WARMUP_TIMEOUT 秒, 超时的钩子被取消。钩子失败只记录日志, 不影响启动。
+    全部结束后 ready 置为 True, 由 /api/v1/monitor/ready 对外报告。
+    """
+
+    def __init__(self) -> None:
+        self.hooks: dict[str, WarmupHook] = {}
+        self.ready = False
+        self.elapsed_ms = 0.0
+        # {钩子名: {"status": ok / failed / timeout, "ms": 耗时, "error": 错误信息}}
+        self.results: dict[str, dict[str, Any]] = {}
+
+    def hook(self, name: str | None = None) -> Callable[[WarmupHook], WarmupHook]:
+        def decorator(func: WarmupHook) -> WarmupHook:
+            self.register(name or f"{func.__module__}.{func.__qualname__}", func)
+            return func
+
+        return decorator
+
+    def register(self, name: str, hook: WarmupHook) -> None:
+        self.hooks[name] = hook
+
+    async def run(self, app: FastAPI) -> None:
+        started = time.perf_counter()
+        if settings.WARMUP_ENABLE and self.hooks:
+            tasks = {
+                asyncio.create_task(self._run_hook(name, hook, app), name=f"warmup:{name}"): name
+                for name, hook in self.hooks.items()
+            }
+            _, pending = await asyncio.wait(tasks, timeout=settings.WARMUP_TIMEOUT)
+            for task in pending:
+                task.cancel()
+                name = tasks[task]
+                self.results[name] = {"status": "timeout", "ms": settings.WARMUP_TIMEOUT * 1000}
+                log.warning(f"预热钩子 {name} 超过 {settings.WARMUP_TIMEOUT} 秒未完成, 已取消")
+            if pending:
+                await asyncio.wait(pending)
+        self.elapsed_ms = (time.perf_counter() - started) * 1000
+        self.ready = True
+        if self.hooks:
+            log.info(f"预热完成: {len(self.hooks)} 个钩子, 耗时 {self.elapsed_ms:.1f}ms")
+
+    async def _run_hook(self, name: str, hook: WarmupHook, app: FastAPI) -> None:
+        started = time.perf_counter()
+        try:
+            await hook(app)
+        except Exception as e:
+            self.results[name] = {"status": "failed", "ms": self._since(started), "error": str(e)}
+            log.error(f"预热钩子 {name} 失败: {e}")
+        else:
+            self.results[name] = {"status": "ok", "ms": self._since(started)}
+
+    @staticmethod
+    def _since(started: float) -> float:
+        return round((time.perf_counter() - started) * 1000, 3)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "hooks": {name: self.results.get(name, {"status": "pending"}) for name in self.hooks},
+        }
+
+
+warmup = WarmupRegistry()
+
+
+def discover_warmup_hooks() -> None:
+    """导入 core 模块与启动时加载的插件中的 warmup.py (延迟加载的插件不在启动时预热)"""
+    packages = [
+        f"base.core.{path.parent.name}" for path in sorted(CORE_DIR.glob("*/warmup.py"))
+    ]
+    for spec in load_plugin_specs():
+        plugin_dir = Path(__file__).parent.parent / "plugins" / spec.name
+        if not spec.lazy and (plugin_dir / "warmup.py").exists():
+            packages.append(spec.package)
+    for package in packages:
+        try:
+            timed_import(f"{package}.warmup")
+        except Exception as e:
+            print(f"⚠️ 导入预热钩子失败 {package}.warmup: {e}")
+        else:
+            print(f"🔥 已加载预热钩子: {package}.warmup")
+
+
+@warmup.hook("db_pool")
+async def warm_db_pools(app: FastAPI) -> None:
+    """
+    打开所有数据库连接池
+
+    Tortoise 在第一次查询时才创建连接池 (asyncpg 建池时打开 minsize 个连接), 且并发的首批
+    查询会各自建池; 启动时执行一次查询, 让每个 worker 的连接池在接受请求前就绪。
+    """
+    await asyncio.gather(*(
+        connections.get(name).execute_query("SELECT 1")
+        for name in settings.TORTOISE_ORM["connections"]
+    ))
+
+
+@warmup.hook("openapi")
+async def warm_openapi(app: FastAPI) -> None:
+    """生成 (或从磁盘读取) 缓存的 OpenAPI 文档, 生成在线程中执行, 与连接池预热并行"""
+    if app.openapi_url:
+        await openapi_cache.get(app)
+
+
+@warmup.hook("routes")
+async def warm_routes(app: FastAPI) -> None:
+    """对 settings.WARMUP_PATHS 中的路径各发一次进程内 GET 请求, 经过完整的中间件与依赖"""
+    await asyncio.gather(*(_touch(app, path) for path in settings.WARMUP_PATHS))
+
+
+async def _touch(app: FastAPI, path: str) -> None:
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": query.encode("utf-8"),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"user-agent", b"warmup")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    received = False
+    status_code = 0
+
+    async def receive() -> dict:
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # 请求体已读完, 之后只会等待断开
+        await asyncio.Event().wait()
+
+    async def send(message: dict) -> None:
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    await app(scope, receive, send)
+    if status_code >= 400:
+        log.warning(f"预热请求 GET {path} 返回 {status_code}")
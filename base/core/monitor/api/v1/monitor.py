@@ -0,0 +1,77 @@
+from fastapi import APIRouter
+
+from base.common.cache import response_cache
+from base.common.compression import get_compression_stats
+from base.common.log import get_log_stats
+from base.common.manifest import get_import_timings
+from base.common.metrics import route_latency
+from base.common.model_cache import get_model_cache_stats
+from base.common.openapi import openapi_cache
+from base.common.operation_log import operation_log_writer
+from base.common.pagination import count_cache
+from base.common.plugin import plugin_registry
+from base.common.pool import get_pool_stats
+from base.common.ratelimit import get_rate_limit_stats
+from base.common.response import SuccessResponse
+from base.common.warmup import warmup
+
+router = APIRouter(prefix="/api/v1/monitor", tags=["系统监控"])
+
+@router.get("/pool", summary="数据库连接池状态")
+async def get_pool_status():
+	return SuccessResponse(data=get_pool_stats())
+
+
+@router.get("/imports", summary="启动时模块导入耗时")
+async def get_import_status():
+	return SuccessResponse(data=get_import_timings())
+
+
+@router.get("/plugins", summary="延迟加载插件状态")
+async def get_plugin_status():
+	return SuccessResponse(data={
+		"pending": {name: spec.prefix for name, spec in plugin_registry.pending.items()},
+		"activated": plugin_registry.activated,
+		"failed": plugin_registry.failed,
+	})
+
+
+@router.get("/cache", summary="响应缓存、模型缓存、OpenAPI 文档缓存与分页总数缓存状态")
+async def get_cache_status():
+	return SuccessResponse(data={
+		"response": response_cache.stats(),
+		"model": get_model_cache_stats(),
+		"openapi": openapi_cache.stats(),
+		"pagination_count": count_cache.stats(),
+	})
+
+
+@router.get("/compression", summary="Gzip 压缩统计")
+async def get_compression_status():
+	return SuccessResponse(data=get_compression_stats())
+
+
+@router.get("/ratelimit", summary="限流状态")
+async def get_rate_limit_status():
+	return SuccessResponse(data=get_rate_limit_stats())
+
+
+@router.get("/latency", summary="各路由请求耗时分布")
+async def get_latency_status(top: int | None = None):
+	return SuccessResponse(data=route_latency.snapshot(top))
+
+
+@router.get("/operation-log", summary="操作日志写入队列状态")
+async def get_operation_log_status():
+	return SuccessResponse(data=operation_log_writer.stats())
+
+
+@router.get("/logging", summary="日志缓冲与采样统计")
+async def get_logging_status():
+	return SuccessResponse(data=get_log_stats())
+
+
+@router.get("/ready", summary="启动预热报告 (各钩子状态与耗时)")
+async def get_ready_status():
+	# lifespan 在预热结束后才完成启动, 服务器此前不接受连接, 能响应时预热已经结束
+	return SuccessResponse(data=warmup.stats())
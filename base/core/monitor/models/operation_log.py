@@ -0,0 +1,25 @@
+from tortoise import fields
+from base.common.model import BaseModel
+
+class OperationLog(BaseModel):
+    """
+    操作日志 (只追加)
+
+    由 base.common.operation_log 批量写入; PostgreSQL 中按 created_at 按月分区,
+    见 migrations/models/1_20261018120000_operation_log.py
+    """
+    created_at = fields.DatetimeField(auto_now_add=True, description="操作时间", index=True)
+    request_id = fields.CharField(max_length=64, null=True, description="请求ID")
+    user_id = fields.BigIntField(null=True, description="用户ID", index=True)
+    username = fields.CharField(max_length=64, null=True, description="用户名称")
+    client_ip = fields.CharField(max_length=64, null=True, description="客户端IP")
+    method = fields.CharField(max_length=10, description="请求方法")
+    path = fields.CharField(max_length=512, description="请求路径")
+    route = fields.CharField(max_length=255, null=True, description="路由模板", index=True)
+    status_code = fields.IntField(description="响应状态码")
+    success = fields.BooleanField(description="是否成功")
+    duration_ms = fields.FloatField(description="耗时(毫秒)")
+    user_agent = fields.CharField(max_length=255, null=True, description="客户端UA")
+
+    class Meta:
+        table = "operation_log"
@@ -1,13 +1,16 @@
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from tortoise import Tortoise
 from base.common import database
 from base.common.setting import settings
-from base.common.database import init_data
+from base.common.database import close_data, init_data
 from base.common.middleware import register_middlewares
+from base.common.openapi import register_openapi
+from base.common.operation_log import operation_log_writer
 from base.common.exceptions import register_exceptions
+from base.common.log import setup_logging
 from base.common.router import register_routers
+from base.common.warmup import discover_warmup_hooks, warmup
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -15,14 +18,20 @@ async def lifespan(app: FastAPI):
     print("Application starting up...")
     try:
         await init_data()
+        await operation_log_writer.start()
+        # 预热完成后才开始接受请求
+        await warmup.run(app)
         yield
-        await Tortoise.close_connections()
+        await operation_log_writer.close()
+        await close_data()
     finally:
         # 确保所有资源正确关闭
         print("Application shutting down...")
         # 添加数据库连接关闭等清理代码
 
 def init_app() -> FastAPI:
+	# 标准库日志 (含 uvicorn 访问日志) 统一转到 loguru
+	setup_logging()
 	app = FastAPI(
 				title=settings.app_name,         
 				description=settings.app_description,
@@ -36,5 +45,7 @@ def init_app() -> FastAPI:
 	register_exceptions(app)
 	register_middlewares(app)
 	register_routers(app)
+	register_openapi(app)
+	discover_warmup_hooks()
 
 	return app
\ No newline at end of file
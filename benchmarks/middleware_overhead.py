@@ -0,0 +1,161 @@
+"""
+中间件单层开销基准
+
+对比同一个空操作函数中间件 async def mw(request, call_next) 的三种注册方式:
+- BaseHTTPMiddleware 包装 (旧的 _register_function_middleware)
+- FunctionMiddleware 纯 ASGI 适配器
+- 原生 ASGI 中间件类 (模块直接导出)
+
+以及声明了 PATHS 的中间件经 ScopedMiddleware 分发时, 请求开销与匹配的中间件数量的关系。
+
+直接调用 ASGI 应用, 不经过 HTTP 服务器, 结果只反映中间件本身的开销。
+
+用法: python benchmarks/middleware_overhead.py [--requests 20000]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from base.common.middleware import FunctionMiddleware, ScopedMiddleware  # noqa: E402
+
+LAYERS = (1, 5, 10)
+BODY = b'{"code":0,"msg":"ok","data":null}'
+STREAM_CHUNKS = 5
+STREAM_DELAY = 0.02
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/bench",
+    "raw_path": b"/bench",
+    "query_string": b"",
+    "root_path": "",
+    "headers": [(b"host", b"bench")],
+    "client": ("127.0.0.1", 10000),
+    "server": ("127.0.0.1", 8000),
+}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def stream_endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    for index in range(STREAM_CHUNKS):
+        await send({"type": "http.response.body", "body": b"chunk", "more_body": index < STREAM_CHUNKS - 1})
+        await asyncio.sleep(STREAM_DELAY)
+
+
+async def noop(request, call_next):
+    return await call_next(request)
+
+
+class PassThrough:
+    """原生 ASGI 中间件"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+WRAPPERS = {
+    "BaseHTTPMiddleware": lambda app: BaseHTTPMiddleware(app, dispatch=noop),
+    "FunctionMiddleware": lambda app: FunctionMiddleware(app, dispatch=noop),
+    "native ASGI": PassThrough,
+}
+
+
+def build(app, wrapper, layers):
+    for _ in range(layers):
+        app = wrapper(app)
+    return app
+
+
+def make_receive():
+    """与服务器行为一致: 先返回请求体, 之后阻塞直到客户端断开"""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def measure(app, requests):
+    async def send(message):
+        pass
+
+    for _ in range(min(200, requests)):
+        await app(dict(SCOPE), make_receive(), send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(SCOPE), make_receive(), send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def first_chunk_ms(app):
+    """流式响应首个响应体分块到达的耗时, 接近 0 说明逐块转发"""
+    started = time.perf_counter()
+    first = None
+
+    async def send(message):
+        nonlocal first
+        if message["type"] == "http.response.body" and first is None:
+            first = time.perf_counter()
+
+    await app(dict(SCOPE), make_receive(), send)
+    return (first - started) * 1000, (time.perf_counter() - started) * 1000
+
+
+def build_scoped(app, layers):
+    """每个中间件限定在 /plugin<i> 前缀下"""
+    entries = [
+        {"middleware_class": FunctionMiddleware, "options": {"dispatch": noop}, "paths": {f"/plugin{i}"}, "methods": None}
+        for i in range(layers)
+    ]
+    return ScopedMiddleware(app, entries)
+
+
+async def main(requests):
+    baseline = await measure(endpoint, requests)
+    print(f"无中间件: {baseline:.2f} µs/请求\n")
+    print(f"{'方式':<20}" + "".join(f"{f'{n} 层(µs)':>12}" for n in LAYERS) + f"{'单层开销(µs)':>14}")
+    for name, wrapper in WRAPPERS.items():
+        timings = [await measure(build(endpoint, wrapper, n), requests) for n in LAYERS]
+        per_layer = (timings[-1] - baseline) / LAYERS[-1]
+        print(f"{name:<20}" + "".join(f"{t:>12.2f}" for t in timings) + f"{per_layer:>14.2f}")
+
+    scoped = build_scoped(endpoint, LAYERS[-1])
+    print(f"\n{LAYERS[-1]} 个限定 PATHS 的函数中间件:")
+    for path in ("/bench", "/plugin3/items"):
+        SCOPE["path"] = path
+        print(f"{path:<20} {await measure(scoped, requests):>10.2f} µs/请求")
+    SCOPE["path"] = "/bench"
+
+    print(f"\n流式响应 ({STREAM_CHUNKS} 块, 间隔 {STREAM_DELAY * 1000:.0f}ms, 5 层):")
+    for name, wrapper in WRAPPERS.items():
+        first, total = await first_chunk_ms(build(stream_endpoint, wrapper, 5))
+        print(f"{name:<20} 首块 {first:7.2f}ms  完成 {total:7.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="每种配置的请求数")
+    asyncio.run(main(parser.parse_args().requests))
@@ -0,0 +1,43 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "operation_log" (
+    "id" BIGSERIAL NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "request_id" VARCHAR(64),
+    "user_id" BIGINT,
+    "username" VARCHAR(64),
+    "client_ip" VARCHAR(64),
+    "method" VARCHAR(10) NOT NULL,
+    "path" VARCHAR(512) NOT NULL,
+    "route" VARCHAR(255),
+    "status_code" INT NOT NULL,
+    "success" BOOL NOT NULL,
+    "duration_ms" DOUBLE PRECISION NOT NULL,
+    "user_agent" VARCHAR(255),
+    PRIMARY KEY ("id", "created_at")
+) PARTITION BY RANGE ("created_at");
+CREATE TABLE IF NOT EXISTS "operation_log_default" PARTITION OF "operation_log" DEFAULT;
+CREATE INDEX IF NOT EXISTS "idx_operation_l_created_08f20e" ON "operation_log" ("created_at");
+CREATE INDEX IF NOT EXISTS "idx_operation_l_user_id_9f7746" ON "operation_log" ("user_id");
+CREATE INDEX IF NOT EXISTS "idx_operation_l_route_456ba5" ON "operation_log" ("route");
+COMMENT ON COLUMN "operation_log"."created_at" IS '操作时间';
+COMMENT ON COLUMN "operation_log"."request_id" IS '请求ID';
+COMMENT ON COLUMN "operation_log"."user_id" IS '用户ID';
+COMMENT ON COLUMN "operation_log"."username" IS '用户名称';
+COMMENT ON COLUMN "operation_log"."client_ip" IS '客户端IP';
+COMMENT ON COLUMN "operation_log"."method" IS '请求方法';
+COMMENT ON COLUMN "operation_log"."path" IS '请求路径';
+COMMENT ON COLUMN "operation_log"."route" IS '路由模板';
+COMMENT ON COLUMN "operation_log"."status_code" IS '响应状态码';
+COMMENT ON COLUMN "operation_log"."success" IS '是否成功';
+COMMENT ON COLUMN "operation_log"."duration_ms" IS '耗时(毫秒)';
+COMMENT ON COLUMN "operation_log"."user_agent" IS '客户端UA';
+COMMENT ON TABLE "operation_log" IS '操作日志 (只追加)';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "operation_log";"""
@@ -1,6 +1,7 @@
 import uvicorn
 from uvicorn.config import LOGGING_CONFIG
 
+# 开发环境入口 (单进程, 自动重载); 生产环境使用 python -m base.cli serve
 if __name__ == "__main__":
     # 修改默认日志配置
     LOGGING_CONFIG["formatters"]["default"]["fmt"] = "%(asctime)s - %(levelname)s - %(message)s"
@@ -0,0 +1,59 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from tortoise import Tortoise
+from tortoise.utils import get_schema_sql
+from tortoise.models import Model
+
+from base.common import model_cache
+
+TESTS_DIR = Path(__file__).parent
+
+
+def _model_modules() -> list[str]:
+    # BaseModel 的主键字段对象由所有子类共享, 需要把已导入的测试模型一起初始化,
+    # 否则先前测试模块的模型没有数据库连接
+    names = []
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and Path(path).parent == TESTS_DIR and any(
+            isinstance(value, type) and issubclass(value, Model) and value.__module__ == name
+            for value in vars(module).values()
+        ):
+            names.append(name)
+    return names
+
+
+@pytest.fixture
+def run_db():
+    """
+    在内存 SQLite 上初始化测试模型 (并安装模型缓存) 后执行协程函数
+
+    replicas 为只读副本连接名, 每个副本是一个独立的内存 SQLite 库, 并启用 ReplicaRouter;
+    models 为需要一起初始化的项目模型模块。
+    """
+
+    def run(coro, replicas=(), models=()):
+        async def wrapper():
+            names = ["default", *replicas]
+            await Tortoise.init(config={
+                "connections": {name: "sqlite://:memory:" for name in names},
+                "apps": {"models": {"models": [*_model_modules(), *models], "default_connection": "default"}},
+                "routers": ["base.common.replica.ReplicaRouter"] if replicas else [],
+            })
+            # 副本与主库使用相同的表结构
+            schema = get_schema_sql(Tortoise.get_connection("default"), safe=False)
+            for name in names:
+                await Tortoise.get_connection(name).execute_script(schema)
+            await model_cache.install_model_cache()
+            try:
+                return await coro()
+            finally:
+                await model_cache.close_model_cache()
+                await Tortoise.close_connections()
+
+        return asyncio.run(wrapper())
+
+    return run
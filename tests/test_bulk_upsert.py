@@ -0,0 +1,64 @@
+from tortoise import fields
+
+from base.common.model import BaseModel
+
+
+class Member(BaseModel):
+    username = fields.CharField(max_length=30, unique=True)
+    nickname = fields.CharField(max_length=30, null=True)
+    score = fields.IntField(default=0)
+
+    class Meta:
+        app = "models"
+        table = "bulk_member"
+
+
+def test_rows_with_a_different_field_set_are_rejected(run_db):
+    async def case():
+        await Member.create(username="b", nickname="kept", score=9)
+        report = await Member.bulk_upsert(
+            [
+                {"username": "a", "score": 1},
+                # 多出的 nickname 不能被静默丢弃
+                {"username": "c", "score": 2, "nickname": "extra"},
+                # 缺少 score 时不能用默认值 0 覆盖已有的 9
+                {"username": "b"},
+                {"username": "d", "score": 4},
+            ],
+            conflict_on=("username",),
+        )
+        assert report.total_rows == 4
+        assert [row["username"] for row, _ in report.rejected] == ["c", "b"]
+        assert report.affected is None
+        rows = await Member.all().order_by("username").values_list("username", "nickname", "score")
+        assert rows == [("a", None, 1), ("b", "kept", 9), ("d", None, 4)]
+
+    run_db(case)
+
+
+def test_unknown_fields_are_rejected(run_db):
+    async def case():
+        report = await Member.bulk_upsert(
+            [{"username": "a", "level": 3}, {"username": "b", "score": 1}],
+            conflict_on=("username",),
+        )
+        assert [reason for _, reason in report.rejected] == ["未知字段: ['level']"]
+        assert await Member.all().values_list("username", flat=True) == ["b"]
+
+    run_db(case)
+
+
+def test_duplicate_conflict_keys_keep_the_last_row(run_db):
+    async def case():
+        await Member.create(username="a", score=1)
+        report = await Member.bulk_upsert(
+            [{"username": "a", "score": 2}, {"username": "b", "score": 5}, {"username": "a", "score": 3}],
+            conflict_on=("username",),
+            batch_size=10,
+        )
+        assert not report.rejected
+        assert report.batches[0].rows == 3
+        rows = await Member.all().order_by("username").values_list("username", "score")
+        assert rows == [("a", 3), ("b", 5)]
+
+    run_db(case)
@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from starlette.responses import Response, StreamingResponse
+
+from base.common.middleware import FunctionMiddleware
+
+app = FastAPI()
+
+
+@app.get("/json")
+def json_endpoint():
+    return {"name": "aipanel"}
+
+
+@app.get("/stream")
+def stream_endpoint():
+    async def chunks():
+        for index in range(3):
+            yield f"{index},"
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+def request(dispatch, path):
+    async def send():
+        transport = httpx.ASGITransport(app=FunctionMiddleware(app, dispatch))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+
+    return asyncio.run(send())
+
+
+def test_passthrough_keeps_downstream_response():
+    async def dispatch(request, call_next):
+        return await call_next(request)
+
+    response = request(dispatch, "/stream")
+    assert response.text == "0,1,2,"
+
+
+def test_middleware_can_read_body_iterator():
+    async def dispatch(request, call_next):
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return Response(body.upper(), status_code=response.status_code, media_type="application/json")
+
+    response = request(dispatch, "/json")
+    assert response.json() == {"NAME": "AIPANEL"}
+
+
+def test_middleware_can_replace_body_iterator():
+    async def dispatch(request, call_next):
+        response = await call_next(request)
+        original = response.body_iterator
+
+        async def wrapped():
+            async for chunk in original:
+                yield chunk.decode() + "|"
+
+        response.body_iterator = wrapped()
+        return response
+
+    response = request(dispatch, "/stream")
+    assert response.text == "0,|1,|2,|"
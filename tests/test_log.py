@@ -0,0 +1,73 @@
+import logging
+from datetime import date
+
+import orjson
+from loguru import logger
+
+from base.common import log
+from base.common.log import InterceptHandler, JsonLogSink
+from base.common.setting import settings
+
+
+def _sink(directory, size):
+    # 间隔与批量足够大, 记录只在 close 时写出
+    return JsonLogSink(directory, size=size, flush_interval=60, batch_size=1000, retention=0)
+
+
+def _log_to(sink, messages):
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for message in messages:
+            logger.bind(request_id="r1").info(message)
+    finally:
+        logger.remove(handler_id)
+
+
+def _written(directory):
+    path = directory / f"app-{date.today():%Y-%m-%d}.jsonl"
+    return [orjson.loads(line) for line in path.read_bytes().splitlines()]
+
+
+def test_ring_buffer_drops_oldest_and_counts(tmp_path):
+    sink = _sink(tmp_path, size=3)
+    _log_to(sink, [f"m{index}" for index in range(5)])
+    assert sink.dropped == 2 and sink.enqueued == 5
+    assert len(sink.buffer) == 3
+    sink.close()
+    assert [line["message"] for line in _written(tmp_path)] == ["m2", "m3", "m4"]
+
+
+def test_close_flushes_buffer(tmp_path):
+    sink = _sink(tmp_path, size=100)
+    _log_to(sink, ["first", "second"])
+    assert sink.written == 0
+    sink.close()
+    lines = _written(tmp_path)
+    assert [line["message"] for line in lines] == ["first", "second"]
+    assert lines[0]["request_id"] == "r1" and lines[0]["level"] == "INFO"
+    assert sink.stats()["written"] == 2 and sink.stats()["queued"] == 0
+
+
+def _access_record(status):
+    return logging.LogRecord(
+        log.ACCESS_LOGGER, logging.INFO, __file__, 1, '%s - "%s %s HTTP/%s" %d',
+        ("127.0.0.1:1", "GET", "/", "1.1", status), None,
+    )
+
+
+def test_access_sampling_keeps_errors(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_ACCESS_SAMPLE", 0.25)
+    handler = InterceptHandler()
+    monkeypatch.setattr(log.random, "random", lambda: 0.5)
+    assert handler._keep_access(_access_record(200)) is False
+    assert handler._keep_access(_access_record(404)) is True
+    monkeypatch.setattr(log.random, "random", lambda: 0.1)
+    assert handler._keep_access(_access_record(200)) is True
+
+
+def test_sampled_out_access_logs_are_counted(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_ACCESS_SAMPLE", 0.0)
+    monkeypatch.setattr(InterceptHandler, "sampled_out", 0)
+    handler = InterceptHandler()
+    handler.emit(_access_record(200))
+    assert InterceptHandler.sampled_out == 1
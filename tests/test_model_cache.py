@@ -0,0 +1,58 @@
+from tortoise import fields
+from tortoise.transactions import in_transaction
+
+from base.common import model_cache
+from base.common.model import BaseModel
+
+
+class Account(BaseModel):
+    active = fields.BooleanField(default=True)
+
+    class Meta:
+        app = "models"
+        table = "model_cache_account"
+
+
+async def _cache_stale(account):
+    """模拟提交前并发的其他请求读到旧数据并写入缓存"""
+
+    async def load():
+        return {"id": account.pk, "active": True}
+
+    await model_cache.get_backend().get_or_load(
+        ("model_cache_account", "pk", account.pk), load, None,
+        lambda row: (model_cache.table_tag(Account), model_cache.pk_tag(Account, account.pk)),
+    )
+
+
+def test_transaction_write_invalidates_again_after_commit(run_db):
+    async def case():
+        account = await Account.create()
+        await Account.cached_get(account.pk)
+        async with in_transaction() as connection:
+            account.active = False
+            await account.save(using_db=connection)
+            await _cache_stale(account)
+            assert model_cache._pending
+        assert not model_cache._pending
+        misses = model_cache.get_backend().cache.misses
+        assert (await Account.cached_get(account.pk)).active is False
+        assert model_cache.get_backend().cache.misses == misses + 1
+
+    run_db(case)
+
+
+def test_rolled_back_transaction_drops_pending_tags(run_db):
+    async def case():
+        account = await Account.create()
+        try:
+            async with in_transaction() as connection:
+                account.active = False
+                await account.save(using_db=connection)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        assert not model_cache._pending
+        assert (await Account.cached_get(account.pk)).active is True
+
+    run_db(case)
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+from tortoise import fields
+
+from base.common import model
+from base.common.model import BaseModel, TimestampMixin
+from base.common.setting import settings
+
+
+class Article(TimestampMixin, BaseModel):
+    title = fields.CharField(max_length=50)
+    published_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        app = "models"
+        table = "model_rows_article"
+
+
+def test_rows_format_datetimes_like_to_dict(run_db):
+    async def case():
+        article = await Article.create(title="a")
+        await Article.create(title="b")
+        rows = await Article.rows()
+        assert [row._asdict() for row in rows] == await Article.bulk_to_dict(await Article.all())
+        row = rows[0]
+        assert row.created_at == article.created_at.strftime(settings.DATETIME_FORMAT)
+        assert row.published_at is None
+
+    run_db(case)
+
+
+def test_rows_without_datetime_fields_keep_values(run_db):
+    async def case():
+        await Article.create(title="a")
+        (row,) = await Article.rows("id", "title")
+        assert row.title == "a"
+        assert type(row)._datetime_indexes == ()
+
+    run_db(case)
+
+
+def test_plan_caches_are_bounded(monkeypatch):
+    monkeypatch.setattr(model, "_PLAN_CACHE_LIMIT", 2)
+    monkeypatch.setattr(model, "_serializer_plans", OrderedDict())
+    first = Article.serializer_plan(["title"])
+    Article.serializer_plan(["published_at"])
+    # 最近使用的计划保留, 最久未使用的被淘汰
+    assert Article.serializer_plan(["title"]) is first
+    Article.serializer_plan(None)
+    assert list(model._serializer_plans) == [(Article, frozenset({"title"})), (Article, frozenset())]
+    assert Article.serializer_plan(["title"]) is first
@@ -0,0 +1,66 @@
+from tortoise import fields
+
+from base.common.model import BaseModel, TimestampMixin
+
+
+class Role(BaseModel):
+    name = fields.CharField(max_length=20)
+
+    class Meta:
+        app = "models"
+        table = "validator_role"
+
+
+class Person(BaseModel, TimestampMixin):
+    email = fields.CharField(max_length=50)
+    roles = fields.ManyToManyField("models.Role", related_name="people", through="validator_person_role")
+
+    class Meta:
+        app = "models"
+        table = "validator_person"
+        ordering = ["-id"]
+
+
+async def _people():
+    a, b = await Role.create(name="a"), await Role.create(name="b")
+    first = await Person.create(email="first@example.com")
+    second = await Person.create(email="second@example.com")
+    await first.roles.add(a, b)
+    await second.roles.add(a)
+    return first, second
+
+
+def test_validator_counts_rows_matching_join_filter(run_db):
+    async def case():
+        first, second = await _people()
+        joined = await Person.validator(Person.filter(roles__name__in=["a", "b"]))
+        assert joined.count == 2
+        assert joined.etag != (await Person.validator(pk=first.pk)).etag
+
+        # 修改另一条匹配的记录后 ETag 必须变化
+        second.email = "changed@example.com"
+        await second.save()
+        assert (await Person.validator(Person.filter(roles__name__in=["a", "b"]))).etag != joined.etag
+
+    run_db(case)
+
+
+def test_validator_ignores_ordering_and_paging(run_db):
+    async def case():
+        await _people()
+        full = await Person.validator()
+        paged = await Person.validator(Person.all().order_by("email").offset(1).limit(1))
+        assert full.count == paged.count == 2
+        assert full.etag == paged.etag
+
+    run_db(case)
+
+
+def test_validator_empty_result(run_db):
+    async def case():
+        await _people()
+        empty = await Person.validator(email="missing@example.com")
+        assert empty.count == 0
+        assert empty.last_modified is None
+
+    run_db(case)
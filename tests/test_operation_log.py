@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from base.common.operation_log import OperationLogWriter, build_record
+from base.common.setting import settings
+
+MODELS = ("base.core.monitor.models.operation_log",)
+
+
+@pytest.fixture(autouse=True)
+def writer_settings(monkeypatch):
+    monkeypatch.setattr(settings, "OPERATION_LOG_RECORD", True)
+    monkeypatch.setattr(settings, "OPERATION_LOG_QUEUE_SIZE", 3)
+    monkeypatch.setattr(settings, "OPERATION_LOG_BATCH_SIZE", 2)
+    # 间隔足够长, 写入只由攒批唤醒或 close 触发
+    monkeypatch.setattr(settings, "OPERATION_LOG_FLUSH_INTERVAL", 60.0)
+    monkeypatch.setattr(settings, "OPERATION_LOG_BLOCK_TIMEOUT", 1.0)
+
+
+def _record(index):
+    scope = {
+        "method": "POST",
+        "path": f"/items/{index}",
+        "headers": [(b"user-agent", b"pytest")],
+        "client": ("10.0.0.1", 1),
+        "state": {"request_id": f"r{index}", "user_id": 7, "username": "admin"},
+    }
+    return build_record(scope, 201, 1.5)
+
+
+async def _written_paths():
+    from base.core.monitor.models.operation_log import OperationLog
+
+    return await OperationLog.all().order_by("id").values_list("path", flat=True)
+
+
+def _submit_four(monkeypatch, run_db, policy):
+    monkeypatch.setattr(settings, "OPERATION_LOG_DROP_POLICY", policy)
+
+    async def case():
+        writer = OperationLogWriter()
+        await writer.start()
+        accepted = [await writer.submit(_record(index)) for index in range(4)]
+        await writer.close()
+        return writer, accepted, await _written_paths()
+
+    return run_db(case, models=MODELS)
+
+
+def test_drop_oldest_keeps_latest_records(monkeypatch, run_db):
+    writer, accepted, paths = _submit_four(monkeypatch, run_db, "drop_oldest")
+    assert accepted == [True] * 4
+    assert writer.dropped == 1
+    assert paths == ["/items/1", "/items/2", "/items/3"]
+
+
+def test_drop_newest_rejects_new_records(monkeypatch, run_db):
+    writer, accepted, paths = _submit_four(monkeypatch, run_db, "drop_newest")
+    assert accepted == [True, True, True, False]
+    assert writer.dropped == 1
+    assert paths == ["/items/0", "/items/1", "/items/2"]
+
+
+def test_block_waits_for_the_writer(monkeypatch, run_db):
+    writer, accepted, paths = _submit_four(monkeypatch, run_db, "block")
+    assert accepted == [True] * 4
+    assert writer.dropped == 0
+    assert paths == [f"/items/{index}" for index in range(4)]
+
+
+def test_flush_writes_full_batches_and_close_drains(monkeypatch, run_db):
+    monkeypatch.setattr(settings, "OPERATION_LOG_QUEUE_SIZE", 100)
+
+    async def case():
+        writer = OperationLogWriter()
+        await writer.start()
+        for index in range(5):
+            await writer.submit(_record(index))
+        # 攒够一批后唤醒写入任务, 写入调用时队列中的全部记录 (2 + 2 + 1)
+        await asyncio.sleep(0.05)
+        assert writer.written == 5 and writer.batches == 3
+        await writer.submit(_record(5))
+        await writer.close()
+        assert writer.written == 6 and not writer.records
+        assert await writer.submit(_record(6)) is False
+        from base.core.monitor.models.operation_log import OperationLog
+
+        row = await OperationLog.get(path="/items/0")
+        assert (row.user_id, row.username, row.request_id, row.success) == (7, "admin", "r0", True)
+        return await _written_paths()
+
+    assert run_db(case, models=MODELS) == [f"/items/{index}" for index in range(6)]
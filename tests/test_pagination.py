@@ -0,0 +1,38 @@
+from tortoise import fields
+
+from base.common import pagination
+from base.common.model import BaseModel
+
+
+class Entry(BaseModel):
+    rank = fields.IntField()
+
+    class Meta:
+        app = "models"
+        table = "pagination_entry"
+
+
+def test_total_is_cached_per_filter_value(run_db):
+    async def case():
+        for rank in range(5):
+            await Entry.create(rank=rank)
+        totals = [
+            (await Entry.paginate(order_by=("id",), with_total=True, rank__gte=rank)).total
+            for rank in range(5)
+        ]
+        assert totals == [5, 4, 3, 2, 1]
+
+    run_db(case)
+
+
+def test_count_cache_is_bounded(run_db, monkeypatch):
+    monkeypatch.setattr(pagination.count_cache, "max_entries", 2)
+
+    async def case():
+        pagination.count_cache.clear()
+        await Entry.create(rank=1)
+        for rank in range(5):
+            await Entry.paginate(order_by=("id",), with_total=True, rank__gte=rank)
+        assert len(pagination.count_cache) == 2
+
+    run_db(case)
@@ -0,0 +1,67 @@
+import pytest
+
+from base.common import ratelimit
+from base.common.ratelimit import Limit, LocalRateLimitBackend, SharedMemoryRateLimitBackend, _take
+from base.common.setting import settings
+
+
+def test_parse_limits():
+    limit = Limit.parse("600/m")
+    assert (limit.capacity, limit.rate) == (600, 10)
+    assert Limit.parse("10/2h").rate == pytest.approx(10 / 7200)
+    assert Limit.parse("5").rate == 5
+    assert Limit.parse("") is None and Limit.parse("0/s") is None
+    with pytest.raises(ValueError):
+        Limit.parse("5/x")
+
+
+def test_take_refills_at_rate_up_to_capacity():
+    limit = Limit.parse("2/s")
+    assert _take(0.0, 0.0, 0.25, limit) == (0.5, 0.25)
+    assert _take(0.0, 0.0, 0.5, limit) == (0.0, 0.0)
+    # 长时间空闲后令牌数不超过桶容量
+    assert _take(0.0, 0.0, 100.0, limit) == (1.0, 0.0)
+
+
+def _drain(backend, limit, now):
+    return [backend.acquire("ip:1", limit, now) for _ in range(4)]
+
+
+def test_local_backend_allows_burst_then_waits():
+    backend = LocalRateLimitBackend(shards=4, sweep_interval=60)
+    limit = Limit.parse("3/s")
+    assert _drain(backend, limit, 10.0) == [0, 0, 0, pytest.approx(1 / 3)]
+    assert backend.acquire("ip:1", limit, 10.0 + 1 / 3) == 0
+    assert backend.acquire("ip:2", limit, 10.0) == 0
+
+
+def test_local_backend_sweeps_full_buckets():
+    backend = LocalRateLimitBackend(shards=1, sweep_interval=1)
+    limit = Limit.parse("1/s")
+    backend.acquire("ip:1", limit, 10.0)
+    backend._next_sweep = 0
+    backend.acquire("ip:2", limit, 11.0)
+    assert backend.stats()["buckets"] == 1
+
+
+def test_shared_memory_backend_shares_buckets(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    limit = Limit.parse("3/s")
+    first = SharedMemoryRateLimitBackend(path, slots=64, shards=4)
+    second = SharedMemoryRateLimitBackend(path, slots=64, shards=4)
+    assert [first.acquire("ip:1", limit, 10.0) for _ in range(3)] == [0, 0, 0]
+    # 另一个进程映射同一文件, 看到的是同一个桶
+    assert second.acquire("ip:1", limit, 10.0) == pytest.approx(1 / 3)
+    assert second.acquire("ip:1", limit, 11.0) == 0
+
+
+def test_shm_path_is_per_port_and_reset(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_SHM_PATH", str(tmp_path / "ratelimit"))
+    assert ratelimit.shm_path(8000) != ratelimit.shm_path(8001)
+    path = ratelimit.shm_path(8000)
+    backend = SharedMemoryRateLimitBackend(path, slots=64, shards=4)
+    limit = Limit.parse("1/m")
+    backend.acquire("ip:1", limit, 10.0)
+    ratelimit.reset_shm(path)
+    ratelimit.reset_shm(path)
+    assert SharedMemoryRateLimitBackend(path, slots=64, shards=4).acquire("ip:1", limit, 10.0) == 0
@@ -0,0 +1,122 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from tortoise import fields
+
+from base.common import replica
+from base.common.middleware import ReplicaRoutingMiddleware
+from base.common.model import BaseModel
+from base.common.setting import settings
+
+
+class Note(BaseModel):
+    text = fields.CharField(max_length=50)
+
+    class Meta:
+        app = "models"
+        table = "replica_note"
+
+
+@pytest.fixture(autouse=True)
+def replica_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_REPLICAS", {"replica_r1": {}})
+    monkeypatch.setattr(settings, "DB_REPLICA_STRATEGY", "round_robin")
+    monkeypatch.setattr(settings, "DB_READ_YOUR_WRITES_SECONDS", 3.0)
+    replica._recent_writes.clear()
+
+
+app = FastAPI()
+
+
+@app.get("/notes")
+async def list_notes():
+    return await Note.all().values_list("text", flat=True)
+
+
+@app.post("/notes")
+async def create_note():
+    await Note.create(text="primary")
+    return {}
+
+
+def _scope(method, client="10.0.0.1", headers=()):
+    return {"type": "http", "method": method, "client": (client, 1), "headers": list(headers)}
+
+
+def test_router_reads_from_replica_and_writes_to_primary(run_db):
+    async def case():
+        # 主库与副本写入不同的数据, 用来区分读取来源
+        await Note.create(text="primary")
+        await replica.connections.get("replica_r1").execute_query(
+            "INSERT INTO replica_note (id, text) VALUES (1, 'replica')"
+        )
+        router = replica.ReplicaRouter()
+        token = replica.begin_request(_scope("GET"))
+        try:
+            assert router.db_for_read(Note) == "replica_r1"
+            assert await Note.all().values_list("text", flat=True) == ["replica"]
+            assert router.db_for_write(Note) is None
+            # 写入之后同一请求内的读取回到主库
+            assert router.db_for_read(Note) is None
+        finally:
+            replica.end_request(token)
+        token = replica.begin_request(_scope("POST"))
+        try:
+            assert router.db_for_read(Note) is None
+        finally:
+            replica.end_request(token)
+
+    run_db(case, replicas=("replica_r1",))
+
+
+def test_reads_outside_requests_use_primary():
+    assert replica.ReplicaRouter().db_for_read(Note) is None
+
+
+def test_write_cookie_keeps_following_reads_on_primary(run_db):
+    async def case():
+        await replica.connections.get("replica_r1").execute_query(
+            "INSERT INTO replica_note (id, text) VALUES (1, 'replica')"
+        )
+        transport = httpx.ASGITransport(app=ReplicaRoutingMiddleware(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.get("/notes")).json() == ["replica"]
+            response = await client.post("/notes")
+            assert replica.WRITE_COOKIE in response.cookies
+            # 模拟读请求落在另一个 worker: 进程内记录为空, 仅凭 cookie
+            replica._recent_writes.clear()
+            assert (await client.get("/notes")).json() == ["primary"]
+            client.cookies.clear()
+            assert (await client.get("/notes")).json() == ["replica"]
+
+    run_db(case, replicas=("replica_r1",))
+
+
+def test_sticky_window_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(replica.time, "monotonic", lambda: now[0])
+    router = replica.ReplicaRouter()
+    headers = [(b"authorization", b"Bearer secret")]
+    token = replica.begin_request(_scope("POST", headers=headers))
+    router.db_for_write(Note)
+    replica.end_request(token)
+    # 认证头只以摘要保存
+    assert "Bearer secret" not in replica._recent_writes
+
+    token = replica.begin_request(_scope("GET", headers=headers))
+    assert replica._routing_state.get().read_only is False
+    replica.end_request(token)
+    now[0] += 3.5
+    token = replica.begin_request(_scope("GET", headers=headers))
+    assert replica._routing_state.get().read_only is True
+    replica.end_request(token)
+
+
+def test_forged_cookie_beyond_one_window_is_ignored():
+    far = replica.time.time() + 3600
+    scope = _scope("GET", headers=[(b"cookie", f"{replica.WRITE_COOKIE}={far}".encode())])
+    token = replica.begin_request(scope)
+    assert replica._routing_state.get().read_only is True
+    replica.end_request(token)
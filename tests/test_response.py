@@ -0,0 +1,21 @@
+import base64
+from decimal import Decimal
+
+import orjson
+import pytest
+
+from base.common.response import json_dumps
+
+
+def test_bytes_are_base64_encoded():
+    payload = b"\xff\xfe\x00binary"
+    assert orjson.loads(json_dumps({"data": payload})) == {"data": base64.b64encode(payload).decode()}
+
+
+def test_fallback_types():
+    assert orjson.loads(json_dumps({1: Decimal("1.10"), "tags": {"a"}})) == {"1": "1.10", "tags": ["a"]}
+
+
+def test_unsupported_type_raises_type_error():
+    with pytest.raises(TypeError):
+        json_dumps(object())
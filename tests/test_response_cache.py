@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from base.common.cache import TTLCache, cached_response
+
+
+def make_cache():
+    return TTLCache("test", max_entries=100, max_bytes=1024 * 1024, default_ttl=60)
+
+
+def test_sync_handler_is_cached():
+    app = FastAPI()
+    cache = make_cache()
+    calls = []
+
+    @app.get("/items/{item_id}")
+    @cached_response(ttl=10, cache=cache)
+    def read_item(item_id: int):
+        calls.append(item_id)
+        return {"id": item_id}
+
+    client = TestClient(app)
+    first, second = client.get("/items/1"), client.get("/items/1")
+    assert first.status_code == second.status_code == 200
+    assert second.json() == {"id": 1}
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert calls == [1]
+
+
+def test_tags_use_handler_arguments():
+    app = FastAPI()
+    cache = make_cache()
+
+    @app.get("/users/{user_id}")
+    @cached_response(tags=("user:{user_id}",), cache=cache)
+    async def read_user(user_id: int):
+        return {"id": user_id}
+
+    client = TestClient(app)
+    client.get("/users/7")
+    assert cache.invalidate_tags("user:7") == 1
+    assert client.get("/users/7").headers["x-cache"] == "MISS"
+
+
+def test_unknown_tag_placeholder_fails_at_decoration():
+    with pytest.raises(ValueError):
+        @cached_response(tags=("user:{user_id}",))
+        async def read_user(item_id: int):
+            return {}
+
+
+def test_concurrent_misses_run_handler_once():
+    app = FastAPI()
+    cache = make_cache()
+    calls = []
+
+    @app.get("/slow")
+    @cached_response(cache=cache)
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/slow") for _ in range(5)))
+
+    responses = asyncio.run(run())
+    assert all(response.json() == {"ok": True} for response in responses)
+    assert sorted(response.headers["x-cache"] for response in responses) == ["HIT"] * 4 + ["MISS"]
+    assert calls == [1]